@@ -0,0 +1,262 @@
+# api.py
+# HTTP service around the extraction pipeline: submit a PDF (upload or URL), get a job id,
+# then poll the job or follow its progress as a server-sent event stream. /metrics serves
+# the tracing aggregates for Prometheus, /papers queries the cross-paper index (paper_index.py).
+#
+# Run:  uvicorn api:app --host 127.0.0.1 --port 8000
+# All jobs share one process, one model client and one bounded worker pool.
+import asyncio
+import copy
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+import pipeline
+import tracing
+from config import MAX_FILE_SIZE_MB, MERGE_MODE_CHOICES, RETRIEVAL_MODE_CHOICES, SUMMARY_MODE_CHOICES
+from pdf_fetch import PDFTooLargeError, pdf_source, save_upload, temp_pdf
+from result_model import dumps
+
+# documents processed at the same time across all clients
+API_WORKERS = int(os.getenv("API_WORKERS", "4"))
+# finished jobs kept in memory for polling
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "500"))
+# summary text is sent as one "summary" event per interval at most (the SSE poll interval)
+SUMMARY_EVENT_INTERVAL_S = 0.2
+
+class Job:
+    def __init__(self, source):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.status = "queued"
+        self.created_at = time.time()
+        self.finished_at = None
+        self.progress = {"done": 0, "total": 0}
+        self.result = None
+        self.error = None
+        # event log; each SSE client reads it from its own offset. A finished job keeps only
+        # its final event (late subscribers need just the result); offsets stay valid
+        self.events = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def emit(self, event, data):
+        with self._lock:
+            self.events.append({"event": event, "data": data})
+
+    def finish(self, event, data):
+        """Replace the log with the final "result" / "error" event"""
+        with self._lock:
+            self.dropped += len(self.events)
+            self.events = [{"event": event, "data": data}]
+
+    def read(self, offset):
+        """Events from offset on (skipping the ones finish() dropped) and the next offset"""
+        with self._lock:
+            return self.events[max(0, offset - self.dropped):], self.dropped + len(self.events)
+
+    def summary(self):
+        return {
+            "job_id": self.id, "source": self.source, "status": self.status,
+            "progress": self.progress, "error": self.error,
+            "created_at": self.created_at, "finished_at": self.finished_at,
+        }
+
+class JobManager:
+    def __init__(self, workers=API_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract")
+        self.jobs = OrderedDict()
+        self.max_finished = max_finished
+        self._lock = threading.Lock()
+
+    def submit(self, source, open_pdf, **kwargs):
+        """open_pdf() is a context manager yielding the PDF (bytes or a file path) for the job"""
+        job = Job(source)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._evict()
+        self.pool.submit(self._run, job, open_pdf, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _evict(self):
+        finished = [j for j in self.jobs.values() if j.status in ("done", "error")]
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job.id]
+
+    def _run(self, job, open_pdf, kwargs):
+        job.status = "running"
+        job.emit("status", {"status": "running"})
+        try:
+            with open_pdf() as pdf:
+                self._extract(job, pdf, kwargs)
+            job.finish("result", job.result)
+            job.finished_at = time.time()
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.finish("error", {"error": job.error})
+            job.finished_at = time.time()
+            job.status = "error"
+
+    def _extract(self, job, pdf, kwargs):
+        merged = {}
+
+        def on_chunk_done(done, total, i, ch, partial, running):
+            # "changed" holds only the merged fields that differ from the previous event;
+            # applying them in order gives the running merge
+            changed = {k: copy.deepcopy(v) for k, v in running.items() if merged.get(k, object()) != v}
+            merged.update(changed)
+            job.progress = {"done": done, "total": total}
+            job.emit("partial", {
+                "done": done, "total": total, "index": i,
+                "start_page": ch["start_page"], "end_page": ch["end_page"], "changed": changed,
+            })
+
+        summary = {"sent": 0, "text": "", "restart": False, "at": 0.0}
+
+        def send_summary():
+            delta = summary["text"][summary["sent"]:]
+            if delta or summary["restart"]:
+                job.emit("summary", {"delta": delta, "restart": True} if summary["restart"] else {"delta": delta})
+            summary.update(sent=len(summary["text"]), restart=False, at=time.monotonic())
+
+        def on_summary_text(text):
+            # the summary streams out as "summary" events carrying only the new text, at most one
+            # per SUMMARY_EVENT_INTERVAL_S; a retried model call starts over, flagged with "restart"
+            if len(text) < summary["sent"]:
+                summary.update(sent=0, restart=True)
+            summary["text"] = text
+            if time.monotonic() - summary["at"] >= SUMMARY_EVENT_INTERVAL_S:
+                send_summary()
+
+        result = pipeline.process_paper(
+            pdf, on_status=lambda text: job.emit("status", {"status": "running", "message": text}),
+            on_chunk_done=on_chunk_done, on_summary_text=on_summary_text, **kwargs
+        )
+        send_summary()
+        job.result = {
+            "doc_hash": result["doc_hash"], "from_store": result["from_store"], "pages": result["n_pages"],
+            "chunks": len(result["chunks"]), "reused_chunks": result["reused_chunks"],
+            "merged": result["merged"], "summary": result["summary"],
+            "warnings": result["warnings"], "timings": result["timings"],
+            "usage": tracing.usage(result["trace"]),
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+def _fetch_url(url):
+    # downloaded in the job's worker thread; a cached body is processed straight from its file
+    return lambda: pdf_source(url)
+
+def create_app(model=None, manager=None):
+    """Build the FastAPI app; pass a model (anything with .invoke) to run against a stub"""
+    if model is not None:
+        pipeline.set_model(model)
+    manager = manager or JobManager()
+    app = FastAPI(title="Research PDF Extractor API")
+    app.state.jobs = manager
+
+    @app.on_event("shutdown")
+    def _shutdown():
+        manager.shutdown()
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", "jobs": len(manager.jobs)}
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        # Prometheus scrape endpoint: model calls, tokens, retries and stage timings since startup
+        return tracing.render_prometheus()
+
+    @app.post("/jobs", status_code=202)
+    async def create_job(
+        file: UploadFile = File(None),
+        url: str = Form(None),
+        title_hint: str = Form(""),
+        merge_mode: str = Form(None),
+        retrieval_mode: str = Form(None),
+        summary_mode: str = Form(None),
+        use_cache: bool = Form(True),
+    ):
+        if file is None and not url:
+            raise HTTPException(status_code=400, detail="Upload a PDF file or provide a PDF url")
+        # an unknown mode would fail inside the job or quietly run another mode; empty = the default
+        for name, value, choices in (("merge_mode", merge_mode, MERGE_MODE_CHOICES),
+                                     ("retrieval_mode", retrieval_mode, RETRIEVAL_MODE_CHOICES),
+                                     ("summary_mode", summary_mode, SUMMARY_MODE_CHOICES)):
+            if value and value not in choices:
+                raise HTTPException(status_code=422, detail=f"{name} must be one of: {', '.join(choices)}")
+        if file is not None:
+            # copied to a temp file in blocks (the job memory-maps it and removes it when done)
+            try:
+                path = await run_in_threadpool(save_upload, file.file)
+            except PDFTooLargeError:
+                raise HTTPException(status_code=413, detail=f"PDF larger than {MAX_FILE_SIZE_MB:g} MB")
+            source, open_pdf = file.filename, (lambda: temp_pdf(path))
+        else:
+            source, open_pdf = url, _fetch_url(url)
+        job = manager.submit(
+            source, open_pdf, title_hint=title_hint, merge_mode=merge_mode,
+            retrieval_mode=retrieval_mode, summary_mode=summary_mode, use_cache=use_cache,
+        )
+        return {"job_id": job.id, "status": job.status}
+
+    @app.get("/papers")
+    def papers(dataset: str = None, method: str = None, venue: str = None,
+               since: int = None, until: int = None, limit: int = 100):
+        # e.g. /papers?dataset=CIFAR-10&since=2020 -> papers with the mentions that matched
+        if pipeline.PAPER_INDEX is None:
+            raise HTTPException(status_code=404, detail="Paper index is disabled (PAPER_INDEX_ENABLED)")
+        hits = pipeline.PAPER_INDEX.query(dataset, method, venue, since, until, min(max(1, limit), 1000))
+        return {"count": len(hits), "papers": hits}
+
+    @app.get("/jobs/{job_id}")
+    def get_job(job_id: str):
+        job = manager.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        out = job.summary()
+        out["result"] = job.result
+        return out
+
+    @app.get("/jobs/{job_id}/events")
+    async def job_events(job_id: str):
+        job = manager.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown job")
+
+        async def stream():
+            offset = 0
+            while True:
+                # the status is set after the final event, so a read after seeing it gets that event
+                finished = job.status in ("done", "error")
+                events, offset = job.read(offset)
+                for ev in events:
+                    yield f"event: {ev['event']}\ndata: {dumps(ev['data']).decode('utf-8')}\n\n"
+                if finished:
+                    return
+                if not events:
+                    await asyncio.sleep(0.2)
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+app = create_app()
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "8000")))
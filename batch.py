@@ -0,0 +1,215 @@
+# batch.py
+# Headless bulk extraction over a directory of PDFs (or a manifest of paths / URLs).
+#
+# Usage:
+#   python batch.py papers/ --out results.jsonl [--workers 4] [--chunk-workers 4]
+#   python batch.py manifest.txt --out results.jsonl
+#
+# Each finished document is appended to the output JSONL right away, so the file doubles
+# as the checkpoint: re-running the same command skips documents already written with
+# status "ok" (add --retry-failed to also redo the ones that errored, and the "partial"
+# ones whose model calls failed for some chunks even after retries).
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from itertools import islice
+
+import pipeline
+import tracing
+from config import MERGE_MODE_CHOICES, RETRIEVAL_MODE_CHOICES, SUMMARY_MODE_CHOICES
+from result_model import dumps, loads
+
+# --------------------------
+# Inputs
+# --------------------------
+def iter_sources(target):
+    """Yield {"id", "source"} for a directory of PDFs, a single PDF, or a manifest file.
+
+    A manifest is either plain text (one path or URL per line) or JSONL with a "path" or
+    "url" key and an optional "id".
+    """
+    if os.path.isdir(target):
+        for root, _, files in os.walk(target):
+            for name in sorted(files):
+                if name.lower().endswith(".pdf"):
+                    path = os.path.join(root, name)
+                    yield {"id": os.path.relpath(path, target), "source": path}
+        return
+    if target.lower().endswith(".pdf"):
+        yield {"id": os.path.basename(target), "source": target}
+        return
+    with open(target, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                source = entry.get("path") or entry.get("url")
+                yield {"id": entry.get("id") or source, "source": source}
+            else:
+                yield {"id": line, "source": line}
+
+def is_url(source):
+    return source.startswith(("http://", "https://"))
+
+@contextmanager
+def load_source(source):
+    """Pipeline source for a path or URL, valid inside the block: a local file as its path (the
+    pipeline memory-maps it), a URL as its cache file's path when cached, else bytes"""
+    if is_url(source):
+        from pdf_fetch import pdf_source
+        with pdf_source(source) as pdf:
+            yield pdf
+        return
+    if not os.path.isfile(source):
+        raise FileNotFoundError(f"No such file: {source}")
+    yield source
+
+def load_checkpoint(out_path, retry_failed=False):
+    """ids already present in the output file (only complete ones with retry_failed)"""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = loads(line)
+            except ValueError:
+                # a partially written last line from an interrupted run
+                continue
+            if rec.get("status") == "ok" or not retry_failed:
+                done.add(rec.get("id"))
+    return done
+
+# --------------------------
+# Batch runner (library entry point)
+# --------------------------
+def process_one(item, load=load_source, **kwargs):
+    t0 = time.perf_counter()
+    rec = {"id": item["id"], "source": item["source"]}
+    try:
+        with load(item["source"]) as pdf:
+            result = pipeline.process_paper(pdf, **kwargs)
+        # chunks lost to failed model calls: the result is incomplete (and kept out of the
+        # paper store), so it is not "ok" and --retry-failed redoes it
+        rec.update(
+            status="partial" if result["failed_chunks"] else "ok", failed_chunks=len(result["failed_chunks"]), doc_hash=result["doc_hash"], from_store=result["from_store"],
+            pages=result["n_pages"], chunks=len(result["chunks"]), reused_chunks=result["reused_chunks"],
+            merged=result["merged"], summary=result["summary"], warnings=result["warnings"],
+            timings={k: round(v, 3) for k, v in result["timings"].items()},
+            usage=tracing.usage(result["trace"]),
+        )
+    except Exception as e:
+        rec.update(status="error", error=f"{type(e).__name__}: {e}")
+    rec["seconds"] = round(time.perf_counter() - t0, 3)
+    return rec
+
+def run_batch(sources, out_path, workers=4, retry_failed=False, on_record=None, download_workers=4, **kwargs):
+    """Process sources concurrently, appending one JSON line per document to out_path.
+
+    Documents already in out_path are skipped. Only workers * 2 documents are queued at a
+    time, so an interrupted run (Ctrl-C, an exception from on_record) cancels the ones that
+    have not started instead of processing them without writing their results. URLs are
+    downloaded ahead of their turn on download_workers threads (through the shared pdf_fetch
+    session and cache). kwargs go to
+    pipeline.process_paper (use_cache, merge_mode, retrieval_mode, max_workers, ...).
+    Returns a stats dict.
+    """
+    done = load_checkpoint(out_path, retry_failed=retry_failed)
+    sources = list(sources)
+    todo = [item for item in sources if item["id"] not in done]
+    urls = [item["source"] for item in todo if is_url(item["source"])]
+    prefetcher = None
+    if urls and download_workers > 0:
+        from pdf_fetch import Prefetcher, download_source, get_fetcher
+        prefetcher = Prefetcher(get_fetcher(), urls, workers=download_workers, ahead=workers + download_workers)
+
+    def load_prefetched(source):
+        return download_source(prefetcher.get(source)) if is_url(source) else load_source(source)
+
+    load = load_prefetched if prefetcher else load_source
+    write_lock = threading.Lock()
+    stats = {"skipped": len(sources) - len(todo), "ok": 0, "partial": 0, "error": 0, "seconds": 0.0, "llm_calls": 0, "tokens_in": 0, "tokens_out": 0}
+    t0 = time.perf_counter()
+    try:
+        with open(out_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            queue = iter(todo)
+            window = max(1, workers) * 2
+            pending = set()
+            try:
+                while True:
+                    pending.update(pool.submit(process_one, item, load=load, **kwargs)
+                                   for item in islice(queue, window - len(pending)))
+                    if not pending:
+                        break
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        rec = fut.result()
+                        with write_lock:
+                            out.write(dumps(rec).decode("utf-8") + "\n")
+                            out.flush()
+                        stats[rec["status"]] += 1
+                        for key in ("llm_calls", "tokens_in", "tokens_out"):
+                            stats[key] += rec.get("usage", {}).get(key, 0)
+                        if on_record:
+                            on_record(rec)
+            except BaseException:
+                # only the documents already running finish; their results are lost either way
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+    finally:
+        if prefetcher:
+            prefetcher.close()
+    stats["seconds"] = time.perf_counter() - t0
+    processed = stats["ok"] + stats["partial"] + stats["error"]
+    stats["papers_per_minute"] = processed / stats["seconds"] * 60 if stats["seconds"] > 0 else 0.0
+    return stats
+
+# --------------------------
+# CLI
+# --------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Bulk research paper extraction to JSONL")
+    ap.add_argument("input", help="directory of PDFs, a single PDF, or a manifest (.txt / .jsonl) of paths or URLs")
+    ap.add_argument("--out", default="extractions.jsonl", help="output JSONL (also used as the resume checkpoint)")
+    ap.add_argument("--workers", type=int, default=4, help="documents processed at the same time")
+    ap.add_argument("--download-workers", type=int, default=4, help="URLs downloaded at the same time (ahead of processing)")
+    ap.add_argument("--chunk-workers", type=int, default=pipeline.MAX_CONCURRENT_CHUNKS, help="model calls in flight per document")
+    ap.add_argument("--merge-mode", default=pipeline.MERGE_MODE, choices=MERGE_MODE_CHOICES)
+    ap.add_argument("--summary-mode", default=pipeline.SUMMARY_MODE, choices=SUMMARY_MODE_CHOICES)
+    ap.add_argument("--retrieval-mode", default=pipeline.RETRIEVAL_MODE, choices=RETRIEVAL_MODE_CHOICES)
+    ap.add_argument("--no-cache", action="store_true", help="do not read or write the model response cache")
+    ap.add_argument("--no-store", action="store_true", help="neither reuse nor update the paper store")
+    ap.add_argument("--retry-failed", action="store_true", help="re-run documents that errored or lost chunks in a previous run")
+    args = ap.parse_args(argv)
+
+    def report(rec):
+        if rec["status"] == "ok":
+            origin = "store" if rec["from_store"] else f"{rec['chunks']} chunks"
+            if rec.get("reused_chunks"):
+                origin += f" ({rec['reused_chunks']} reused from an earlier version)"
+            print(f"[ok]    {rec['id']}  {rec['pages']} pages, {origin}, {rec['seconds']:.2f}s", flush=True)
+        elif rec["status"] == "partial":
+            print(f"[warn]  {rec['id']}  {rec['failed_chunks']} of {rec['chunks']} chunks failed, result incomplete "
+                  f"(--retry-failed redoes it) ({rec['seconds']:.2f}s)", flush=True)
+        else:
+            print(f"[error] {rec['id']}  {rec['error']} ({rec['seconds']:.2f}s)", flush=True)
+
+    stats = run_batch(
+        iter_sources(args.input), args.out, workers=args.workers, retry_failed=args.retry_failed,
+        on_record=report, download_workers=args.download_workers, reuse_stored=not args.no_store, update_store=not args.no_store, use_cache=not args.no_cache,
+        merge_mode=args.merge_mode, retrieval_mode=args.retrieval_mode, summary_mode=args.summary_mode, max_workers=args.chunk_workers,
+    )
+    print(f"\n{stats['ok']} ok, {stats['partial']} partial, {stats['error']} failed, {stats['skipped']} skipped (already in {args.out})")
+    print(f"{stats['seconds']:.1f}s total, {stats['papers_per_minute']:.1f} papers/min")
+    print(f"{stats['llm_calls']} model calls, {stats['tokens_in']} tokens in, {stats['tokens_out']} tokens out")
+    return 1 if stats["error"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# chunker_bench.py
+# Compare the token-aware chunker against the old character/page-count chunker.
+#
+# Usage:
+#   python benchmarks/chunker_bench.py path/to/pdfs [more.pdf ...] [--max-tokens 4000] [--overlap 0]
+#
+# For every paper it reports the number of model calls (chunks) and the token fill ratio
+# (mean estimated chunk tokens / budget), plus how many chunks went over the budget.
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_utils import chunk_pages, estimate_tokens, read_pdf_bytes  # noqa: E402
+
+
+def legacy_chunk_pages(pages_text, max_chars=12000, max_pages_per_chunk=5):
+    """The original chunker: cut on character count or page count, never split a page"""
+    chunks = []
+    cur_pages = []
+    cur_len = 0
+    start_page = 1
+    for i, pg in enumerate(pages_text, start=1):
+        add_len = len(pg)
+        page_count = len(cur_pages) + 1
+        if (cur_len + add_len > max_chars) or (page_count > max_pages_per_chunk):
+            chunks.append({"start_page": start_page, "end_page": start_page + len(cur_pages) - 1, "text": "\n\n".join(cur_pages)})
+            cur_pages = [pg]
+            cur_len = add_len
+            start_page = i
+        else:
+            cur_pages.append(pg)
+            cur_len += add_len
+    if cur_pages:
+        chunks.append({"start_page": start_page, "end_page": start_page + len(cur_pages) - 1, "text": "\n\n".join(cur_pages)})
+    return chunks
+
+
+def chunk_stats(chunks, budget):
+    sizes = [estimate_tokens(c["text"]) for c in chunks if c["text"].strip()]
+    if not sizes:
+        return {"calls": 0, "fill": 0.0, "over": 0}
+    return {
+        "calls": len(sizes),
+        "fill": sum(sizes) / (len(sizes) * budget),
+        "over": sum(1 for n in sizes if n > budget),
+    }
+
+
+def find_pdfs(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(".pdf"):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare the token-aware chunker with the legacy one")
+    ap.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    ap.add_argument("--max-tokens", type=int, default=4000)
+    ap.add_argument("--overlap", type=int, default=0)
+    args = ap.parse_args()
+
+    # the old chunker's 12000 character cap expressed in the same token estimate
+    legacy_budget = estimate_tokens("x" * 12000)
+    totals = {"papers": 0, "old_calls": 0, "new_calls": 0, "old_fill": 0.0, "new_fill": 0.0, "old_over": 0, "new_over": 0}
+
+    print(f"{'paper':40} {'pages':>5} {'old calls':>9} {'new calls':>9} {'old fill':>8} {'new fill':>8} {'old over':>8}")
+    for path in find_pdfs(args.paths):
+        with open(path, "rb") as f:
+            pages = read_pdf_bytes(f.read())
+        old = chunk_stats(legacy_chunk_pages(pages), legacy_budget)
+        new = chunk_stats(chunk_pages(pages, max_tokens=args.max_tokens, overlap_tokens=args.overlap), args.max_tokens)
+        print(f"{os.path.basename(path)[:40]:40} {len(pages):5d} {old['calls']:9d} {new['calls']:9d} "
+              f"{old['fill']:8.2f} {new['fill']:8.2f} {old['over']:8d}")
+        totals["papers"] += 1
+        for key in ("calls", "fill", "over"):
+            totals["old_" + key] += old[key]
+            totals["new_" + key] += new[key]
+
+    n = totals["papers"]
+    if not n:
+        print("no PDFs found")
+        return
+    print()
+    print(f"papers: {n}")
+    print(f"calls per paper: old {totals['old_calls'] / n:.2f}  new {totals['new_calls'] / n:.2f}")
+    print(f"mean fill ratio: old {totals['old_fill'] / n:.2f}  new {totals['new_fill'] / n:.2f}")
+    print(f"chunks over budget: old {totals['old_over']}  new {totals['new_over']}")
+
+
+if __name__ == "__main__":
+    main()
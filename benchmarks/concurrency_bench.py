@@ -0,0 +1,87 @@
+# concurrency_bench.py
+# Wall time of the map phase (pipeline.map_chunks over extract_chunk) as the number of model
+# calls in flight grows, with a fake chat model of fixed latency.
+#
+# Usage:
+#   python benchmarks/concurrency_bench.py [--chunks 16] [--latency-ms 200] [--workers 1,2,4,8,16]
+#       [--min-efficiency 0.8] [--check]
+#
+# Every chunk is one page of a synthetic paper (synthetic_pdf.py) answered by
+# pipeline_bench.FakeChatModel without jitter, so one call takes --latency-ms and a serial
+# run takes chunks x latency. For each worker count it reports the wall time, the speedup
+# over one worker and the efficiency: speedup / the speedup a perfect pool would reach
+# (chunks / ceil(chunks / workers)). --check exits with status 1 when an efficiency is under
+# --min-efficiency, when more workers make the map phase slower, or when results come back
+# out of chunk order or without a progress callback per chunk.
+import argparse
+import math
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.environ["LLM_CACHE_ENABLED"] = "0"
+os.environ["PAPER_STORE_ENABLED"] = "0"
+os.environ["PAPER_INDEX_ENABLED"] = "0"
+
+import pipeline  # noqa: E402
+from pipeline_bench import FakeChatModel  # noqa: E402
+from synthetic_pdf import paper_pages  # noqa: E402
+
+
+def run(chunks, workers):
+    done = []
+
+    def extract(ch):
+        return ch["start_page"], pipeline.extract_chunk(ch, use_cache=False)
+
+    t0 = time.perf_counter()
+    results = pipeline.map_chunks(chunks, extract_fn=extract, max_workers=workers,
+                                  on_done=lambda n, total, i, ch, res: done.append(i))
+    wall = time.perf_counter() - t0
+    in_order = [page for page, _ in results] == [ch["start_page"] for ch in chunks]
+    return wall, in_order, sorted(done) == list(range(len(chunks)))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Map phase wall time vs calls in flight")
+    ap.add_argument("--chunks", type=int, default=16)
+    ap.add_argument("--latency-ms", type=float, default=200, help="fake model latency per call")
+    ap.add_argument("--workers", default="1,2,4,8,16", help="max_workers values to run")
+    ap.add_argument("--min-efficiency", type=float, default=0.8)
+    ap.add_argument("--check", action="store_true", help="exit with status 1 on a failure")
+    args = ap.parse_args()
+
+    pipeline.set_model(FakeChatModel(latency_ms=args.latency_ms, tokens_per_s=1e9, jitter=0))
+    chunks = [{"text": text, "start_page": no, "end_page": no}
+              for no, text in enumerate(paper_pages(args.chunks), start=1)]
+    failures = []
+    base = None
+    prev = None
+    print(f"{args.chunks} chunks, {args.latency_ms:g} ms per model call\n")
+    print(f"{'workers':>7} {'wall s':>8} {'ideal s':>8} {'speedup':>8} {'efficiency':>10}")
+    for workers in [int(w) for w in args.workers.split(",")]:
+        wall, in_order, progress = run(chunks, workers)
+        base = base or wall
+        ideal = math.ceil(args.chunks / workers) * args.latency_ms / 1000
+        speedup = base / wall
+        efficiency = speedup / (args.chunks / math.ceil(args.chunks / workers))
+        print(f"{workers:>7} {wall:>8.2f} {ideal:>8.2f} {speedup:>7.1f}x {efficiency:>10.0%}")
+        if efficiency < args.min_efficiency:
+            failures.append(f"{workers} workers: efficiency {efficiency:.0%} < {args.min_efficiency:.0%}")
+        if prev is not None and wall > prev * 1.1:
+            failures.append(f"{workers} workers: {wall:.2f}s, slower than with fewer workers ({prev:.2f}s)")
+        if not in_order:
+            failures.append(f"{workers} workers: results out of chunk order")
+        if not progress:
+            failures.append(f"{workers} workers: on_done not called once per chunk")
+        prev = wall
+
+    print(f"\n{len(failures)} failures" + "".join(f"\n  {f}" for f in failures))
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
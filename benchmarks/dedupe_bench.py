@@ -0,0 +1,162 @@
+# dedupe_bench.py
+# Near-duplicate dedupe (dedupe.py) against the exact-key / fuzzy dedupe it replaces in the
+# local merge: pairwise precision / recall on a labeled fixture, and run time as the number
+# of items grows.
+#
+# Usage:
+#   python benchmarks/dedupe_bench.py [--sizes 1000,2000,4000,8000] [--exact-max 2000] [--check]
+#       [--min-precision 0.97] [--min-recall 0.8]
+#
+# benchmarks/fixtures/dedupe_labeled.json holds gold clusters of dataset names and headings
+# (each inner list is one real-world item written several ways; separate lists must stay
+# apart, including near-miss negatives like CIFAR-10 / CIFAR-100). Every pair of names put
+# in one cluster counts as a predicted duplicate; precision and recall are over those pairs.
+# The fixture has two splits: "tune", which the rules and aliases in dedupe.py were written
+# against (its recall says little), and "held_out", labeled afterwards and never used to
+# change a rule.
+#
+# The scaling run dedupes a corpus-like list: the fixture names with random case and
+# punctuation changes plus unrelated synthetic names (the quadratic exact dedupe is only timed
+# up to --exact-max items). --check
+# exits with status 1 when dedupe.py falls under the precision floor on either split or the
+# recall floor on the held-out split, or when its time per item at the largest size is more
+# than 3x the time per item at the smallest.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from itertools import combinations
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from dedupe import heading_profile, near_duplicate_clusters  # noqa: E402
+from pipeline import headings_similar, normalize_dataset_key, normalize_heading_key  # noqa: E402
+
+FIXTURE = os.path.join(HERE, "fixtures", "dedupe_labeled.json")
+
+
+def exact_clusters(names, kind):
+    """Clusters the previous merge produced: dedupe_datasets / dedupe_headings_fuzzy"""
+    reps, clusters = [], []
+    for i, name in enumerate(names):
+        if kind == "dataset":
+            key = normalize_dataset_key(name)
+            match = next((c for c, r in enumerate(reps) if r == key), None)
+        else:
+            key = normalize_heading_key(name)
+            match = next((c for c, r in enumerate(reps) if headings_similar(key, r)), None)
+        if match is None:
+            reps.append(key)
+            clusters.append([i])
+        else:
+            clusters[match].append(i)
+    return clusters
+
+
+def pair_scores(clusters, gold):
+    predicted = {p for c in clusters for p in combinations(sorted(c), 2)}
+    actual = {p for c in gold for p in combinations(sorted(c), 2)}
+    hit = len(predicted & actual)
+    precision = hit / len(predicted) if predicted else 1.0
+    recall = hit / len(actual) if actual else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1, sorted(predicted - actual), sorted(actual - predicted)
+
+
+def perturb(name, rng):
+    if rng.random() < 0.3:
+        name = name.lower()
+    if rng.random() < 0.2:
+        name = name.replace("-", " ")
+    if rng.random() < 0.1:
+        name += "."
+    return name
+
+
+def corpus(gold, n, rng):
+    """n names: fixture variants (perturbed) and unrelated synthetic ones, about half each"""
+    variants = [name for c in gold for name in c]
+    syllables = ["ka", "lo", "mi", "net", "ra", "to", "vex", "qu", "sil", "dor", "ban", "phi"]
+    out = []
+    while len(out) < n:
+        if rng.random() < 0.5:
+            out.append(perturb(rng.choice(variants), rng))
+        else:
+            word = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+            out.append(f"{word.capitalize()} {rng.choice(['learning', 'graphs', 'bench', 'attention', 'v2', '10k'])}")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Near-duplicate dedupe: precision / recall and scaling")
+    ap.add_argument("--fixture", default=FIXTURE)
+    ap.add_argument("--sizes", default="1000,2000,4000,8000", help="item counts for the scaling run")
+    ap.add_argument("--exact-max", type=int, default=2000, help="largest size the old dedupe is timed at")
+    ap.add_argument("--min-precision", type=float, default=0.97)
+    ap.add_argument("--min-recall", type=float, default=0.8, help="on the held-out split")
+    ap.add_argument("--show-errors", action="store_true", help="list the wrong and missed pairs")
+    ap.add_argument("--check", action="store_true", help="exit with status 1 below the floors")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    with open(args.fixture, encoding="utf-8") as f:
+        fixture = json.load(f)
+    failures = []
+
+    print(f"{'split':<9} {'kind':<9} {'method':<8} {'items':>5} {'clusters':>8} {'precision':>9} {'recall':>7} {'f1':>6}")
+    for split in ("tune", "held_out"):
+        for kind, field in [("dataset", "datasets"), ("heading", "headings")]:
+            names, gold, pos = [], [], 0
+            for c in fixture[split][field]:
+                names.extend(c)
+                gold.append(list(range(pos, pos + len(c))))
+                pos += len(c)
+            for method, fn in [("exact", exact_clusters), ("near", near_duplicate_clusters)]:
+                clusters = fn(names, kind)
+                precision, recall, f1, wrong, missed = pair_scores(clusters, gold)
+                print(f"{split:<9} {kind:<9} {method:<8} {len(names):>5} {len(clusters):>8} "
+                      f"{precision:>9.3f} {recall:>7.3f} {f1:>6.3f}")
+                if method != "near":
+                    continue
+                if args.show_errors:
+                    for a, b in wrong:
+                        print(f"    wrong  {names[a]!r} = {names[b]!r}")
+                    for a, b in missed:
+                        print(f"    missed {names[a]!r} = {names[b]!r}")
+                if precision < args.min_precision:
+                    failures.append(f"{split} {kind} precision {precision:.3f} < {args.min_precision}")
+                if split == "held_out" and recall < args.min_recall:
+                    failures.append(f"{split} {kind} recall {recall:.3f} < {args.min_recall}")
+
+    rng = random.Random(args.seed)
+    gold_names = [c for split in ("tune", "held_out") for field in ("datasets", "headings")
+                  for c in fixture[split][field]]
+    sizes = [int(s) for s in args.sizes.split(",")]
+    print(f"\n{'items':>6} {'exact':>9} {'near':>9} {'near/item':>10}")
+    per_item = []
+    for n in sizes:
+        names = corpus(gold_names, n, rng)
+        exact = "-"
+        if n <= args.exact_max:
+            t0 = time.perf_counter()
+            exact_clusters(names, "heading")
+            exact = f"{time.perf_counter() - t0:.2f}s"
+        heading_profile.cache_clear()  # profiles are memoized; time them too
+        t0 = time.perf_counter()
+        near_duplicate_clusters(names, "heading")
+        near_s = time.perf_counter() - t0
+        per_item.append(near_s / n)
+        print(f"{n:>6} {exact:>9} {near_s:>8.2f}s {near_s / n * 1e6:>8.1f}us")
+    if len(per_item) > 1 and per_item[-1] > 3 * per_item[0]:
+        failures.append(f"time per item grew {per_item[-1] / per_item[0]:.1f}x from {sizes[0]} to {sizes[-1]} items")
+
+    print(f"\n{len(failures)} failures" + "".join(f"\n  {f}" for f in failures))
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
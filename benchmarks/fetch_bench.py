@@ -0,0 +1,195 @@
+# fetch_bench.py
+# PDF download path against a local HTTP server: the original requests.get(...).content
+# next to pdf_fetch (pooled session, streaming, size cap, ETag / Last-Modified cache).
+#
+# Usage:
+#   python benchmarks/fetch_bench.py [--mb 20] [--fetches 5] [--papers 8] [--workers 4] [--ms-per-mb 20]
+#
+# The server (http.server on 127.0.0.1, random port) serves synthetic PDFs with an ETag and
+# Last-Modified, answers conditional requests with 304, counts connections and body bytes,
+# and throttles to --ms-per-mb so transfer time is visible. Reported:
+#   - repeat fetches of one PDF: wall time, body bytes sent, TCP connections opened
+#   - peak Python memory while fetching one large PDF (bytes in memory vs file-backed)
+#   - the size cap: rejected from Content-Length, and cut off for a body sent without one
+#   - several different PDFs one after another vs through Prefetcher on --workers threads
+import argparse
+import email.utils
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+from pdf_fetch import FetchCache, PDFFetcher, PDFTooLargeError, Prefetcher  # noqa: E402
+from synthetic_pdf import make_pdf  # noqa: E402
+
+
+class Server:
+    """Local PDF server: /paper/<name> with validators, /chunked/<name> without Content-Length"""
+
+    def __init__(self, files, ms_per_mb):
+        self.files = files
+        self.ms_per_mb = ms_per_mb
+        self.bytes_sent = 0
+        self.connections = 0
+        self.not_modified = 0
+        self.modified = email.utils.formatdate(time.time() - 3600, usegmt=True)
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                kind, _, name = self.path.strip("/").partition("/")
+                body = server.files.get(name)
+                if body is None:
+                    self.send_error(404)
+                    return
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if kind == "paper" and self.headers.get("If-None-Match") == etag:
+                    with server._lock:
+                        server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                if kind == "paper":
+                    self.send_header("ETag", etag)
+                    self.send_header("Last-Modified", server.modified)
+                    self.send_header("Content-Length", str(len(body)))
+                else:
+                    self.send_header("Connection", "close")
+                self.end_headers()
+                step = 1 << 20
+                for i in range(0, len(body), step):
+                    try:
+                        self.wfile.write(body[i:i + step])
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+                    with server._lock:
+                        server.bytes_sent += len(body[i:i + step])
+                    time.sleep(server.ms_per_mb / 1000 * len(body[i:i + step]) / (1 << 20))
+                if kind != "paper":
+                    self.close_connection = True
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def reset(self):
+        self.bytes_sent = self.connections = self.not_modified = 0
+
+
+def big_pdf(mb):
+    """A synthetic PDF padded to about `mb` MB (the padding is an unreferenced comment block)"""
+    pdf = make_pdf(20)
+    return pdf + b"%" + b"0" * max(0, int(mb * (1 << 20)) - len(pdf)) + b"\n"
+
+
+def legacy_fetch(url):
+    """The original download: new connection each time, whole body in memory"""
+    r = requests.get(url, timeout=60)
+    r.raise_for_status()
+    return r.content
+
+
+def report(name, server, seconds):
+    print(f"  {name:<34} {seconds:7.2f}s  {server.bytes_sent / 1e6:8.1f} MB sent  "
+          f"{server.connections:3d} connections  {server.not_modified:3d} x 304")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="PDF fetcher benchmark against a local HTTP server")
+    ap.add_argument("--mb", type=float, default=20, help="size of the large PDF")
+    ap.add_argument("--fetches", type=int, default=5, help="repeat fetches of the same PDF")
+    ap.add_argument("--papers", type=int, default=8, help="different PDFs for the concurrency test")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--ms-per-mb", type=float, default=20, help="server throttle")
+    args = ap.parse_args()
+
+    files = {"big.pdf": big_pdf(args.mb)}
+    for i in range(args.papers):
+        files[f"p{i}.pdf"] = big_pdf(args.mb / 4) + str(i).encode()
+    server = Server(files, args.ms_per_mb)
+    url = f"{server.url}/paper/big.pdf"
+    cache_dir = tempfile.mkdtemp(prefix="fetch_bench_")
+    fetcher = PDFFetcher(max_bytes=int(args.mb * 2 * (1 << 20)), cache=FetchCache(cache_dir))
+    uncached = PDFFetcher(max_bytes=int(args.mb * 2 * (1 << 20)))
+
+    print(f"{args.fetches} fetches of one {args.mb:g} MB PDF")
+    server.reset()
+    t0 = time.perf_counter()
+    for _ in range(args.fetches):
+        legacy_fetch(url)
+    report("requests.get().content (before)", server, time.perf_counter() - t0)
+    server.reset()
+    t0 = time.perf_counter()
+    for _ in range(args.fetches):
+        uncached.fetch_bytes(url)
+    report("pdf_fetch, no cache", server, time.perf_counter() - t0)
+    server.reset()
+    t0 = time.perf_counter()
+    for _ in range(args.fetches):
+        fetcher.fetch_bytes(url)
+    report("pdf_fetch, cache + conditional GET", server, time.perf_counter() - t0)
+
+    print(f"\npeak Python memory fetching the {args.mb:g} MB PDF")
+    for name, fn in [
+        ("requests.get().content (before)", lambda: legacy_fetch(url)),
+        ("pdf_fetch.fetch (file-backed)", lambda: uncached.fetch(url).close()),
+    ]:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"  {name:<34} {peak / 1e6:7.1f} MB")
+
+    print("\nsize cap")
+    small = PDFFetcher(max_bytes=int(args.mb / 2 * (1 << 20)))
+    for name, target in [("with Content-Length", url), ("without Content-Length", f"{server.url}/chunked/big.pdf")]:
+        server.reset()
+        t0 = time.perf_counter()
+        try:
+            small.fetch_bytes(target)
+            outcome = "accepted (unexpected)"
+        except PDFTooLargeError as e:
+            outcome = f"rejected: {e}"
+        print(f"  {name:<24} {time.perf_counter() - t0:6.2f}s  {server.bytes_sent / 1e6:6.1f} MB sent  {outcome}")
+
+    urls = [f"{server.url}/paper/p{i}.pdf" for i in range(args.papers)]
+    print(f"\n{args.papers} different PDFs of {args.mb / 4:g} MB")
+    server.reset()
+    t0 = time.perf_counter()
+    for u in urls:
+        legacy_fetch(u)
+    report("one after another (before)", server, time.perf_counter() - t0)
+    server.reset()
+    t0 = time.perf_counter()
+    with Prefetcher(uncached, urls, workers=args.workers, ahead=args.papers) as pre:
+        for u in urls:
+            pre.get(u).close()
+    report(f"Prefetcher, {args.workers} workers", server, time.perf_counter() - t0)
+    server.httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
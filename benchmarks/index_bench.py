@@ -0,0 +1,186 @@
+# index_bench.py
+# Cross-paper queries over many extractions: paper_index.PaperIndex against scanning every
+# stored extraction (what answering "which papers use CIFAR-10 since 2020" took before).
+#
+# Usage:
+#   python benchmarks/index_bench.py [--papers 50000] [--queries 200] [--limit 100] [--adds 200]
+#       [--check] [--max-p95-ms 50]
+#
+# The extractions are synthetic: datasets and method headings drawn with a skewed popularity
+# from a fixed vocabulary, each written in a few spellings ("CIFAR-10", "cifar10 dataset"),
+# venues in long and short forms, years 2010-2024. Reported: bulk build time and index size,
+# single-paper add() latency on the full index (new papers and replacements), and per query
+# type the p50 / p95 latency of the index for the first --limit papers (the API default) next
+# to one full scan of the parsed extractions held in memory (the scan never touches disk, so
+# it flatters the old way). One query per type is also run without a limit and compared with
+# the scan. --check exits with status 1 when they return different papers or a p95 is over
+# --max-p95-ms.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from paper_index import PaperIndex, dataset_key, method_key, venue_key  # noqa: E402
+
+DATASETS = ["CIFAR-10", "CIFAR-100", "ImageNet", "MNIST", "SQuAD", "GLUE", "COCO", "WikiText-103",
+            "Penn Treebank", "LibriSpeech", "Cityscapes", "ShapeNet", "MS MARCO", "SST-2", "Kinetics-400"]
+VENUES = ["NeurIPS", "Advances in Neural Information Processing Systems", "ICML",
+          "Proceedings of the International Conference on Machine Learning", "ICLR", "CVPR",
+          "IEEE/CVF Conference on Computer Vision and Pattern Recognition (CVPR)", "ACL", "EMNLP",
+          "AAAI", "arXiv preprint", "TMLR"]
+WORDS = ["graph", "contrastive", "sparse", "adaptive", "latent", "diffusion", "attention", "token",
+         "memory", "hierarchical", "federated", "causal", "spectral", "bayesian", "robust", "neural",
+         "kernel", "policy", "retrieval", "quantized"]
+NOUNS = ["pruning", "distillation", "encoder", "routing", "sampling", "regularization", "alignment",
+         "augmentation", "decoding", "optimization"]
+
+
+def spell(name, rng):
+    """One of the ways a paper writes a name"""
+    r = rng.random()
+    if r < 0.2:
+        return name.lower().replace("-", "")
+    if r < 0.35:
+        return name + " dataset"
+    if r < 0.45:
+        return name.replace("-", " ")
+    return name
+
+
+def vocabularies(rng):
+    datasets = DATASETS + [f"{rng.choice(WORDS).capitalize()}{rng.choice(['Bench', 'QA', 'Net', 'Set'])}-{i}"
+                           for i in range(2000)]
+    methods = [f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {rng.choice(NOUNS)}" for _ in range(5000)]
+    return datasets, methods
+
+
+def skewed(rng, items, k):
+    """k distinct items, low indexes much more likely (a few datasets / methods are everywhere)"""
+    out = set()
+    while len(out) < k:
+        out.add(items[min(len(items) - 1, int(rng.paretovariate(0.6)) - 1)])
+    return list(out)
+
+
+def extraction(i, rng, datasets, methods):
+    year = rng.randint(2010, 2024)
+    return f"{i:064x}", {
+        "title": f"Paper {i}",
+        "venue": f"{rng.choice(VENUES)} {year}",
+        "year": year,
+        "datasets": [{"name": spell(d, rng), "page": rng.randint(1, 12), "quote": f"we evaluate on {d}"}
+                     for d in skewed(rng, datasets, rng.randint(2, 6))],
+        "methods": [{"heading": h, "explanation": "", "page": rng.randint(1, 12), "quote": ""}
+                    for h in skewed(rng, methods, rng.randint(2, 5))],
+    }
+
+
+def scan(corpus, dataset=None, method=None, venue=None, since=None, until=None):
+    """Papers matching every filter, by reading each extraction (the old way)"""
+    want_d = dataset_key(dataset) if dataset else None
+    want_m = method_key(method) if method else None
+    want_v = venue_key(venue) if venue else None
+    hits = set()
+    for doc_hash, merged in corpus:
+        year = merged.get("year")
+        if since is not None and (year is None or year < since):
+            continue
+        if until is not None and (year is None or year > until):
+            continue
+        if want_v and venue_key(merged.get("venue")) != want_v:
+            continue
+        if want_d and not any(dataset_key(d["name"]) == want_d for d in merged["datasets"]):
+            continue
+        if want_m and not any(method_key(m["heading"]) == want_m for m in merged["methods"]):
+            continue
+        hits.add(doc_hash)
+    return hits
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cross-paper index vs scanning every extraction")
+    ap.add_argument("--papers", type=int, default=50000)
+    ap.add_argument("--queries", type=int, default=200, help="index queries per query type")
+    ap.add_argument("--limit", type=int, default=100, help="papers per timed query")
+    ap.add_argument("--adds", type=int, default=200, help="single add() calls on the full index")
+    ap.add_argument("--max-p95-ms", type=float, default=50)
+    ap.add_argument("--check", action="store_true", help="exit with status 1 on a failure")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    datasets, methods = vocabularies(rng)
+    corpus = [extraction(i, rng, datasets, methods) for i in range(args.papers)]
+    failures = []
+
+    with tempfile.TemporaryDirectory(prefix="index_bench_") as tmp:
+        path = os.path.join(tmp, "paper_index.sqlite3")
+        index = PaperIndex(path)
+        t0 = time.perf_counter()
+        for i in range(0, len(corpus), 1000):
+            index.add_many(corpus[i:i + 1000])
+        build_s = time.perf_counter() - t0
+        size_mb = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)) / 1e6
+        print(f"build   {args.papers} papers in {build_s:.1f}s ({args.papers / build_s:.0f} papers/s), {size_mb:.0f} MB")
+
+        adds = []
+        for j in range(args.adds):
+            # half new papers, half re-extractions of indexed ones
+            doc_hash, merged = extraction(args.papers + j, rng, datasets, methods)
+            if j % 2:
+                doc_hash = corpus[rng.randrange(len(corpus))][0]
+            t0 = time.perf_counter()
+            index.add(doc_hash, merged)
+            adds.append((time.perf_counter() - t0) * 1e3)
+            corpus.append((doc_hash, merged))
+        print(f"add     p50 {pct(adds, 0.5):.2f} ms  p95 {pct(adds, 0.95):.2f} ms  (on the full index)\n")
+        # re-extracted papers now count with their latest extraction only
+        corpus = list(dict(corpus).items())
+
+        cases = [
+            ("dataset + since", lambda: {"dataset": spell(rng.choice(DATASETS), rng), "since": 2020}),
+            ("rare dataset", lambda: {"dataset": rng.choice(datasets[len(DATASETS):])}),
+            ("method", lambda: {"method": rng.choice(methods[:200])}),
+            ("venue + years", lambda: {"venue": rng.choice(VENUES), "since": 2018, "until": 2021}),
+            ("dataset + method", lambda: {"dataset": rng.choice(DATASETS), "method": rng.choice(methods[:20])}),
+        ]
+        print(f"{'query':<18} {'hits':>7} {'index p50':>10} {'index p95':>10} {'unlimited':>10} {'scan':>9}")
+        for name, make in cases:
+            times = []
+            for _ in range(args.queries):
+                q = make()
+                t0 = time.perf_counter()
+                index.query(limit=args.limit, **q)
+                times.append((time.perf_counter() - t0) * 1e3)
+            t0 = time.perf_counter()
+            found = index.query(limit=len(corpus), **q)
+            full_ms = (time.perf_counter() - t0) * 1e3
+            t0 = time.perf_counter()
+            expected = scan(corpus, **q)
+            scan_ms = (time.perf_counter() - t0) * 1e3
+            if {h["doc_hash"] for h in found} != expected:
+                failures.append(f"{name} {q}: index returned {len(found)} papers, scan {len(expected)}")
+            p95 = pct(times, 0.95)
+            if p95 > args.max_p95_ms:
+                failures.append(f"{name}: p95 {p95:.1f} ms > {args.max_p95_ms} ms")
+            print(f"{name:<18} {len(found):>7} {pct(times, 0.5):>7.2f} ms {p95:>7.2f} ms "
+                  f"{full_ms:>7.1f} ms {scan_ms:>6.0f} ms")
+        index.close()
+
+    print(f"\n{len(failures)} failures" + "".join(f"\n  {f}" for f in failures))
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
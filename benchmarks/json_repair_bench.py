@@ -0,0 +1,319 @@
+# json_repair_bench.py
+# Recovery rate and speed of the tolerant JSON parser on a fuzz corpus of malformed model
+# output, next to the original parser (first "{" to last "}" + json.loads).
+#
+# Usage:
+#   python benchmarks/json_repair_bench.py [--samples 200] [--seed 0] [--dump corpus.jsonl]
+#       [--stream-samples 30] [--check]
+#
+# The corpus is generated from valid extraction objects by applying one defect each (the
+# ones seen from chat models: fences, prose, trailing commas, truncation, single quotes, ...).
+# "parsed" = an object came back; "fields" = share of top-level fields equal to the original.
+# Truncated samples cannot recover everything, only what was complete before the cut.
+#
+# Streaming: parse_partial() is run on every prefix of --stream-samples answers and compared
+# with what was complete at that point (every finished member, and the finished items of a
+# list still being written, e.g. all of them right after "],"). Then one ~6.6 KB answer is
+# fed in 4-character deltas to the previous stream reporter (a full parse on every delta
+# holding "," "}" or "]") and to json_repair.PartialJSON, reporting parses and CPU time.
+# --check exits with status 1 on a wrong prefix or when PartialJSON misses the full object.
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_repair import PartialJSON, loads_lenient, parse_partial  # noqa: E402
+
+_WORDS = ("graph attention network benchmark dataset accuracy we propose a novel method for "
+          "semantic segmentation using transformers results show large improvements").split()
+
+
+def legacy_parse(s):
+    """The original parse_json_loose"""
+    text = s.strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```[\w]*", "", text)
+        text = text.rsplit("```", 1)[0]
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end == -1 or end <= start:
+        raise ValueError("No JSON object found in model output.")
+    return json.loads(text[start:end + 1])
+
+
+def _phrase(rng, n):
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+
+def sample_extraction(rng):
+    def headed():
+        return [{"heading": _phrase(rng, 3), "explanation": _phrase(rng, 12), "page": rng.randint(1, 12),
+                 "quote": _phrase(rng, 10)} for _ in range(rng.randint(0, 3))]
+    return {
+        "title": _phrase(rng, 6).title(),
+        "venue": rng.choice([None, "NeurIPS", "CVPR", "ACL"]),
+        "year": rng.choice([None, 2019, 2021, 2023]),
+        "datasets": [{"name": rng.choice(["CIFAR-10", "ImageNet", "COCO"]), "page": rng.randint(1, 12),
+                      "quote": _phrase(rng, 8)} for _ in range(rng.randint(0, 2))],
+        "limitations_addressed": headed(),
+        "contributions": headed(),
+        "methods": headed(),
+        "paper_limitations": headed(),
+        "evidence": [{"page": rng.randint(1, 12), "quote": _phrase(rng, 8)} for _ in range(rng.randint(0, 3))],
+    }
+
+
+# --------------------------
+# Defects
+# --------------------------
+def fence(rng, obj):
+    return "```json\n" + json.dumps(obj, indent=2) + "\n```"
+
+
+def prose(rng, obj):
+    return "Here is the extracted information:\n" + json.dumps(obj) + "\nLet me know if you need anything else! {}"
+
+
+def trailing_commas(rng, obj):
+    return re.sub(r"(\]|\}|\"|\d|null)(\s*[\]\}])", r"\1,\2", json.dumps(obj, indent=2))
+
+
+def missing_commas(rng, obj):
+    return json.dumps(obj, indent=2).replace(",\n", "\n")
+
+
+def single_quotes(rng, obj):
+    return json.dumps(obj).replace('"', "'")
+
+
+def python_literals(rng, obj):
+    return json.dumps(obj).replace("null", "None").replace("true", "True").replace("false", "False")
+
+
+def bare_keys(rng, obj):
+    return re.sub(r'"(\w+)":', r"\1:", json.dumps(obj, indent=2))
+
+
+def comments(rng, obj):
+    return json.dumps(obj, indent=2).replace("\n", "  // note\n", 3)
+
+
+def inner_quotes(rng, obj):
+    # obj is changed in place: it is also the expected result
+    obj["title"] = obj["title"] + ' "Revisited" edition'
+    return json.dumps(obj).replace('\\"', '"')
+
+
+def raw_newlines(rng, obj):
+    obj["title"] = obj["title"].replace(" ", "\n", 1)
+    return json.dumps(obj).replace("\\n", "\n")
+
+
+def truncated(rng, obj):
+    text = json.dumps(obj, indent=2)
+    return text[:rng.randint(len(text) // 3, len(text) - 2)]
+
+
+DEFECTS = [fence, prose, trailing_commas, missing_commas, single_quotes, python_literals,
+           bare_keys, comments, inner_quotes, raw_newlines, truncated]
+
+
+def build_corpus(n, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(n):
+        obj = sample_extraction(rng)
+        defect = DEFECTS[i % len(DEFECTS)]
+        corpus.append({"defect": defect.__name__, "raw": defect(rng, obj), "expected": obj})
+    return corpus
+
+
+def field_share(parsed, expected):
+    if not isinstance(parsed, dict):
+        return 0.0
+    return sum(parsed.get(k) == v for k, v in expected.items()) / len(expected)
+
+
+def score(parse, corpus):
+    out = {}
+    for case in corpus:
+        row = out.setdefault(case["defect"], {"n": 0, "parsed": 0, "fields": 0.0})
+        row["n"] += 1
+        try:
+            parsed = parse(case["raw"])
+        except ValueError:
+            continue
+        row["parsed"] += 1
+        row["fields"] += field_share(parsed, case["expected"])
+    return out
+
+
+# --------------------------
+# Streaming
+# --------------------------
+def _closed(value):
+    # a number or literal at the very end may still grow ("20" -> "2020"), a closed string
+    # or container cannot
+    return isinstance(value, (str, list, dict))
+
+
+def serialize_with_offsets(obj):
+    """json.dumps(obj) and, per top-level member, (key, value, value start, value end, items)
+    where items are (item, end) for a list value"""
+    parts, pos, members = ["{"], 1, []
+    for i, (key, value) in enumerate(obj.items()):
+        head = (", " if i else "") + json.dumps(key) + ": "
+        parts.append(head)
+        pos += len(head)
+        start, items = pos, []
+        if isinstance(value, list):
+            parts.append("[")
+            pos += 1
+            for j, item in enumerate(value):
+                text = (", " if j else "") + json.dumps(item)
+                parts.append(text)
+                pos += len(text)
+                items.append((item, pos))
+            parts.append("]")
+            pos += 1
+        else:
+            parts.append(json.dumps(value))
+            pos += len(parts[-1])
+        members.append((key, value, start, pos, items))
+    parts.append("}")
+    return "".join(parts), members
+
+
+def complete_prefix(members, cut):
+    """What parse_partial should return for the first `cut` characters"""
+    out = {}
+    for key, value, start, end, items in members:
+        if end < cut or (end == cut and _closed(value)):
+            out[key] = value
+            continue
+        if isinstance(value, list) and start < cut:
+            out[key] = [item for item, e in items if e < cut or (e == cut and _closed(item))]
+        break
+    return out
+
+
+def check_prefixes(objs):
+    """(prefixes checked, [(text, got, expected)] for the wrong ones)"""
+    n, wrong = 0, []
+    for obj in objs:
+        text, members = serialize_with_offsets(obj)
+        for cut in range(len(text) + 1):
+            got, expected = parse_partial(text[:cut]), complete_prefix(members, cut)
+            n += 1
+            if got != expected:
+                wrong.append((text[:cut], got, expected))
+    return n, wrong
+
+
+def legacy_stream(text, step):
+    """The previous stream reporter: a full parse on every delta holding , } or ]"""
+    parses, last = 0, None
+    for end in range(step, len(text) + step, step):
+        delta = text[end - step:end]
+        if "}" in delta or "]" in delta or "," in delta:
+            last = parse_partial(text[:end])
+            parses += 1
+    return parses, last
+
+
+def incremental_stream(text, step):
+    partial, parses, last = PartialJSON(), 0, None
+    for end in range(step, len(text) + step, step):
+        obj = partial.feed(text[:end])
+        if obj is not None:
+            parses, last = parses + 1, obj
+    return parses, last
+
+
+def long_answer(rng, size=6600):
+    obj = sample_extraction(rng)
+    while len(json.dumps(obj)) < size:
+        extra = sample_extraction(rng)
+        for key in ("datasets", "contributions", "methods", "paper_limitations", "evidence"):
+            obj[key].extend(extra[key])
+    return obj
+
+
+def time_per_parse(parse, texts, repeat=5):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            try:
+                parse(text)
+            except ValueError:
+                pass
+    return (time.perf_counter() - t0) / (repeat * len(texts)) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description="JSON repair recovery rate and parse speed")
+    ap.add_argument("--samples", type=int, default=220)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--dump", help="also write the corpus to this JSONL file")
+    ap.add_argument("--stream-samples", type=int, default=30, help="answers whose every prefix is parsed")
+    ap.add_argument("--check", action="store_true", help="exit with status 1 on a failure")
+    args = ap.parse_args()
+
+    corpus = build_corpus(args.samples, args.seed)
+    if args.dump:
+        with open(args.dump, "w", encoding="utf-8") as f:
+            for case in corpus:
+                f.write(json.dumps(case, ensure_ascii=False) + "\n")
+
+    def lenient(text):
+        return loads_lenient(text)[0]
+
+    old, new = score(legacy_parse, corpus), score(lenient, corpus)
+    print(f"{'defect':<16} {'n':>4} {'old parsed':>11} {'old fields':>11} {'new parsed':>11} {'new fields':>11}")
+    totals = [0, 0, 0.0, 0, 0.0]
+    for name in old:
+        o, w = old[name], new[name]
+        print(f"{name:<16} {o['n']:>4} {o['parsed'] / o['n']:>11.0%} {o['fields'] / o['n']:>11.0%} "
+              f"{w['parsed'] / w['n']:>11.0%} {w['fields'] / w['n']:>11.0%}")
+        for i, v in enumerate((o["n"], o["parsed"], o["fields"], w["parsed"], w["fields"])):
+            totals[i] += v
+    n = totals[0]
+    print(f"{'all':<16} {n:>4} {totals[1] / n:>11.0%} {totals[2] / n:>11.0%} {totals[3] / n:>11.0%} {totals[4] / n:>11.0%}")
+
+    valid = [json.dumps(case["expected"]) for case in corpus]
+    broken = [case["raw"] for case in corpus]
+    print(f"\nparse time, valid JSON:     old {time_per_parse(legacy_parse, valid):7.1f} us   new {time_per_parse(lenient, valid):7.1f} us")
+    print(f"parse time, malformed JSON: old {time_per_parse(legacy_parse, broken):7.1f} us   new {time_per_parse(lenient, broken):7.1f} us")
+
+    failures = []
+    rng = random.Random(args.seed)
+    n, wrong = check_prefixes([sample_extraction(rng) for _ in range(args.stream_samples)])
+    print(f"\nstreaming prefixes: {n - len(wrong)}/{n} parsed to exactly their complete part")
+    for text, got, expected in wrong[:3]:
+        print(f"    ...{text[-40:]!r}\n      got      {got}\n      expected {expected}")
+    if wrong:
+        failures.append(f"{len(wrong)} streaming prefixes parsed wrong")
+
+    obj = long_answer(rng)
+    text = json.dumps(obj)
+    print(f"streaming one {len(text) / 1000:.1f} KB answer in 4-character deltas:")
+    for name, stream in [("parse on every delta (before)", legacy_stream), ("PartialJSON", incremental_stream)]:
+        t0 = time.process_time()
+        parses, last = stream(text, 4)
+        cpu = time.process_time() - t0
+        print(f"  {name:<30} {parses:>5} parses {cpu * 1e3:>8.1f} ms CPU")
+        if last != obj:
+            failures.append(f"{name}: last partial is not the full object")
+
+    print(f"\n{len(failures)} failures" + "".join(f"\n  {f}" for f in failures))
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# memory_bench.py
+# Peak memory of one large PDF given to the pipeline as bytes vs as a file path.
+#
+# Usage:
+#   python benchmarks/memory_bench.py [--pages 300] [--image-kb 320] [--workers 4]
+#       [--save-baseline] [--check] [--max-heap-ratio 0.25]
+#
+# The PDF is a synthetic paper whose pages each draw a random-pixel image (--image-kb), so it
+# is as large as scanned proceedings (~96 MB by default) while its text stays small. Every
+# scenario runs in a fresh interpreter, so peaks do not leak from one into the next:
+#   pages_bytes_list    whole file read into bytes, pages kept as a list of str (the old path)
+#   pages_file_packed   file path (memory-mapped), pages kept as PackedPages
+#   paper_bytes         process_paper() on the bytes, fake model, no cache / store
+#   paper_file          process_paper() on the path
+# Reported per scenario: heap_peak_mb / heap_kept_mb (tracemalloc: peak, and what is still
+# held next to the result), anon_peak_mb (anonymous RSS sampled from /proc, Linux only; file
+# pages of the mapping are shared page cache and not counted) and maxrss_mb.
+#
+# --check fails when a file-input scenario's heap peak exceeds --max-heap-ratio of the PDF
+# size (the file must not end up on the heap) or when a metric regressed against the stored
+# baseline (benchmarks/baselines/memory_bench.json, heap figures, compared as in pipeline_bench.py).
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+BASELINE_PATH = os.path.join(HERE, "baselines", "memory_bench.json")
+SCENARIOS = ["pages_bytes_list", "pages_file_packed", "paper_bytes", "paper_file"]
+
+
+class AnonSampler:
+    """Highest RssAnon of this process, sampled every few ms (None where /proc is missing)"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def read():
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("RssAnon:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+
+    def _run(self):
+        while not self._stop.is_set():
+            value = self.read()
+            if value is None:
+                return
+            self.peak = max(self.peak or 0, value)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_scenario(name, path, workers):
+    """One scenario in this process; returns its metrics"""
+    from pdf_utils import PackedPages, iter_pdf_pages
+
+    if name.startswith("paper_"):
+        import pipeline
+        from pipeline_bench import FakeChatModel
+        pipeline.set_model(FakeChatModel(latency_ms=5, tokens_per_s=1e6))
+
+    baseline_anon = AnonSampler.read()
+    tracemalloc.start()
+    with AnonSampler() as anon:
+        if name == "pages_bytes_list":
+            with open(path, "rb") as f:
+                data = f.read()
+            kept = (data, list(iter_pdf_pages(data)))
+        elif name == "pages_file_packed":
+            kept = PackedPages(iter_pdf_pages(path))
+        else:
+            if name == "paper_bytes":
+                with open(path, "rb") as f:
+                    source = f.read()
+            else:
+                source = path
+            kept = (source, pipeline.process_paper(
+                source, reuse_stored=False, update_store=False, use_cache=False,
+                merge_mode="local", retrieval_mode="off", summary_mode="map_reduce", max_workers=workers,
+            ))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    row = {"heap_peak_mb": peak / 1e6, "heap_kept_mb": current / 1e6,
+           "maxrss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3}
+    if anon.peak is not None and baseline_anon is not None:
+        row["anon_peak_mb"] = (anon.peak - baseline_anon) / 1e6
+    return row
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Peak memory of a large PDF as bytes vs as a file")
+    ap.add_argument("--pages", type=int, default=300)
+    ap.add_argument("--image-kb", type=int, default=320, help="random-pixel image per page")
+    ap.add_argument("--workers", type=int, default=4, help="model calls in flight (paper_* scenarios)")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--max-heap-ratio", type=float, default=0.25,
+                    help="--check: largest heap peak of a file-input scenario, as a fraction of the PDF size")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative growth before flagging")
+    ap.add_argument("--check", action="store_true", help="exit with status 1 on a regression")
+    ap.add_argument("--run", help=argparse.SUPPRESS)
+    ap.add_argument("--pdf", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run:
+        # child process: one scenario, metrics as JSON on stdout
+        print(json.dumps(run_scenario(args.run, args.pdf, args.workers)))
+        return
+
+    from pipeline_bench import compare
+
+    config = {"pages": args.pages, "image_kb": args.image_kb, "workers": args.workers}
+    with tempfile.TemporaryDirectory(prefix="memory_bench_") as tmp:
+        path = os.path.join(tmp, "proceedings.pdf")
+        # written by another process too: Linux keeps ru_maxrss across fork + exec, so a parent
+        # that once held the PDF would raise every child's max RSS
+        subprocess.run([sys.executable, os.path.join(HERE, "synthetic_pdf.py"), "--pages", str(args.pages),
+                        "--image-kb", str(args.image_kb), "--out", path], check=True, capture_output=True)
+        pdf_mb = os.path.getsize(path) / 1e6
+        print(f"{args.pages} pages, {pdf_mb:.1f} MB PDF\n")
+        print(f"{'scenario':<20} {'heap peak':>10} {'heap kept':>10} {'anon peak':>10} {'max RSS':>10} {'time':>7}")
+        current = {}
+        for name in args.scenarios.split(","):
+            t0 = time.perf_counter()
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run", name, "--pdf", path, "--workers", str(args.workers)],
+                check=True, capture_output=True, text=True,
+                env={**os.environ, "LLM_CACHE_ENABLED": "0", "PAPER_STORE_ENABLED": "0", "PAPER_INDEX_ENABLED": "0"},
+            ).stdout
+            current[name] = row = json.loads(out.strip().splitlines()[-1])
+            anon = f"{row['anon_peak_mb']:.1f} MB" if "anon_peak_mb" in row else "n/a"
+            print(f"{name:<20} {row['heap_peak_mb']:>7.1f} MB {row['heap_kept_mb']:>7.1f} MB {anon:>10} "
+                  f"{row['maxrss_mb']:>7.0f} MB {time.perf_counter() - t0:>6.1f}s", flush=True)
+
+    regressions = [
+        f"{name} heap_peak_mb: {row['heap_peak_mb']:.1f} MB is over {args.max_heap_ratio:.0%} of the {pdf_mb:.1f} MB PDF"
+        for name, row in current.items()
+        if "_file" in name and row["heap_peak_mb"] > args.max_heap_ratio * pdf_mb
+    ]
+    # RSS includes the interpreter and varies between machines and the sampled anon peak jitters;
+    # the baseline compares the tracemalloc figures, which repeat from run to run
+    compared = {name: {k: v for k, v in row.items() if k.startswith("heap_")} for name, row in current.items()}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": compared}, f, indent=2)
+        print(f"\nbaseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"\nbaseline {args.baseline} was recorded with other settings {baseline.get('config')}, not compared")
+        else:
+            regressions += compare(compared, baseline["results"], args.tolerance)
+    else:
+        print(f"\nno baseline at {args.baseline} (run with --save-baseline to record one)")
+    print(f"\n{len(regressions)} regressions" + "".join(f"\n  {r}" for r in regressions))
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
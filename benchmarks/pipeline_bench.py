@@ -0,0 +1,416 @@
+# pipeline_bench.py
+# End-to-end pipeline benchmark on synthetic PDFs with a deterministic fake chat model, so
+# performance can be measured without an API key or quota. Results are compared against a
+# stored baseline to catch regressions.
+#
+# Usage:
+#   python benchmarks/pipeline_bench.py [--sizes 5,50,500] [--repeat 3] [--workers 4]
+#       [--latency-ms 50] [--tokens-per-s 2000] [--failure-rate 0.02] [--malformed-rate 0.1]
+#       [--save-baseline] [--check] [--check-timings] [--timing-runs 3] [--json results.json]
+#
+# For every paper size it reports:
+#   - end to end (process_paper, local merge): papers/min, pages/s, p50/p95 wall time per
+#     paper, p50/p95 latency per model call and per chunk, model calls, retries, tokens
+#   - peak Python memory of one run (tracemalloc, separate pass so timings are not slowed)
+#   - the model-free stages on their own, p50/p95 over repeats: read_pdf_bytes, chunk_pages,
+#     parse_json_loose over the fake answers, and the dedupe helpers + local merge
+#
+# The fake model sleeps latency (+/- jitter) plus output tokens / tokens-per-s, fails with a
+# retryable 503 at failure-rate and wraps, pads or truncates its JSON at malformed-rate. All
+# of it is seeded per prompt and attempt, so call counts, retries and the merged result are
+# the same on every run; only the timings vary.
+#
+# Baselines live in benchmarks/baselines/pipeline_bench.json. --check gates on the counts
+# (pages, chunks, model calls, retries, tokens, merged items), which must match exactly and
+# are the same on every machine. Timings and memory are reported next to the baseline but
+# only gated with --check-timings: then the whole benchmark runs --timing-runs times, the
+# best value of each metric is kept, and it is flagged when worse by more than --tolerance
+# (and by more than a small absolute noise floor). One run on a busy machine is not enough
+# to call a slowdown. Timings depend on the machine, so save a baseline on the machine you
+# compare on.
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# no response cache / paper store / paper index (they would turn repeats into lookups or
+# write to the real files) and short backoff sleeps so injected failures cost retries, not
+# seconds; set before config is imported
+os.environ["LLM_CACHE_ENABLED"] = "0"
+os.environ["PAPER_STORE_ENABLED"] = "0"
+os.environ["PAPER_INDEX_ENABLED"] = "0"
+os.environ.setdefault("LLM_BACKOFF_BASE", "0.05")
+os.environ.setdefault("LLM_BACKOFF_MAX", "0.5")
+
+import pipeline  # noqa: E402
+from pdf_utils import chunk_pages, estimate_tokens, read_pdf_bytes  # noqa: E402
+from synthetic_pdf import make_pdf  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "pipeline_bench.json")
+
+# direction of each reported metric; "exact" ones are deterministic and must not change
+METRICS = {
+    "pages": "exact", "chunks": "exact", "model_calls": "exact", "retries": "exact",
+    "tokens_in": "exact", "tokens_out": "exact", "merged_items": "exact",
+    "papers_per_min": "higher", "pages_per_s": "higher",
+    "paper_p50_s": "lower", "paper_p95_s": "lower",
+    "call_p50_s": "lower", "call_p95_s": "lower", "chunk_p50_s": "lower", "chunk_p95_s": "lower",
+    "peak_mem_mb": "lower",
+    "read_pdf_p50_ms": "lower", "read_pdf_p95_ms": "lower",
+    "chunk_pages_p50_ms": "lower", "chunk_pages_p95_ms": "lower",
+    "parse_json_p50_ms": "lower", "parse_json_p95_ms": "lower",
+    "merge_p50_ms": "lower", "merge_p95_ms": "lower",
+}
+
+# changes smaller than this (in the metric's unit) are timer / scheduler noise, never flagged
+NOISE_FLOOR = {"_ms": 5.0, "_s": 0.02, "_mb": 1.0}
+
+_PAGE_RE = re.compile(r"^Page (\d+)$", re.MULTILINE)
+_DATASET_RE = re.compile(r"We evaluate on the (.+?) dataset\.")
+_METHOD_RE = re.compile(r"We propose (.+?) for this setting\.")
+_LIMIT_RE = re.compile(r"A limitation is: (.+?)\.")
+_VENUE_RE = re.compile(r"Published at (\w+) (\d{4})\.")
+
+
+class FakeServiceError(Exception):
+    """Looks like a transient server error to rate_limit.is_retryable"""
+
+
+class _Reply:
+    def __init__(self, content, usage):
+        self.content = content
+        self.usage_metadata = usage
+
+
+class FakeChatModel:
+    """Deterministic stand-in for the chat model, answering every prompt template of the pipeline"""
+
+    def __init__(self, latency_ms=50, tokens_per_s=2000, failure_rate=0.0, malformed_rate=0.0, jitter=0.2,
+                 seed=0):
+        self.latency_ms = latency_ms
+        self.tokens_per_s = tokens_per_s
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self.jitter = jitter
+        self.seed = seed
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._attempts = {}
+        self.failures = 0
+        self.replies = []
+
+    def invoke(self, prompt):
+        key = zlib.crc32(prompt.encode("utf-8"))
+        with self._lock:
+            attempt = self._attempts[key] = self._attempts.get(key, 0) + 1
+        rng = random.Random(f"{self.seed}:{key}:{attempt}")
+        latency = self.latency_ms / 1000 * (1 + rng.uniform(-self.jitter, self.jitter))
+        if rng.random() < self.failure_rate:
+            time.sleep(latency)
+            with self._lock:
+                self.failures += 1
+            raise FakeServiceError("503 Service Unavailable (injected)")
+        text = self._answer(prompt, rng)
+        tokens_out = estimate_tokens(text)
+        time.sleep(latency + tokens_out / self.tokens_per_s)
+        with self._lock:
+            self.replies.append(text)
+        return _Reply(text, {"input_tokens": estimate_tokens(prompt), "output_tokens": tokens_out})
+
+    # --------------------------
+    # Answers
+    # --------------------------
+    def _answer(self, prompt, rng):
+        if "expert academic information extractor" in prompt:
+            obj = _extract(_body(prompt))
+            if '"section_summary"' in prompt:
+                obj["section_summary"] = "These pages describe the method, the datasets and the results."
+            return self._maybe_malformed(json.dumps(obj), rng)
+        if "expert data merger" in prompt:
+            partials = json.loads(prompt.split("Partials:", 1)[1])
+            return json.dumps(partials[0] if partials else {})
+        if "expert editor of structured JSON" in prompt:
+            return prompt.split("Merged extraction:", 1)[1].strip()
+        if "one part (pages" in prompt:
+            return "This part evaluates the proposed method on standard datasets and reports its limitations."
+        return "**Abstract/Overview**: A synthetic paper about scaling a known method.\n" * 7
+
+    def _maybe_malformed(self, text, rng):
+        if rng.random() >= self.malformed_rate:
+            return text
+        defect = rng.choice(["fence", "prose", "trailing_comma", "truncated"])
+        if defect == "fence":
+            return f"```json\n{text}\n```"
+        if defect == "prose":
+            return f"Here is the extracted information:\n{text}\nLet me know if you need more."
+        if defect == "trailing_comma":
+            return text[:-1] + ",}"
+        return text[:int(len(text) * 0.8)]
+
+
+def _body(prompt):
+    """The chunk / passages text of an extraction prompt"""
+    for marker in ("CHUNK TEXT:\n---\n", "PASSAGES:\n---\n"):
+        if marker in prompt:
+            return prompt.split(marker, 1)[1].rsplit("\n---", 1)[0]
+    return ""
+
+
+def _extract(text):
+    """What a careful model would return for a chunk of a synthetic paper"""
+    out = {"title": None, "venue": None, "year": None, "datasets": [], "limitations_addressed": [],
+           "contributions": [], "methods": [], "paper_limitations": [], "evidence": []}
+    marks = list(_PAGE_RE.finditer(text))
+    for i, m in enumerate(marks):
+        page = int(m.group(1))
+        body = text[m.end():marks[i + 1].start() if i + 1 < len(marks) else len(text)].replace("\n", " ")
+        if page == 1:
+            lines = text[m.end():].strip().splitlines()
+            out["title"] = lines[0] if lines else None
+            venue = _VENUE_RE.search(body)
+            if venue:
+                out["venue"], out["year"] = venue.group(1), int(venue.group(2))
+        for d in _DATASET_RE.finditer(body):
+            out["datasets"].append({"name": d.group(1), "page": page, "quote": d.group(0)})
+        for meth in _METHOD_RE.finditer(body):
+            out["methods"].append({"heading": meth.group(1), "explanation": "The method proposed in the paper.",
+                                   "page": page, "quote": meth.group(0)})
+            out["evidence"].append({"page": page, "quote": meth.group(0)})
+        for lim in _LIMIT_RE.finditer(body):
+            out["paper_limitations"].append({"heading": lim.group(1), "explanation": "Stated by the authors.",
+                                             "page": page, "quote": lim.group(0)})
+    return out
+
+
+# --------------------------
+# Measurements
+# --------------------------
+def pct(values, q):
+    """q-th percentile (nearest rank) of a non-empty list"""
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values) + 0.5) - 1))]
+
+
+def timed_runs(fn, repeat):
+    fn()  # warm-up, not counted
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    return times, out
+
+
+def run_paper(model, pdf_bytes, workers, summary_mode):
+    model.reset()
+    return pipeline.process_paper(
+        pdf_bytes, reuse_stored=False, update_store=False, use_cache=False,
+        merge_mode="local", retrieval_mode="off", summary_mode=summary_mode, max_workers=workers,
+    )
+
+
+def bench_size(model, n_pages, args):
+    pdf_bytes = make_pdf(n_pages, seed=args.seed)
+    row = {}
+
+    # end to end
+    wall, results = [], []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        results.append(run_paper(model, pdf_bytes, args.workers, args.summary_mode))
+        wall.append(time.perf_counter() - t0)
+    result = results[-1]
+    calls = [sp for sp in result["trace"] if sp["name"] == "llm"]
+    chunk_spans = [sp for sp in result["trace"] if sp["name"] == "chunk"]
+    merged = result["merged"]
+    row.update(
+        pages=result["n_pages"], chunks=len(result["chunks"]), model_calls=len(calls),
+        retries=sum(sp.get("retries", 0) for sp in calls),
+        tokens_in=sum(sp.get("tokens_in") or 0 for sp in calls),
+        tokens_out=sum(sp.get("tokens_out") or 0 for sp in calls),
+        merged_items=sum(len(v) for v in merged.values() if isinstance(v, list)),
+        papers_per_min=60 / statistics.mean(wall),
+        pages_per_s=result["n_pages"] / statistics.mean(wall),
+        paper_p50_s=pct(wall, 50), paper_p95_s=pct(wall, 95),
+        call_p50_s=pct([sp["duration"] for sp in calls], 50), call_p95_s=pct([sp["duration"] for sp in calls], 95),
+        chunk_p50_s=pct([sp["duration"] for sp in chunk_spans], 50),
+        chunk_p95_s=pct([sp["duration"] for sp in chunk_spans], 95),
+    )
+    if result["failed_chunks"]:
+        print(f"  warning: {len(result['failed_chunks'])} chunks failed after retries")
+
+    # peak memory of one more run
+    tracemalloc.start()
+    run_paper(model, pdf_bytes, args.workers, args.summary_mode)
+    row["peak_mem_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+
+    # model-free stages
+    replies = list(model.replies)
+    times, pages = timed_runs(lambda: read_pdf_bytes(pdf_bytes), args.stage_repeat)
+    row["read_pdf_p50_ms"], row["read_pdf_p95_ms"] = pct(times, 50) * 1e3, pct(times, 95) * 1e3
+    times, chunks = timed_runs(lambda: chunk_pages(pages, max_tokens=pipeline.CHUNK_TOKEN_BUDGET), args.stage_repeat)
+    row["chunk_pages_p50_ms"], row["chunk_pages_p95_ms"] = pct(times, 50) * 1e3, pct(times, 95) * 1e3
+
+    def parse_all():
+        out = []
+        for text in replies:
+            try:
+                out.append(pipeline.parse_json_loose(text))
+            except ValueError:
+                pass
+        return out
+    times, _ = timed_runs(parse_all, args.stage_repeat)
+    row["parse_json_p50_ms"], row["parse_json_p95_ms"] = pct(times, 50) * 1e3, pct(times, 95) * 1e3
+    partials = result["partials"]
+    times, _ = timed_runs(lambda: pipeline.merge_partials_local(partials), args.stage_repeat)
+    row["merge_p50_ms"], row["merge_p95_ms"] = pct(times, 50) * 1e3, pct(times, 95) * 1e3
+    return row
+
+
+# --------------------------
+# Baselines
+# --------------------------
+def best_of(runs):
+    """One row per scenario from several runs: the best value of each timing / memory metric
+    (counts are the same in every run, a difference is reported as a regression)"""
+    best, problems = {}, []
+    for name in runs[0]:
+        rows = [run[name] for run in runs]
+        best[name] = row = {}
+        for metric, value in rows[0].items():
+            values = [r[metric] for r in rows]
+            kind = METRICS.get(metric, "lower")
+            if kind == "exact":
+                if len(set(values)) > 1:
+                    problems.append(f"{name} {metric} changed between runs: {values}")
+                row[metric] = value
+            else:
+                row[metric] = max(values) if kind == "higher" else min(values)
+    return best, problems
+
+
+def compare(current, baseline, tolerance, timings=False):
+    """Printed table of changes; returns the list of regressions (timings only if timings)"""
+    regressions = []
+    print(f"\n{'scenario':<10} {'metric':<20} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, row in current.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<10} (not in baseline)")
+            continue
+        for metric, value in row.items():
+            if metric not in base:
+                continue
+            old = base[metric]
+            kind = METRICS.get(metric, "lower")
+            change = (value - old) / old if old else (0.0 if value == old else float("inf"))
+            floor = next((v for suffix, v in NOISE_FLOOR.items() if metric.endswith(suffix)), 0.0)
+            if kind == "exact":
+                bad = value != old
+            elif kind == "higher":
+                bad = change < -tolerance
+            else:
+                bad = change > tolerance and value - old > floor
+            flag = ""
+            if bad and (kind == "exact" or timings):
+                regressions.append(f"{name} {metric}: {old:g} -> {value:g}")
+                flag = "  REGRESSION"
+            elif bad:
+                flag = "  slower (not gated)"
+            if bad or kind != "exact":
+                print(f"{name:<10} {metric:<20} {old:>12.4g} {value:>12.4g} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="End-to-end pipeline benchmark with a fake model and synthetic PDFs")
+    ap.add_argument("--sizes", default="5,50,500", help="paper sizes in pages")
+    ap.add_argument("--repeat", type=int, default=3, help="end-to-end runs per size")
+    ap.add_argument("--stage-repeat", type=int, default=5, help="runs per model-free stage")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--summary-mode", default="map_reduce", choices=["first_pages", "map_reduce", "fused"])
+    ap.add_argument("--latency-ms", type=float, default=50)
+    ap.add_argument("--tokens-per-s", type=float, default=2000, help="output token rate of the fake model")
+    ap.add_argument("--failure-rate", type=float, default=0.02)
+    ap.add_argument("--malformed-rate", type=float, default=0.1)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before flagging")
+    ap.add_argument("--check", action="store_true", help="exit with status 1 when a count differs from the baseline")
+    ap.add_argument("--check-timings", action="store_true",
+                    help="with --check, also gate timings and memory (best of --timing-runs runs)")
+    ap.add_argument("--timing-runs", type=int, help="whole-benchmark runs whose best timings are kept "
+                    "(default 3 with --check-timings or --save-baseline, else 1)")
+    ap.add_argument("--json", help="also write the results to this file")
+    args = ap.parse_args()
+
+    config = {k: getattr(args, k) for k in ("workers", "summary_mode", "latency_ms", "tokens_per_s",
+                                            "failure_rate", "malformed_rate", "seed")}
+    model = FakeChatModel(args.latency_ms, args.tokens_per_s, args.failure_rate, args.malformed_rate, seed=args.seed)
+    pipeline.set_model(model)
+
+    n_runs = args.timing_runs or (3 if args.check_timings or args.save_baseline else 1)
+    runs = []
+    for run in range(n_runs):
+        if n_runs > 1:
+            print(f"run {run + 1}/{n_runs}")
+        runs.append(run_sizes(model, args))
+    current, regressions = best_of(runs)
+    if n_runs > 1:
+        print(f"\nbest of {n_runs} runs kept for every timing / memory metric")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": current}, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": current}, f, indent=2)
+        print(f"\nbaseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"\nbaseline {args.baseline} was recorded with other settings {baseline.get('config')}, not compared")
+        else:
+            regressions += compare(current, baseline["results"], args.tolerance, timings=args.check_timings)
+            print(f"\n{len(regressions)} regressions" + "".join(f"\n  {r}" for r in regressions))
+    else:
+        print(f"\nno baseline at {args.baseline} (run with --save-baseline to record one)")
+    if args.check and regressions:
+        sys.exit(1)
+
+
+def run_sizes(model, args):
+    current = {}
+    for n in [int(s) for s in args.sizes.split(",")]:
+        print(f"{n} pages ...", flush=True)
+        current[f"{n}p"] = row = bench_size(model, n, args)
+        print(f"  {row['chunks']} chunks, {row['model_calls']} model calls ({row['retries']} retries), "
+              f"{row['tokens_in']} tokens in / {row['tokens_out']} out, {row['merged_items']} merged items")
+        print(f"  {row['papers_per_min']:.1f} papers/min, {row['pages_per_s']:.1f} pages/s, "
+              f"paper p50 {row['paper_p50_s']:.2f}s p95 {row['paper_p95_s']:.2f}s, "
+              f"call p50 {row['call_p50_s'] * 1e3:.0f}ms p95 {row['call_p95_s'] * 1e3:.0f}ms, "
+              f"peak {row['peak_mem_mb']:.1f} MB")
+        print(f"  read_pdf {row['read_pdf_p50_ms']:.1f}ms, chunk_pages {row['chunk_pages_p50_ms']:.2f}ms, "
+              f"parse_json {row['parse_json_p50_ms']:.2f}ms, dedupe+merge {row['merge_p50_ms']:.2f}ms (p50)")
+    return current
+
+
+if __name__ == "__main__":
+    main()
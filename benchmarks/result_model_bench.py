@@ -0,0 +1,82 @@
+# result_model_bench.py
+# Memory and serialization cost of extraction results: plain dicts + stdlib json (before)
+# against the typed result model (slotted dataclasses, orjson, compact binary form).
+#
+# Usage:
+#   python benchmarks/result_model_bench.py [--results 5000] [--seed 0]
+#
+# Results are synthetic but shaped like real merged extractions (see json_repair_bench).
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import result_model  # noqa: E402
+from json_repair_bench import sample_extraction  # noqa: E402
+from result_model import Extraction  # noqa: E402
+
+
+def held_bytes(build):
+    """Bytes still allocated by the object build() returns"""
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def timed(fn, items, repeat=3):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        out = [fn(x) for x in items]
+    return (time.perf_counter() - t0) / (repeat * len(items)) * 1e6, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Result model memory and serialization benchmark")
+    ap.add_argument("--results", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    dicts = [sample_extraction(rng) for _ in range(args.results)]
+    # json round trip so both sides hold separately allocated strings
+    raw = [json.dumps(d) for d in dicts]
+    print(f"{args.results} results, orjson {'available' if result_model.orjson else 'NOT installed (stdlib fallback)'}")
+
+    print("\nmemory held")
+    mem = {
+        "dicts": held_bytes(lambda: [json.loads(r) for r in raw]),
+        "Extraction": held_bytes(lambda: [Extraction.from_dict(json.loads(r)) for r in raw]),
+        "compact bytes": held_bytes(lambda: [Extraction.from_dict(json.loads(r)).to_compact() for r in raw]),
+    }
+    for name, size in mem.items():
+        print(f"  {name:<14} {size / 1e6:8.1f} MB  ({size / args.results:7.0f} B/result)")
+
+    objs = [Extraction.from_dict(d) for d in dicts]
+    rows = [
+        ("json.dumps indent=2 (before)", lambda d: json.dumps(d, ensure_ascii=False, indent=2).encode("utf-8"), dicts,
+         lambda b: json.loads(b)),
+        ("orjson dumps", result_model.dumps, dicts, result_model.loads),
+        ("orjson indent", lambda d: result_model.dumps(d, indent=True), dicts, result_model.loads),
+        ("Extraction.to_compact", Extraction.to_compact, objs, Extraction.from_compact),
+    ]
+    print(f"\n{'encoding':<30} {'encode us':>10} {'decode us':>10} {'avg bytes':>10}")
+    for name, encode, items, decode in rows:
+        enc_us, blobs = timed(encode, items)
+        dec_us, _ = timed(decode, blobs)
+        avg = sum(len(b) for b in blobs) / len(blobs)
+        print(f"{name:<30} {enc_us:>10.1f} {dec_us:>10.1f} {avg:>10.0f}")
+
+    us, _ = timed(Extraction.from_dict, dicts)
+    print(f"\nExtraction.from_dict (validation): {us:.1f} us/result")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# revision_bench.py
+# Cost of processing a revised paper (v1 -> v2) when v1 is in the paper store: chunk results
+# reused through revision.py against a full re-extraction of v2.
+#
+# Usage:
+#   python benchmarks/revision_bench.py [--pages 40] [--latency-ms 500] [--summary-mode map_reduce] [--check]
+#
+# v1 is a synthetic paper (synthetic_pdf.py) processed into a temporary store with the fake
+# model (pipeline_bench.FakeChatModel); each scenario then processes one revision of it:
+#   typo_fixes      a sentence changed on two pages
+#   appendix        three pages added at the end
+#   inserted_page   a page inserted in the middle (later pages move down and are renumbered)
+#   rewrite         every page changed (nothing to reuse)
+# Reported per scenario: changed pages, chunks reused / total, model calls, input tokens and
+# wall time, next to the same revision extracted from scratch. A revision reads the whole PDF
+# before its first model call (extraction from scratch overlaps the two), so with a very fast
+# model the time saved is mostly parsing. --check exits with status 1
+# when a revision's merged result differs from the one extracted from scratch, or when a
+# scenario with unchanged chunks reuses none of them.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+os.environ["LLM_CACHE_ENABLED"] = "0"
+os.environ["PAPER_STORE_ENABLED"] = "0"
+os.environ["PAPER_INDEX_ENABLED"] = "0"
+
+import pipeline  # noqa: E402
+import tracing  # noqa: E402
+from paper_store import PaperStore, page_hash  # noqa: E402
+from pipeline_bench import FakeChatModel  # noqa: E402
+from synthetic_pdf import paper_pages, pages_to_pdf  # noqa: E402
+
+
+def revisions(v1):
+    n = len(v1)
+    typo = list(v1)
+    for i in (n // 3, 2 * n // 3):
+        typo[i] = typo[i].replace(".", ", as shown in the revised version.", 1)
+    appendix = v1 + [f"Appendix {c}\n" + "Additional results on the MNIST dataset are reported here. " * 40
+                     for c in "ABC"]
+    inserted = v1[:n // 2] + ["New Section\n" + "We add an ablation on the COCO dataset. " * 50] + [
+        page.replace(f"Page {no}\n", f"Page {no + 1}\n", 1) for no, page in enumerate(v1[n // 2:], start=n // 2 + 1)
+    ]
+    rewrite = [page + "\nRevised." for page in v1]
+    return {"typo_fixes": typo, "appendix": appendix, "inserted_page": inserted, "rewrite": rewrite}
+
+
+def changed_pages(v1, v2):
+    old = {page_hash(page) for page in v1}
+    return sum(page_hash(page) not in old for page in v2)
+
+
+def run(pdf, store, summary_mode, reuse):
+    t0 = time.perf_counter()
+    result = pipeline.process_paper(pdf, store=store, reuse_stored=reuse, use_cache=False,
+                                    merge_mode="local", retrieval_mode="off", summary_mode=summary_mode)
+    result["wall"] = time.perf_counter() - t0
+    result["usage"] = tracing.usage(result["trace"])
+    return result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Revised paper: chunk reuse vs full re-extraction")
+    ap.add_argument("--pages", type=int, default=40)
+    ap.add_argument("--latency-ms", type=float, default=500, help="fake model latency per call")
+    ap.add_argument("--summary-mode", default="map_reduce", choices=["map_reduce", "fused", "first_pages"])
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--check", action="store_true", help="exit with status 1 on a failure")
+    args = ap.parse_args()
+
+    pipeline.set_model(FakeChatModel(latency_ms=args.latency_ms, tokens_per_s=1e5))
+    v1 = paper_pages(args.pages, seed=args.seed)
+    failures = []
+    print(f"{args.pages}-page paper, summary_mode={args.summary_mode}, {args.latency_ms:g} ms per model call\n")
+    print(f"{'scenario':<14} {'changed':>7} {'reused':>9} {'calls':>11} {'tokens in':>17} {'time':>15}")
+    for name, v2 in revisions(v1).items():
+        with tempfile.TemporaryDirectory(prefix="revision_bench_") as tmp:
+            store = PaperStore(tmp)
+            run(pages_to_pdf(v1), store, args.summary_mode, reuse=True)
+            pdf = pages_to_pdf(v2)
+            rev = run(pdf, store, args.summary_mode, reuse=True)
+            full = run(pdf, store, args.summary_mode, reuse=False)
+            store.close()
+        reused = sum(bool(ch.get("reused")) for ch in rev["chunks"])
+        ru, fu = rev["usage"], full["usage"]
+        print(f"{name:<14} {changed_pages(v1, v2):>3}/{len(v2):<3} {reused:>4}/{len(rev['chunks']):<4} "
+              f"{ru['llm_calls']:>4} vs {fu['llm_calls']:<4} {ru['tokens_in']:>7} vs {fu['tokens_in']:<7} "
+              f"{rev['wall']:>5.2f}s vs {full['wall']:.2f}s")
+        if json.dumps(rev["merged"], sort_keys=True) != json.dumps(full["merged"], sort_keys=True):
+            failures.append(f"{name}: merged result differs from a full re-extraction")
+        if name != "rewrite" and not reused:
+            failures.append(f"{name}: no chunk reused")
+
+    print(f"\n{len(failures)} failures" + "".join(f"\n  {f}" for f in failures))
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# startup_bench.py
+# Cold-start and per-interaction (rerun) latency of the Streamlit script, measured
+# headless with streamlit.testing.v1.AppTest.
+#
+# Usage:
+#   python benchmarks/startup_bench.py [--script main.py] [--cold-runs 5] [--reruns 20]
+#
+# To compare before/after a change, run it once per version, e.g.:
+#   git show <old-rev>:main.py > /tmp/main_old.py
+#   python benchmarks/startup_bench.py --script /tmp/main_old.py
+#   python benchmarks/startup_bench.py --script main.py
+#
+# Cold start = a fresh Python process running the script once (imports included).
+# Rerun = running the script again in the same process, which is what every widget
+# interaction costs. No model call is made: the Extract button is never clicked.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.run()
+first = time.perf_counter() - t0
+reruns = []
+for _ in range(int(sys.argv[2])):
+    t = time.perf_counter()
+    at.run()
+    reruns.append(time.perf_counter() - t)
+print(json.dumps({"cold": first, "reruns": reruns, "exception": [str(e.value) for e in at.exception]}))
+"""
+
+
+def run_child(script, reruns):
+    env = dict(os.environ)
+    # the app only checks that a key is configured; nothing is sent to the API
+    env.setdefault("GOOGLE_API_KEY", "benchmark-dummy-key")
+    # a copied old version of main.py still has to find the repo modules
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD, script, str(reruns)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Streamlit cold start / rerun latency")
+    ap.add_argument("--script", default=os.path.join(ROOT, "main.py"))
+    ap.add_argument("--cold-runs", type=int, default=5, help="fresh processes to start")
+    ap.add_argument("--reruns", type=int, default=20, help="reruns measured in the last process")
+    args = ap.parse_args()
+
+    script = os.path.abspath(args.script)
+    cold = []
+    reruns = []
+    for i in range(args.cold_runs):
+        res = run_child(script, args.reruns if i == args.cold_runs - 1 else 0)
+        if res["exception"]:
+            print("script raised:", res["exception"])
+        cold.append(res["cold"])
+        reruns.extend(res["reruns"])
+
+    print(f"script: {script}")
+    print(f"cold start: median {statistics.median(cold) * 1000:.0f} ms  (min {min(cold) * 1000:.0f}, max {max(cold) * 1000:.0f}, n={len(cold)})")
+    if reruns:
+        reruns.sort()
+        p95 = reruns[min(len(reruns) - 1, int(len(reruns) * 0.95))]
+        print(f"rerun:      median {statistics.median(reruns) * 1000:.1f} ms  (p95 {p95 * 1000:.1f}, n={len(reruns)})")
+
+
+if __name__ == "__main__":
+    t0 = time.perf_counter()
+    main()
+    print(f"benchmark took {time.perf_counter() - t0:.1f}s")
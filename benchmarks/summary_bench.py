@@ -0,0 +1,125 @@
+# summary_bench.py
+# Side-by-side cost of the summary modes (first_pages / map_reduce / fused), measured with a
+# fake chat model so no API key or network is needed.
+#
+# Usage:
+#   python benchmarks/summary_bench.py [--pages 30] [--workers 4] [--ms-per-call 300] [--ms-per-1k-tokens 100]
+#       [--check]
+#
+# The fake model sleeps a fixed per-call latency plus a per-input-token cost, so wall time
+# reflects both round trips and prompt size. For each mode it reports the number of model
+# calls, estimated input / output tokens (also as a share of first_pages, the summary over
+# the first pages only that the whole-paper modes replaced) and the wall time of
+# extract_paper (local merge). PDF parsing is skipped: the pages are synthetic text fed
+# straight to the chunker. Token counts are deterministic; --check exits with status 1 when
+# the default SUMMARY_MODE sends more input tokens than first_pages.
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["LLM_CACHE_ENABLED"] = "0"
+os.environ["PAPER_STORE_ENABLED"] = "0"
+os.environ["PAPER_INDEX_ENABLED"] = "0"
+
+import pipeline  # noqa: E402
+from pdf_utils import estimate_tokens  # noqa: E402
+
+MODES = ["first_pages", "map_reduce", "fused"]
+
+_WORDS = ("model training dataset accuracy baseline network graph attention layer results "
+          "method propose evaluate benchmark images samples loss improvement error").split()
+
+
+class _Reply:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeModel:
+    """Answers every prompt template with a plausible reply and counts tokens in and out"""
+
+    def __init__(self, ms_per_call, ms_per_1k_tokens):
+        self.ms_per_call = ms_per_call
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def invoke(self, prompt):
+        if '"section_summary"' in prompt:
+            out = json.dumps({"title": "Synthetic Paper", "section_summary": "These pages describe the method and results."})
+        elif "expert academic information extractor" in prompt:
+            out = json.dumps({"title": "Synthetic Paper", "datasets": [], "methods": []})
+        elif "one part (pages" in prompt:
+            out = "These pages describe the method and results."
+        else:
+            out = "**Abstract/Overview**: A synthetic paper.\n" * 8
+        tokens = estimate_tokens(prompt)
+        with self._lock:
+            self.calls += 1
+            self.tokens_in += tokens
+            self.tokens_out += estimate_tokens(out)
+        time.sleep((self.ms_per_call + self.ms_per_1k_tokens * tokens / 1000) / 1000)
+        return _Reply(out)
+
+
+def synthetic_pages(n, words_per_page=700, seed=0):
+    rng = random.Random(seed)
+    pages = []
+    for i in range(n):
+        lines = [" ".join(rng.choice(_WORDS) for _ in range(14)) for _ in range(words_per_page // 14)]
+        pages.append(f"Page {i + 1}\n" + "\n".join(lines))
+    return pages
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Token and latency cost of the summary modes")
+    ap.add_argument("--pages", type=int, default=30)
+    ap.add_argument("--workers", type=int, default=4, help="model calls in flight per document")
+    ap.add_argument("--ms-per-call", type=float, default=300)
+    ap.add_argument("--ms-per-1k-tokens", type=float, default=100)
+    ap.add_argument("--check", action="store_true",
+                    help="exit with status 1 when the default mode sends more input tokens than first_pages")
+    args = ap.parse_args()
+
+    pages = synthetic_pages(args.pages)
+    # feed the synthetic pages to the pipeline in place of the PDF parser
+    pipeline.iter_pdf_pages = lambda pdf_bytes, workers=1: iter(pages)
+    model = FakeModel(args.ms_per_call, args.ms_per_1k_tokens)
+    pipeline.set_model(model)
+
+    print(f"{args.pages} pages, {args.workers} workers, {args.ms_per_call:g} ms/call + {args.ms_per_1k_tokens:g} ms/1k input tokens")
+    print(f"{'mode':<12} {'calls':>6} {'tokens in':>10} {'vs first':>9} {'tokens out':>11} {'wall s':>8} {'summary s':>10}")
+    tokens_in = {}
+    for mode in MODES:
+        model.reset()
+        t0 = time.perf_counter()
+        res = pipeline.extract_paper(b"", use_cache=False, merge_mode="local", retrieval_mode="off",
+                                     summary_mode=mode, max_workers=args.workers)
+        wall = time.perf_counter() - t0
+        tokens_in[mode] = model.tokens_in
+        share = model.tokens_in / tokens_in["first_pages"] - 1
+        print(f"{mode:<12} {model.calls:>6} {model.tokens_in:>10} {share:>+8.0%} {model.tokens_out:>11} "
+              f"{wall:>8.2f} {res['timings']['summary']:>10.2f}")
+
+    default = pipeline.SUMMARY_MODE
+    failures = []
+    if default in tokens_in and tokens_in[default] > tokens_in["first_pages"]:
+        failures.append(f"default mode {default}: {tokens_in[default]} input tokens > "
+                        f"first_pages {tokens_in['first_pages']}")
+    print(f"\ndefault SUMMARY_MODE={default}; {len(failures)} failures" + "".join(f"\n  {f}" for f in failures))
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
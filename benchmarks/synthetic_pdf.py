@@ -0,0 +1,172 @@
+# synthetic_pdf.py
+# Deterministic synthetic research papers as real (text-layer) PDFs, for benchmarks.
+#
+# Usage:
+#   python benchmarks/synthetic_pdf.py --pages 50 --out paper.pdf [--seed 0]
+#   python benchmarks/synthetic_pdf.py --corpus bench_pdfs/ --sizes 5,50,500
+#   python benchmarks/synthetic_pdf.py --pages 300 --image-kb 320 --out proceedings.pdf
+#
+# Every page starts with a "Page N" line and holds ~words_per_page words of filler prose,
+# with planted sentences naming datasets, methods and limitations (in varying wording, so
+# the fuzzy dedupe has work to do). Page 1 carries the title, venue and year. The PDF is
+# written by hand (Helvetica, one Flate-compressed content stream per page), so no PDF
+# library is needed to generate it; pypdf reads it back like any other text PDF. With
+# image_kb each page also draws a grayscale image of random (incompressible) pixels, which
+# makes the file as large as scanned proceedings without changing its text.
+import argparse
+import os
+import random
+import zlib
+
+_FILLER = ("the model training data results we show that our approach improves over prior work on "
+           "several tasks while the analysis of errors suggests further gains are possible with more "
+           "careful tuning of the learning rate schedule and larger batches in later experiments").split()
+
+DATASETS = ["CIFAR-10", "ImageNet", "COCO", "SQuAD", "MNIST", "GLUE", "WikiText-103", "Cityscapes"]
+# each method in two wordings, the second one picked now and then
+METHODS = [
+    ("Graph Attention Network", "graph attention networks"),
+    ("Contrastive Pretraining", "contrastive pre-training"),
+    ("Sparse Mixture of Experts", "sparse mixture-of-experts"),
+    ("Knowledge Distillation", "knowledge distillation"),
+    ("Low-Rank Adaptation", "low rank adaptation"),
+    ("Diffusion Denoiser", "diffusion denoisers"),
+]
+LIMITATIONS = [
+    "Limited to English text",
+    "High memory footprint",
+    "Requires labeled data",
+    "Slow inference on long inputs",
+]
+VENUES = ["NeurIPS", "ICML", "ACL", "CVPR", "ICLR"]
+
+LINE_CHARS = 95
+LINES_PER_PAGE = 58
+
+
+def paper_pages(n_pages, seed=0, words_per_page=450):
+    """Page texts of one synthetic paper (list of str, one "Page N" line on top of each)"""
+    rng = random.Random(seed)
+    pages = []
+    for no in range(1, n_pages + 1):
+        header = [f"Page {no}"]
+        if no == 1:
+            header += [
+                f"Synthetic Study {seed} of {rng.choice(METHODS)[0]} at Scale",
+                f"Published at {rng.choice(VENUES)} {rng.choice([2019, 2020, 2021, 2022, 2023])}.",
+            ]
+        sentences = []
+        planted = []
+        if rng.random() < 0.4:
+            planted.append(f"We evaluate on the {rng.choice(DATASETS)} dataset.")
+        if rng.random() < 0.3:
+            name, variant = rng.choice(METHODS)
+            planted.append(f"We propose {variant if rng.random() < 0.3 else name} for this setting.")
+        if rng.random() < 0.15:
+            planted.append(f"A limitation is: {rng.choice(LIMITATIONS)}.")
+        words = 0
+        while words < words_per_page:
+            n = rng.randint(8, 20)
+            sentences.append(" ".join(rng.choice(_FILLER) for _ in range(n)).capitalize() + ".")
+            words += n
+            if planted and rng.random() < 0.2:
+                sentences.append(planted.pop())
+        sentences += planted
+        pages.append("\n".join(header + _wrap(" ".join(sentences))))
+    return pages
+
+
+def _wrap(text):
+    lines, cur = [], ""
+    for word in text.split(" "):
+        if cur and len(cur) + 1 + len(word) > LINE_CHARS:
+            lines.append(cur)
+            cur = word
+        else:
+            cur = f"{cur} {word}" if cur else word
+    if cur:
+        lines.append(cur)
+    return lines
+
+
+def _escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pages_to_pdf(pages, image_kb=0, seed=0):
+    """A minimal PDF 1.4 with one page per text (lines past LINES_PER_PAGE are dropped)"""
+    rng = random.Random(seed)
+    objects = []  # bodies of objects 1..n
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    page_tree = add(None)
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    kids = []
+    for text in pages:
+        ops = []
+        xobjects = b""
+        if image_kb:
+            pixels = rng.randbytes(image_kb * 1024)
+            image = add(b"<< /Type /XObject /Subtype /Image /Width 1024 /Height %d /ColorSpace /DeviceGray "
+                        b"/BitsPerComponent 8 /Length %d >>\nstream\n" % (image_kb, len(pixels)) + pixels + b"\nendstream")
+            ops.append("q 612 0 0 792 0 0 cm /Im1 Do Q")
+            xobjects = b" /XObject << /Im1 %d 0 R >>" % image
+        ops += ["BT", "/F1 9 Tf", "11 TL", "50 770 Td"]
+        for line in text.splitlines()[:LINES_PER_PAGE]:
+            ops.append(f"({_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = zlib.compress("\n".join(ops).encode("latin-1", "replace"))
+        content = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 %d 0 R >>%s >> "
+            b"/Contents %d 0 R >>" % (page_tree, font, xobjects, content)
+        ))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % page_tree
+    objects[page_tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+def make_pdf(n_pages, seed=0, words_per_page=450, image_kb=0):
+    return pages_to_pdf(paper_pages(n_pages, seed=seed, words_per_page=words_per_page), image_kb=image_kb, seed=seed)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate synthetic research paper PDFs")
+    ap.add_argument("--pages", type=int, default=20)
+    ap.add_argument("--out", default="synthetic.pdf")
+    ap.add_argument("--corpus", help="write one PDF per size into this directory instead")
+    ap.add_argument("--sizes", default="5,50,500", help="page counts for --corpus")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--words-per-page", type=int, default=450)
+    ap.add_argument("--image-kb", type=int, default=0, help="random-pixel image per page, in KB")
+    args = ap.parse_args()
+
+    if args.corpus:
+        os.makedirs(args.corpus, exist_ok=True)
+        targets = [(int(n), os.path.join(args.corpus, f"synthetic_{int(n)}p.pdf")) for n in args.sizes.split(",")]
+    else:
+        targets = [(args.pages, args.out)]
+    for n, path in targets:
+        data = make_pdf(n, seed=args.seed, words_per_page=args.words_per_page, image_kb=args.image_kb)
+        with open(path, "wb") as f:
+            f.write(data)
+        print(f"{path}: {n} pages, {len(data) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# config.py
+# Settings read from the environment / .env. Kept free of heavy imports so the
+# Streamlit script can read them on every rerun without loading the pipeline.
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def _flag(name, default):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# deterministic extraction
+MODEL_NAME = os.getenv("MODEL_NAME", "gemini-2.0-flash")
+MODEL_TEMPERATURE = float(os.getenv("MODEL_TEMPERATURE", "0"))
+
+# max number of chunk extraction calls in flight at once
+MAX_CONCURRENT_CHUNKS = int(os.getenv("MAX_CONCURRENT_CHUNKS", "4"))
+
+# client-side flow control for model calls (shared by every thread / user of the process).
+# LLM_RPM / LLM_TPM are the API quota (0 = no limit); requests are paced just under it.
+LLM_RPM = int(os.getenv("LLM_RPM", "0"))
+LLM_TPM = int(os.getenv("LLM_TPM", "0"))
+# retryable errors (429, 5xx, timeouts) are retried with jittered exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+# seconds one request may take including waits and retries (0 = no deadline)
+LLM_REQUEST_DEADLINE = float(os.getenv("LLM_REQUEST_DEADLINE", "120"))
+# consecutive failures before model calls are suspended, and for how many seconds (0 = never)
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+# processes used to extract page text (1 = in-process, pages still stream into the chunker)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "1"))
+# chunk size in (estimated) tokens, and how much of the previous chunk to repeat at the start of the next
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "4000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+
+# what is sent to the model: every chunk ("off") or only the top-k retrieved passages per field ("bm25" / "faiss")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "off")
+RETRIEVAL_MODE_CHOICES = ("off", "bm25", "faiss")
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "6"))
+
+# processed papers (pages, passage embeddings, merged JSON, summary) keyed by PDF hash
+PAPER_STORE_ENABLED = _flag("PAPER_STORE_ENABLED", "true")
+VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "./vector_store")
+# cross-paper index of datasets / methods / venues / years over finished extractions (paper_index.py)
+PAPER_INDEX_ENABLED = _flag("PAPER_INDEX_ENABLED", "true")
+PAPER_INDEX_PATH = os.getenv("PAPER_INDEX_PATH", os.path.join(VECTOR_DB_PATH, "paper_index.sqlite3"))
+# new PDFs that share pages with a stored paper (a revised version) reuse the results of its
+# unchanged chunks instead of sending them to the model again (revision.py)
+REVISION_REUSE = _flag("REVISION_REUSE", "true")
+
+# how chunk partials are merged: "local", "llm" or "local+polish"
+MERGE_MODE = os.getenv("MERGE_MODE", "local")
+MERGE_MODE_CHOICES = ("local", "llm", "local+polish")
+# how datasets / headings are deduplicated when merging: "near" (near-duplicate clusters, see
+# dedupe.py) or "exact" (normalized names, near-identical headings)
+DEDUPE_MODE = os.getenv("DEDUPE_MODE", "near")
+
+# how the paper summary is built: "fused" (per-chunk notes come back inside each extraction
+# call, so every chunk is sent once, + one reduce call over the whole paper), "map_reduce"
+# (a separate notes call per chunk: every chunk is sent twice) or "first_pages" (the first 5
+# pages / 15000 chars in one call)
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "fused")
+SUMMARY_MODE_CHOICES = ("fused", "map_reduce", "first_pages")
+
+# stream model answers into the UI (summary token by token, chunk items as they complete)
+STREAM_OUTPUT = _flag("STREAM_OUTPUT", "true")
+
+# PDFs given by URL: largest accepted size (also for uploads to the API), read timeout in
+# seconds, pooled connections, and how much of a download is held in memory before spilling
+# to a temp file
+MAX_FILE_SIZE_MB = float(os.getenv("MAX_FILE_SIZE_MB", "50"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "60"))
+FETCH_POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", "8"))
+FETCH_SPOOL_MB = float(os.getenv("FETCH_SPOOL_MB", "8"))
+# downloaded PDFs kept on disk and revalidated with ETag / Last-Modified instead of re-downloaded
+FETCH_CACHE_ENABLED = _flag("FETCH_CACHE_ENABLED", "true")
+FETCH_CACHE_PATH = os.getenv("FETCH_CACHE_PATH", ".cache/pdf_downloads")
+FETCH_CACHE_MAX_MB = float(os.getenv("FETCH_CACHE_MAX_MB", "500"))
+
+# on-disk cache of model responses
+LLM_CACHE_ENABLED = _flag("LLM_CACHE_ENABLED", "true")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "200"))
+
+# tracing: every span (stage / chunk / model call) appended to this JSONL file ("" = off),
+# Prometheus metrics served on this port by the UI / batch process (0 = off; the API has /metrics)
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# default of the UI's timing panel toggle
+SHOW_TIMINGS = _flag("SHOW_TIMINGS", "false")
@@ -0,0 +1,299 @@
+# dedupe.py
+# Near-duplicate detection for extracted list items: datasets by name, heading items
+# (methods, contributions, limitations) by heading.
+#
+# Each item is reduced to a profile: normalized keys, the numbers it mentions and a string
+# whose character 3-grams are MinHashed. Candidate pairs come from LSH buckets over the
+# signature bands plus exact key collisions, so the work grows about linearly with the
+# number of distinct items rather than with every pair. Candidates are confirmed with the
+# rules below and joined into clusters (union-find); each cluster is replaced by its
+# best-evidenced member, kept at the position of the cluster's first item.
+#
+# Datasets: same key after dropping filler words ("dataset", "benchmark", ...), a shared
+# alias (DATASET_ALIASES, or an acronym given in parentheses), an acronym of the other name,
+# or a very similar spelling. Names with different numbers are never merged (CIFAR-10 vs
+# CIFAR-100, SQuAD 1.1 vs 2.0) unless an alias says so (ImageNet-1k = ImageNet 2012).
+# Headings: same set of word stems ("Limited scalability" = "Scalability limitations"), one
+# set plus generic qualifiers only, a high overlap of stems, or a typo-level spelling
+# difference, again only with equal numbers.
+import random
+import re
+import zlib
+from functools import lru_cache
+
+_WORD_RE = re.compile(r"[0-9a-z]+")
+_PAREN_RE = re.compile(r"\(([^)]*)\)")
+# "SQuAD v1.1" -> "SQuAD 1.1", "AG's News" -> "AG News"
+_NOISE_RE = re.compile(r"\bv(?=\d)|'s\b")
+
+# words that do not tell two datasets apart
+_DATASET_FILLER = {"the", "dataset", "datasets", "data", "set", "benchmark", "corpus", "database", "collection"}
+
+# official renamings of one dataset -> its canonical key (keys as produced by _dataset_keys).
+# Only names a dataset is published under, not spellings seen in extractions; digit-free
+# entries also rewrite a key prefix ("mscoco2017" -> "coco2017").
+DATASET_ALIASES = {
+    "imagenet2012": "imagenet1k", "ilsvrc2012": "imagenet1k", "ilsvrc": "imagenet1k",
+    "mscoco": "coco", "microsoftcoco": "coco", "penntreebank": "ptb", "pascalvoc": "voc",
+    "multinli": "mnli",
+}
+_PREFIX_ALIASES = sorted(((k, v) for k, v in DATASET_ALIASES.items() if not re.search(r"\d", k + v)),
+                         key=lambda kv: -len(kv[0]))
+
+_STOPWORDS = {
+    "a", "an", "the", "of", "for", "to", "in", "on", "with", "by", "and", "or", "via", "from",
+    "its", "their", "our", "using", "based", "is", "are", "be", "at", "as",
+    # generic nouns that headings add or leave out
+    "approach", "method", "technique", "framework", "mechanism", "problem", "issue", "issues",
+    "concern", "concerns", "procedure", "strategy", "scheme",
+}
+
+# one word per meaning: "there is too little of X" in limitation headings, and needs / requires.
+# "no" / "only" stay apart from "limited" ("No code released" is not "Limited code released").
+_SYNONYMS = {
+    "lack": "limit", "lacking": "limit", "insufficient": "limit", "restricted": "limit",
+    "need": "require", "needs": "require",
+}
+
+# longest first; a suffix is only stripped when at least 3 letters remain
+_SUFFIXES = (
+    "abilities", "ability", "ational", "ization", "ations", "ation", "ities", "ments", "ment",
+    "ness", "ings", "ing", "ized", "able", "ible", "ated", "ency", "ence", "ers", "ity", "ies",
+    "ied", "ent", "ate", "ed", "es", "er", "ly", "s", "y", "e",
+)
+
+def _strip_suffix(word):
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == "s" and word.endswith("ss"):
+                return word
+            return word[: -len(suffix)]
+    return word
+
+def stem(word: str):
+    """Crude suffix stripping (two rounds), enough to line up "limited" / "limitations" / "limits" """
+    return _strip_suffix(_strip_suffix(word))
+
+# words a heading may add to the other without naming something else: "Curriculum learning
+# schedule", "Sparse Mixture-of-Experts layer" (but not "Adversarial training robustness")
+_QUALIFIERS = frozenset(stem(w) for w in (
+    "schedule", "layer", "layers", "module", "model", "models", "network", "networks",
+    "architecture", "algorithm", "component", "design", "pipeline", "system", "setup", "variant",
+))
+
+def _shingles(text, n=3):
+    text = f"^{text}$"
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if (a or b) else 1.0
+
+# --------------------------
+# Profiles
+# --------------------------
+def _canonical(key):
+    if key in DATASET_ALIASES:
+        return DATASET_ALIASES[key]
+    for prefix, target in _PREFIX_ALIASES:
+        if key.startswith(prefix):
+            return target + key[len(prefix):]
+    return key
+
+def normalize_dataset_key(name: str):
+    # remove non-alphanum, lower
+    return re.sub(r"[^0-9a-z]", "", name.lower())
+
+def _dataset_keys(name):
+    words = _WORD_RE.findall(_NOISE_RE.sub("", name.lower()))
+    kept = [w for w in words if w not in _DATASET_FILLER]
+    return _canonical(normalize_dataset_key(" ".join(kept))), _canonical(normalize_dataset_key(name)), kept
+
+@lru_cache(maxsize=65536)
+def dataset_profile(name: str):
+    """{"key", "keys", "numbers", "initials", "shingles"} of a dataset name"""
+    key, raw, words = _dataset_keys(_PAREN_RE.sub(" ", name))
+    if not key:
+        key, raw, words = _dataset_keys(name)
+    # the key with filler words kept too: "Book Corpus" and "BookCorpus" meet on "bookcorpus"
+    keys = {key, raw}
+    for inner in _PAREN_RE.findall(name):
+        alt, _, _ = _dataset_keys(inner)
+        if alt:
+            keys.add(alt)
+    letters = [w for w in words if not w.isdigit()]
+    return {
+        "key": key,
+        "keys": frozenset(keys),
+        "numbers": tuple(re.findall(r"\d+", key)),
+        "initials": "".join(w[0] for w in letters) if len(letters) >= 2 else "",
+        "shingles": frozenset(_shingles(key)),
+    }
+
+def datasets_similar(a, b, threshold=0.7):
+    """a, b: dataset_profile() results"""
+    if a["keys"] & b["keys"]:
+        return True
+    if a["numbers"] != b["numbers"]:
+        return False
+    if a["initials"] and a["initials"] == b["key"] or b["initials"] and b["initials"] == a["key"]:
+        return True
+    return _jaccard(a["shingles"], b["shingles"]) >= threshold
+
+def _content_words(text):
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+
+@lru_cache(maxsize=65536)
+def heading_profile(heading: str):
+    """{"key", "keys", "stems", "numbers", "shingles"} of a heading"""
+    words = _content_words(_PAREN_RE.sub(" ", heading)) or _content_words(heading)
+    stems = frozenset(stem(_SYNONYMS.get(w, w)) for w in words if not w.isdigit())
+    numbers = tuple(sorted(w for w in words if w.isdigit()))
+    # the words run together catch "pre-training" / "pretraining"; an acronym in parentheses
+    # ("Layer Normalization (LayerNorm)") is another name for the heading
+    keys = {"".join(words)}
+    for inner in _PAREN_RE.findall(heading):
+        alt = "".join(_content_words(inner))
+        if alt:
+            keys.add(alt)
+    key = " ".join(sorted(stems) + list(numbers))
+    return {
+        "key": key,
+        "keys": frozenset(keys),
+        "stems": stems,
+        "numbers": numbers,
+        "shingles": frozenset(_shingles(" ".join(sorted(stems)))),
+    }
+
+def headings_similar(a, b, threshold=0.75, spelling=0.8):
+    """a, b: heading_profile() results"""
+    if a["numbers"] != b["numbers"]:
+        return False
+    if a["stems"] == b["stems"] or a["keys"] & b["keys"]:
+        return True
+    small, large = sorted((a["stems"], b["stems"]), key=len)
+    if small < large:
+        # one heading plus words: the same thing only if they are generic qualifiers
+        # ("Supervised learning" / "Self-supervised learning", "Transformer encoder(-decoder)")
+        return large - small <= _QUALIFIERS
+    if len(small) > 1 and _jaccard(a["stems"], b["stems"]) >= threshold:
+        return True
+    return _jaccard(a["shingles"], b["shingles"]) >= spelling
+
+# --------------------------
+# MinHash / LSH
+# --------------------------
+_PRIME = (1 << 61) - 1
+
+class MinHashLSH:
+    """MinHash signatures over shingle sets, banded for candidate generation.
+
+    With 16 bands of 4 rows, pairs with a shingle Jaccard of 0.7 share a bucket with
+    probability ~0.99 (0.5: ~0.65) while unrelated items rarely do; the candidates are
+    confirmed exactly by the caller.
+    """
+
+    def __init__(self, num_perm=64, bands=16, seed=1):
+        rng = random.Random(seed)
+        self.perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self.bands = bands
+        self.rows = num_perm // bands
+
+    def signature(self, shingles):
+        hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles]
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self.perms)
+
+    def candidate_pairs(self, signatures):
+        pairs = set()
+        for band in range(self.bands):
+            lo = band * self.rows
+            buckets = {}
+            for i, sig in enumerate(signatures):
+                buckets.setdefault(sig[lo:lo + self.rows], []).append(i)
+            for ids in buckets.values():
+                for x in range(len(ids)):
+                    for y in range(x + 1, len(ids)):
+                        pairs.add((ids[x], ids[y]))
+        return pairs
+
+_LSH = MinHashLSH()
+
+@lru_cache(maxsize=65536)
+def _signature(shingles):
+    # the incremental merge re-clusters every item seen so far after each chunk
+    return _LSH.signature(shingles)
+
+def _clusters(profiles, similar):
+    """Index clusters (in order of first member) of profiles joined by similar()"""
+    # identical profiles are one node, so repeats of an item never blow up the LSH buckets
+    node_of = {}
+    nodes = []
+    members = []
+    for i, p in enumerate(profiles):
+        ident = (p["key"], p.get("keys"))
+        n = node_of.get(ident)
+        if n is None:
+            n = node_of[ident] = len(nodes)
+            nodes.append(p)
+            members.append([])
+        members[n].append(i)
+
+    parent = list(range(len(nodes)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(x, y):
+        x, y = find(x), find(y)
+        if x != y:
+            parent[max(x, y)] = min(x, y)
+
+    candidates = _LSH.candidate_pairs([_signature(p["shingles"]) for p in nodes])
+    # exact collisions on any alias key as well (an acronym shares few 3-grams with its long form)
+    by_key = {}
+    for n, p in enumerate(nodes):
+        for k in p.get("keys", ()):
+            by_key.setdefault(k, []).append(n)
+        if p.get("initials"):
+            by_key.setdefault(p["initials"], []).append(n)
+    for ids in by_key.values():
+        candidates.update((ids[0], other) for other in ids[1:])
+    for x, y in candidates:
+        if find(x) != find(y) and similar(nodes[x], nodes[y]):
+            union(x, y)
+
+    groups = {}
+    for n in range(len(nodes)):
+        groups.setdefault(find(n), []).extend(members[n])
+    return sorted((sorted(g) for g in groups.values()), key=lambda g: g[0])
+
+def _evidence_score(item):
+    return (
+        2 * bool((item.get("quote") or "").strip())
+        + isinstance(item.get("page"), int)
+        + bool((item.get("explanation") or "").strip())
+    )
+
+def _dedupe(items, key_field, profile, similar):
+    items = [it for it in items if isinstance(it, dict) and (it.get(key_field) or "").strip()]
+    clusters = _clusters([profile(it[key_field].strip()) for it in items], similar)
+    # best-evidenced member, the earliest one on a tie
+    return [items[max(c, key=lambda i: (_evidence_score(items[i]), -i))] for c in clusters]
+
+def near_duplicate_clusters(names, kind="heading"):
+    """Clusters (lists of indices, in order) of near-duplicate names; kind is "dataset" or "heading" """
+    if kind == "dataset":
+        return _clusters([dataset_profile(n.strip()) for n in names], datasets_similar)
+    return _clusters([heading_profile(n.strip()) for n in names], headings_similar)
+
+def dedupe_datasets_near(dataset_objs):
+    """One dataset object per cluster of near-duplicate names"""
+    return _dedupe(dataset_objs, "name", dataset_profile, datasets_similar)
+
+def dedupe_headings_near(items):
+    """One heading object per cluster of near-duplicate headings"""
+    return _dedupe(items, "heading", heading_profile, headings_similar)
@@ -0,0 +1,304 @@
+# json_repair.py
+# Tolerant JSON parsing for model output.
+#
+# loads_lenient() tries json.loads on the outermost {...} first and only falls back to a
+# forgiving recursive-descent parser when that fails. The fallback reads the usual LLM
+# defects instead of raising: markdown fences and prose around the object, trailing or
+# missing commas, single-quoted strings, bare keys, Python literals (None/True/False),
+# comments, raw newlines and unescaped quotes inside strings, and output cut off mid-way
+# (open strings and brackets are closed, a dangling key is dropped). parse_partial() uses the
+# same parser on a response that is still streaming in and keeps only what is complete;
+# PartialJSON calls it only when a top-level member or list item may have closed, so a
+# streamed answer is not re-parsed on every delta.
+import json
+import re
+
+_NUMBER_RE = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_BARE_RE = re.compile(r"[^,:\]\}\n]*")
+_KEY_RE = re.compile(r"[^:,\}\]\s]+")
+_HEX4_RE = re.compile(r"[0-9a-fA-F]{4}")
+_SPECIAL_RE = {'"': re.compile(r'["\\]'), "'": re.compile(r"['\\]")}
+_STRUCTURE_RE = re.compile(r'["\\{}\[\],]')
+_LITERALS = {
+    "null": None, "none": None, "nan": None, "undefined": None,
+    "true": True, "false": False,
+}
+_ESCAPES = {'"': '"', "'": "'", "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+_MISSING = object()
+
+
+class _Lenient:
+    def __init__(self, text):
+        self.text = text
+        self.i = 0
+        self.n = len(text)
+        self.truncated = False
+        # whether the last member / list item parsed was complete (for parse_partial); set
+        # after its value, so an outer container's flag overrides the ones set inside it
+        self.member_done = True
+        self.item_done = True
+
+    def skip(self):
+        """Whitespace and // or /* */ comments"""
+        text, n = self.text, self.n
+        while self.i < n:
+            c = text[self.i]
+            if c in " \t\r\n":
+                self.i += 1
+            elif text.startswith("//", self.i):
+                end = text.find("\n", self.i)
+                self.i = n if end == -1 else end + 1
+            elif text.startswith("/*", self.i):
+                end = text.find("*/", self.i + 2)
+                self.i = n if end == -1 else end + 2
+            else:
+                return
+
+    def peek(self):
+        self.skip()
+        return self.text[self.i] if self.i < self.n else ""
+
+    def done(self, first):
+        """Whether the value just parsed (starting with first) is complete: closed, and a
+        number or bare word is followed by something (its last digits may still be coming)"""
+        return not self.truncated and (self.i < self.n or first in "{[\"'")
+
+    def value(self):
+        c = self.peek()
+        if not c:
+            self.truncated = True
+            return _MISSING
+        if c == "{":
+            self.i += 1
+            return self.obj()
+        if c == "[":
+            self.i += 1
+            return self.arr()
+        if c in "\"'":
+            self.i += 1
+            return self.string(c)
+        m = _NUMBER_RE.match(self.text, self.i)
+        if m and m.group():
+            self.i = m.end()
+            num = m.group()
+            return float(num) if any(ch in num for ch in ".eE") else int(num)
+        m = _BARE_RE.match(self.text, self.i)
+        self.i = m.end()
+        word = m.group().strip()
+        if word.lower() in _LITERALS:
+            return _LITERALS[word.lower()]
+        return word if word else _MISSING
+
+    def obj(self):
+        out = {}
+        while True:
+            c = self.peek()
+            if not c:
+                self.truncated = True
+                return out
+            if c == "}":
+                self.i += 1
+                return out
+            if c == ",":
+                self.i += 1
+                continue
+            if c == "]":
+                # mismatched closer: treat it as the end of this object
+                self.i += 1
+                return out
+            if c in "\"'":
+                self.i += 1
+                key = self.string(c, key=True)
+            else:
+                m = _KEY_RE.match(self.text, self.i)
+                self.i = m.end()
+                key = m.group()
+            c = self.peek()
+            if c == ":":
+                self.i += 1
+            elif not c:
+                self.truncated = True
+                return out
+            first = self.peek()
+            val = self.value()
+            if val is _MISSING:
+                if self.i >= self.n:
+                    return out
+                continue
+            out[str(key)] = val
+            self.member_done = self.done(first)
+
+    def arr(self):
+        out = []
+        while True:
+            c = self.peek()
+            if not c:
+                self.truncated = True
+                return out
+            if c == "]":
+                self.i += 1
+                return out
+            if c == ",":
+                self.i += 1
+                continue
+            if c == "}":
+                self.i += 1
+                return out
+            val = self.value()
+            if val is _MISSING:
+                if self.i >= self.n:
+                    return out
+                # unparseable token: skip one character so the loop always advances
+                self.i += 1
+                continue
+            out.append(val)
+            self.item_done = self.done(c)
+
+    def string(self, quote, key=False):
+        text, n = self.text, self.n
+        special = _SPECIAL_RE[quote]
+        buf = []
+        while self.i < n:
+            # copy the run of plain characters up to the next quote or backslash in one go
+            m = special.search(text, self.i)
+            if m is None:
+                buf.append(text[self.i:])
+                self.i = n
+                break
+            buf.append(text[self.i:m.start()])
+            self.i = m.start()
+            c = text[self.i]
+            if c == "\\" and self.i + 1 < n:
+                nxt = text[self.i + 1]
+                if nxt == "u" and _HEX4_RE.fullmatch(text[self.i + 2:self.i + 6]):
+                    buf.append(chr(int(text[self.i + 2:self.i + 6], 16)))
+                    self.i += 6
+                else:
+                    buf.append(_ESCAPES.get(nxt, nxt))
+                    self.i += 2
+                continue
+            if c == quote:
+                # a quote only closes the string if what follows could come after a string;
+                # otherwise it is an unescaped quote inside the text
+                j = self.i + 1
+                while j < n and text[j] in " \t\r\n":
+                    j += 1
+                if j >= n or text[j] in (":" if key else ",}]:") or (not key and text[j] in "\"'"):
+                    self.i += 1
+                    return "".join(buf)
+            buf.append(c)
+            self.i += 1
+        self.truncated = True
+        return "".join(buf)
+
+
+def strip_fences(text):
+    text = text.strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```[\w]*", "", text)
+        text = text.rsplit("```", 1)[0] if "```" in text else text
+    return text
+
+
+def loads_lenient(text, strict_first=True, drop_incomplete=True):
+    """Parse the first JSON object in model output, repairing it if needed.
+
+    Returns (obj, repaired). Raises ValueError when the text contains no object at all. When
+    the output was cut off, the last top-level member is incomplete and is dropped unless
+    drop_incomplete is False (e.g. to show a stream while it is still arriving).
+    """
+    text = strip_fences(text)
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("No JSON object found in model output.")
+    if strict_first:
+        end = text.rfind("}")
+        if end > start:
+            try:
+                return json.loads(text[start:end + 1]), False
+            except ValueError:
+                pass
+    parser = _Lenient(text)
+    parser.i = start + 1
+    obj = parser.obj()
+    if parser.truncated and drop_incomplete and obj:
+        obj.pop(next(reversed(obj)))
+    return obj, True
+
+
+def parse_partial(text):
+    """The complete part of a JSON object that is still streaming in ({} before the first "{").
+
+    Members and list items are only included once they are complete: the member being
+    written is left out, and for a list being written only its last item, if unfinished.
+    """
+    text = strip_fences(text)
+    start = text.find("{")
+    if start == -1:
+        return {}
+    parser = _Lenient(text)
+    parser.i = start + 1
+    obj = parser.obj()
+    if parser.truncated and obj and not parser.member_done:
+        key = next(reversed(obj))
+        if isinstance(obj[key], list):
+            if obj[key] and not parser.item_done:
+                obj[key].pop()
+        else:
+            del obj[key]
+    return obj
+
+
+class PartialJSON:
+    """parse_partial() for a response that grows, without re-parsing it on every delta.
+
+    feed(text_so_far) returns the new partial object when a top-level member or an item of a
+    top-level list may have closed since the last call, else None. A light scan of each delta
+    (brackets and commas outside strings) decides. Parses are at least min_growth characters
+    apart (except the one when the object closes), so a long answer is parsed a bounded
+    number of times; the text is also parsed whenever it has doubled since the last parse,
+    in case malformed quoting threw the scan off.
+    """
+
+    def __init__(self, min_growth=256):
+        self.min_growth = min_growth
+        self.pending = False
+        self.seen = 0
+        self.depth = 0
+        self.in_string = False
+        # position of the character after a backslash in a string (escaped, not structure)
+        self.escaped = -1
+        self.parsed = 0
+
+    def feed(self, text):
+        self.pending = self._scan(text, self.seen) or self.pending
+        self.seen = len(text)
+        due = self.pending and (self.depth == 0 or len(text) - self.parsed >= self.min_growth)
+        if due or len(text) >= 2 * self.parsed + 1024:
+            self.parsed = len(text)
+            self.pending = False
+            return parse_partial(text)
+        return None
+
+    def _scan(self, text, pos):
+        closed = False
+        for m in _STRUCTURE_RE.finditer(text, pos):
+            c = m.group()
+            if m.start() == self.escaped:
+                continue
+            if self.in_string:
+                if c == "\\":
+                    self.escaped = m.start() + 1
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                self.in_string = True
+            elif c in "{[":
+                self.depth += 1
+            elif c in "}]":
+                self.depth = max(0, self.depth - 1)
+                closed = closed or self.depth <= 2
+            elif c == "," and 1 <= self.depth <= 2:
+                closed = True
+        return closed
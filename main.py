@@ -1,37 +1,64 @@
-
-
 # paper_extractor_app.py
 import streamlit as st
-import io
-import os
-import json
 import re
-import textwrap
-from dotenv import load_dotenv
-from pypdf import PdfReader
-import requests
-
-# LangChain / Google Gemini
-from langchain_core.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+import time
+from contextlib import ExitStack
+
+# Only light imports here: Streamlit re-executes this script on every widget interaction.
+# The pipeline (pypdf, langchain, the Gemini client) and pdf_fetch (requests) are loaded on the first Extract click.
+from config import (
+    GOOGLE_API_KEY, MERGE_MODE, RETRIEVAL_MODE, SUMMARY_MODE, LLM_CACHE_ENABLED, PAPER_STORE_ENABLED, STREAM_OUTPUT,
+    SHOW_TIMINGS,
+)
+from result_model import dumps as dumps_json
 
 # --------------------------
 # Configuration
 # --------------------------
-load_dotenv()
-API_KEY = os.getenv("GOOGLE_API_KEY")
+API_KEY = GOOGLE_API_KEY
 if not API_KEY:
     st.error("🔑 GOOGLE_API_KEY not found. Put it into a .env file like: GOOGLE_API_KEY=your_api_key")
     st.stop()
 
-# deterministic extraction
-MODEL = ChatGoogleGenerativeAI(model="gemini-2.0-flash", google_api_key=API_KEY, temperature=0)
+RETRIEVAL_MODES = {
+    "off": "Whole paper (every chunk)",
+    "bm25": "Retrieved passages (BM25)",
+    "faiss": "Retrieved passages (vector index)",
+}
+
+# processed papers kept per browser session (pages, chunks, partials, results)
+MAX_SESSION_PAPERS = 5
+
+MERGE_MODES = {
+    "local": "Local merge (no model call)",
+    "llm": "LLM reducer",
+    "local+polish": "Local merge + LLM polish",
+}
+
+SUMMARY_MODES = {
+    "fused": "Whole paper (notes inside the extraction call)",
+    "map_reduce": "Whole paper (separate per-chunk notes + reduce)",
+    "first_pages": "First pages only (single call)",
+}
+
+@st.cache_resource(show_spinner=False)
+def load_pipeline():
+    """Import the pipeline and build the model client once per server process"""
+    import pipeline
+    pipeline.get_model()
+    return pipeline
 
 # --------------------------
 # Enhanced Custom CSS with Dark Professional Theme
 # --------------------------
+@st.cache_data(show_spinner=False)
+def _minify_css(css: str):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    return re.sub(r"\s+", " ", css).strip()
+
 def load_custom_css():
-    st.markdown("""
+    # the <style> block has to be sent on every rerun; send it once-minified
+    st.markdown(_minify_css("""
     <style>
     /* Import Google Fonts */
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
@@ -329,204 +356,7 @@ def load_custom_css():
         background: linear-gradient(135deg, #1d4ed8 0%, #1e40af 100%);
     }
     </style>
-    """, unsafe_allow_html=True)
-
-# --------------------------
-# Helpers: PDF reading + chunking (unchanged)
-# --------------------------
-def read_pdf_bytes(pdf_bytes: bytes):
-    reader = PdfReader(io.BytesIO(pdf_bytes))
-    pages = []
-    for p in reader.pages:
-        try:
-            txt = p.extract_text() or ""
-        except Exception:
-            txt = ""
-        # normalize whitespace
-        txt = "\n".join([line.strip() for line in txt.splitlines() if line.strip()])
-        pages.append(txt)
-    return pages
-
-def chunk_pages(pages_text, max_chars=12000, max_pages_per_chunk=5):
-    chunks = []
-    cur_pages = []
-    cur_len = 0
-    start_page = 1
-    for i, pg in enumerate(pages_text, start=1):
-        add_len = len(pg)
-        page_count = len(cur_pages) + 1
-        if (cur_len + add_len > max_chars) or (page_count > max_pages_per_chunk):
-            chunks.append({
-                "start_page": start_page,
-                "end_page": start_page + len(cur_pages) - 1,
-                "text": "\n\n".join(cur_pages)
-            })
-            cur_pages = [pg]
-            cur_len = add_len
-            start_page = i
-        else:
-            cur_pages.append(pg)
-            cur_len += add_len
-    if cur_pages:
-        chunks.append({
-            "start_page": start_page,
-            "end_page": start_page + len(cur_pages) - 1,
-            "text": "\n\n".join(cur_pages)
-        })
-    return chunks
-
-# --------------------------
-# Prompt templates (unchanged + new summary prompt)
-# --------------------------
-CHUNK_PROMPT_TPL = textwrap.dedent("""
-You are an expert academic information extractor. Extract information ONLY from the CHUNK below.
-Return EXACTLY one JSON object and nothing else.
-
-Schema (types):
-{{
-  "title": null | string,
-  "venue": null | string,
-  "year": null | integer,
-  "datasets": [{{"name": string, "page": integer, "quote": string}}],
-  "limitations_addressed": [{{"heading": string, "explanation": string, "page": integer, "quote": string}}],
-  "contributions": [{{"heading": string, "explanation": string, "page": integer, "quote": string}}],
-  "methods": [{{"heading": string, "explanation": string, "page": integer, "quote": string}}],
-  "paper_limitations": [{{"heading": string, "explanation": string, "page": integer, "quote": string}}],
-  "evidence": [{{"page": integer, "quote": string}}]
-}}
-
-Rules:
-- DO NOT invent data. If a field is not present in this chunk, use null (for scalars) or [] (for lists).
-- For lists (datasets, limitations_addressed, etc.) produce objects with page and short quote (<=25 words).
-- Use page numbers that correspond to the actual PDF pages (between {start_page} and {end_page}).
-- Keep quotes short and directly from the text.
-- For headings use short phrase (3-6 words). Explanations: 1-2 concise sentences.
-- Do NOT output additional commentary or markdown.
-
-CHUNK PAGES: {start_page} - {end_page}
-CHUNK TEXT:
----
-{chunk_text}
----
-""")
-
-REDUCER_PROMPT_TPL = textwrap.dedent("""
-You are an expert data merger for structured JSONs extracted from chunks of a PDF.
-You will be given a JSON array of partial extraction objects (each following the schema below).
-Merge them into a single final JSON object following the same schema.
-
-Schema of each partial:
-{{
-  "title": null | string,
-  "venue": null | string,
-  "year": null | integer,
-  "datasets": [{{"name": string, "page": integer, "quote": string}}],
-  "limitations_addressed": [...],
-  "contributions": [...],
-  "methods": [...],
-  "paper_limitations": [...],
-  "evidence": [...]
-}}
-
-Merging rules:
-- For scalar fields (title, venue, year): prefer entries which have evidence (non-null) and choose the one with the clearest quote. If multiple different values exist and it's ambiguous, set null.
-- For list fields: combine all items, deduplicate by normalized key (for datasets normalize by removing non-alphanumeric and lowercasing; for headings normalize by lowercasing and trimming). Preserve the original 'name'/'heading' as first occurrence.
-- Evidence: include unique evidence items sorted by page.
-- Do NOT invent missing information.
-
-Return exactly one JSON object and nothing else.
-
-Partials:
-{partials_json}
-""")
-
-# NEW: Summary prompt template
-SUMMARY_PROMPT_TPL = textwrap.dedent("""
-You are an expert academic summarizer. Create a comprehensive summary of this research paper.
-
-Paper content:
----
-{paper_text}
----
-
-Please provide a structured summary with the following sections:
-
-**Abstract/Overview** (2-3 sentences): Main purpose and key findings
-**Problem Statement** (1-2 sentences): What problem does this paper address?
-**Methodology** (2-3 sentences): How did they approach the problem?
-**Key Contributions** (3-4 bullet points): Main innovations or findings
-**Results** (1-2 sentences): What were the main outcomes?
-**Limitations** (1-2 sentences): What are the acknowledged limitations?
-**Impact** (1-2 sentences): Why is this work important?
-
-Keep the summary concise but comprehensive, focusing on the most important aspects of the research.
-""")
-
-# --------------------------
-# Parse model JSON robustly (unchanged)
-# --------------------------
-def parse_json_loose(s: str):
-    if not isinstance(s, str):
-        return s
-    text = s.strip()
-    # remove triple-fence blocks
-    if text.startswith("```"):
-        text = re.sub(r"^```[\w]*", "", text)
-        text = text.rsplit("```", 1)[0]
-    # find first { ... } block
-    start = text.find("{")
-    end = text.rfind("}")
-    if start == -1 or end == -1 or end <= start:
-        raise ValueError("No JSON object found in model output.")
-    json_text = text[start:end+1]
-    return json.loads(json_text)
-
-# --------------------------
-# LLM call helper (unchanged)
-# --------------------------
-def llm_json_call(prompt_text: str):
-    res = MODEL.invoke(prompt_text)
-    content = getattr(res, "content", res)
-    return parse_json_loose(content)
-
-def llm_text_call(prompt_text: str):
-    """For non-JSON responses like summaries"""
-    res = MODEL.invoke(prompt_text)
-    content = getattr(res, "content", res)
-    return content
-
-# --------------------------
-# Normalization helpers (unchanged)
-# --------------------------
-def normalize_dataset_key(name: str):
-    # remove non-alphanum, lower
-    return re.sub(r"[^0-9a-z]", "", name.lower())
-
-def dedupe_datasets(dataset_objs):
-    seen = {}
-    result = []
-    for d in dataset_objs:
-        name = d.get("name", "").strip()
-        if not name:
-            continue
-        key = normalize_dataset_key(name)
-        if key not in seen:
-            seen[key] = True
-            result.append(d)
-    return result
-
-def dedupe_list_of_heading_objs(items):
-    seen = set()
-    out = []
-    for it in items:
-        heading = (it.get("heading") or "").strip()
-        if not heading:
-            continue
-        key = heading.lower()
-        if key not in seen:
-            seen.add(key)
-            out.append(it)
-    return out
+    """), unsafe_allow_html=True)
 
 # --------------------------
 # Enhanced rendering helpers
@@ -625,6 +455,16 @@ def render_evidence(evidence_items):
         </div>
         """, unsafe_allow_html=True)
 
+def render_detailed_extraction(merged):
+    """Body of the Detailed Extraction tab"""
+    render_heading_expl_list("Limitations Addressed", merged.get("limitations_addressed", []), "🎯")
+    render_heading_expl_list("Contributions & Solutions", merged.get("contributions", []), "💡")
+    render_heading_expl_list("Methods & Approaches", merged.get("methods", []), "🔧")
+    render_heading_expl_list("Paper Limitations", merged.get("paper_limitations", []), "⚠️")
+
+    # Evidence section
+    render_evidence(merged.get("evidence", []))
+
 def render_summary(summary_text):
     """Render paper summary with special styling"""
     st.markdown('<div class="section-header">📊 Paper Summary</div>', unsafe_allow_html=True)
@@ -637,6 +477,146 @@ def render_summary(summary_text):
     </div>
     """, unsafe_allow_html=True)
 
+def render_timing_panel(trace):
+    """Stage durations, model calls per prompt kind and the slowest chunks of one run"""
+    if not trace:
+        return
+    with st.expander("⏱️ Timing & cost", expanded=False):
+        root = next((sp for sp in trace if sp["name"] == "process_paper"), None)
+        stages = [sp for sp in trace if sp["name"] in ("read_pdf", "chunk_pages", "retrieval", "map", "merge", "summary", "store")]
+        calls = [sp for sp in trace if sp["name"] == "llm"]
+        tokens_in = sum(sp.get("tokens_in") or 0 for sp in calls)
+        tokens_out = sum(sp.get("tokens_out") or 0 for sp in calls)
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Total time", f"{root['duration']:.1f}s" if root else "-")
+        col2.metric("Model calls", len(calls), f"{sum(bool(sp.get('cache_hit')) for sp in calls)} cached", delta_color="off")
+        col3.metric("Tokens in", f"{tokens_in:,}")
+        col4.metric("Tokens out", f"{tokens_out:,}")
+
+        if stages:
+            st.markdown("**Stages** (parsing overlaps with the model calls of the map stage)")
+            st.table([{"stage": sp["name"], "seconds": round(sp["duration"], 2)} for sp in stages])
+
+        by_kind = {}
+        for sp in calls:
+            row = by_kind.setdefault(sp.get("kind", "llm"), {
+                "kind": sp.get("kind", "llm"), "calls": 0, "cache hits": 0, "errors": 0, "retries": 0,
+                "tokens in": 0, "tokens out": 0, "seconds": 0.0, "slowest s": 0.0,
+            })
+            row["calls"] += 1
+            row["cache hits"] += bool(sp.get("cache_hit"))
+            row["errors"] += bool(sp.get("error"))
+            row["retries"] += sp.get("retries", 0)
+            row["tokens in"] += sp.get("tokens_in") or 0
+            row["tokens out"] += sp.get("tokens_out") or 0
+            row["seconds"] += sp["duration"]
+            row["slowest s"] = max(row["slowest s"], sp["duration"])
+        if by_kind:
+            st.markdown("**Model calls** (seconds are summed over parallel calls)")
+            st.table([{**row, "seconds": round(row["seconds"], 2), "slowest s": round(row["slowest s"], 2)}
+                      for row in by_kind.values()])
+
+        chunks = sorted((sp for sp in trace if sp["name"] == "chunk"), key=lambda sp: sp["duration"], reverse=True)
+        if chunks:
+            st.markdown("**Slowest chunks**")
+            st.table([{
+                "chunk": sp.get("field") or f"pages {sp.get('start_page')}-{sp.get('end_page')}",
+                "seconds": round(sp["duration"], 2),
+                "error": sp.get("error") or "",
+            } for sp in chunks[:5]])
+
+def make_session_entry(result, options):
+    """What a finished run keeps in st.session_state; download payloads are encoded once here"""
+    merged = result["merged"]
+    paper_summary = result["summary"]
+    return {
+        "options": options,
+        "result": result,
+        "json_bytes": dumps_json(merged, indent=True),
+        "summary_bytes": f"PAPER SUMMARY\n{'='*50}\n\n{paper_summary}".encode("utf-8"),
+    }
+
+def render_results(entry, show_timings=False):
+    """Status cards, result tabs and downloads for one processed paper"""
+    result = entry["result"]
+    merged = result["merged"]
+    paper_summary = result["summary"]
+
+    for warning in result["warnings"]:
+        st.warning(warning)
+
+    if result["from_store"]:
+        st.markdown(f"""
+        <div class="success-card">
+            ⚡ <strong>Known paper:</strong> loaded the stored extraction ({result['n_pages']} pages) without calling the model
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown(f"""
+        <div class="success-card">
+            ✅ <strong>PDF processed successfully:</strong> {len(result['pages'])} pages of text extracted and analyzed in {len(result['chunks'])} chunks
+        </div>
+        """, unsafe_allow_html=True)
+        if result.get("reused_chunks"):
+            st.markdown(f"""
+            <div class="info-card">
+                ♻️ <strong>Revised version of a stored paper:</strong> {result['reused_chunks']} of {len(result['chunks'])} chunks were unchanged and reused their stored results, only the rest were sent to the model
+            </div>
+            """, unsafe_allow_html=True)
+
+    # Display results with enhanced UI using tabs
+    st.markdown('<div class="results-container">', unsafe_allow_html=True)
+    tab1, tab2 = st.tabs(["📊 Summary & Overview", "📝 Detailed Extraction"])
+
+    with tab1:
+        # Paper Summary (NEW)
+        render_summary(paper_summary)
+
+        # Basic information
+        render_basic_info(merged)
+
+    with tab2:
+        render_detailed_extraction(merged)
+
+    st.markdown('</div>', unsafe_allow_html=True)
+
+    if show_timings:
+        render_timing_panel(result.get("trace"))
+
+    # Download section
+    st.markdown('<div class="section-header">💾 Export Results</div>', unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        # Download JSON extraction
+        st.download_button(
+            "⬇️ Download Extraction (JSON)",
+            data=entry["json_bytes"],
+            file_name="paper_extraction.json",
+            mime="application/json",
+            use_container_width=True
+        )
+
+    with col2:
+        # Download summary as text
+        st.download_button(
+            "📄 Download Summary (TXT)",
+            data=entry["summary_bytes"],
+            file_name="paper_summary.txt",
+            mime="text/plain",
+            use_container_width=True
+        )
+
+    # Success message
+    st.markdown("""
+    <div class="success-card">
+        🎉 <strong>Processing Complete!</strong> Your research paper has been successfully analyzed, summarized, and all available information has been extracted. 
+        If some fields show "Not mentioned", they may not be present in the searchable text or could be in figures/images only.
+    </div>
+    """, unsafe_allow_html=True)
+
 # --------------------------
 # Enhanced Streamlit UI
 # --------------------------
@@ -650,6 +630,11 @@ st.set_page_config(
 # Load custom CSS
 load_custom_css()
 
+# Processed papers for this browser session, keyed by PDF hash
+if "papers" not in st.session_state:
+    st.session_state.papers = {}
+    st.session_state.current_paper = None
+
 # Enhanced header
 st.markdown("""
 <div class="header-container">
@@ -670,6 +655,13 @@ with col1:
 
 with col2:
     title_hint = st.text_input("Paper title (optional)", placeholder="Enter paper title to help with extraction", help="If you know the paper title, it can improve extraction accuracy")
+    retrieval_mode = st.selectbox("Context sent to the model", list(RETRIEVAL_MODES), index=list(RETRIEVAL_MODES).index(RETRIEVAL_MODE) if RETRIEVAL_MODE in RETRIEVAL_MODES else 0, format_func=RETRIEVAL_MODES.get, help="Retrieval sends only the most relevant passages for each field, which cuts prompt tokens on long papers")
+    merge_mode = st.selectbox("Merge strategy", list(MERGE_MODES), index=list(MERGE_MODES).index(MERGE_MODE) if MERGE_MODE in MERGE_MODES else 0, format_func=MERGE_MODES.get, help="How per-chunk results are combined. The local merge needs no extra model call.")
+    summary_mode = st.selectbox("Summary", list(SUMMARY_MODES), index=list(SUMMARY_MODES).index(SUMMARY_MODE) if SUMMARY_MODE in SUMMARY_MODES else 0, format_func=SUMMARY_MODES.get, help="The whole-paper summary notes every chunk alongside the extraction, then combines the notes in one call")
+    reuse_stored = st.checkbox("Load known papers from the store", value=PAPER_STORE_ENABLED, disabled=not PAPER_STORE_ENABLED, help="Papers that were processed before (same PDF) are loaded from the local store instead of being extracted again")
+    stream_output = st.checkbox("Stream results as they are generated", value=STREAM_OUTPUT, help="Show extracted items as soon as the model writes them and the summary token by token")
+    show_timings = st.checkbox("Show timing panel", value=SHOW_TIMINGS, help="Time spent per stage, model calls, token counts and the slowest chunks of the last run")
+    use_cache = st.checkbox("Reuse cached results", value=LLM_CACHE_ENABLED, disabled=not LLM_CACHE_ENABLED, help="Answer repeated chunks, merges and summaries from the local response cache instead of calling the model again")
     
     st.markdown("""
     <div style="color: #e2e8f0; margin-top: 1rem;">
@@ -701,26 +693,33 @@ with col2:
             """, unsafe_allow_html=True)
             st.stop()
             
-        # Loading indicator
+        # The pipeline gets a file it can memory-map where possible: an upload is written to a
+        # temp file once, a cached download is read from the cache file. Both are released
+        # (temp file removed) as soon as the paper is processed.
+        pdf_files = ExitStack()
         with st.spinner("Loading PDF..."):
             try:
                 if uploaded_file:
-                    pdf_bytes = uploaded_file.read()
+                    from pdf_fetch import save_upload, temp_pdf
+                    uploaded_file.seek(0)
+                    pdf_source = pdf_files.enter_context(temp_pdf(save_upload(uploaded_file)))
                     st.markdown(f"""
                     <div class="info-card">
-                        📁 <strong>File loaded:</strong> {uploaded_file.name} ({len(pdf_bytes):,} bytes)
+                        📁 <strong>File loaded:</strong> {uploaded_file.name} ({uploaded_file.size:,} bytes)
                     </div>
                     """, unsafe_allow_html=True)
                 else:
-                    r = requests.get(pdf_url, timeout=60)
-                    r.raise_for_status()
-                    pdf_bytes = r.content
+                    from pdf_fetch import get_fetcher
+                    download = pdf_files.enter_context(get_fetcher().fetch(pdf_url))
+                    pdf_source = download.path or download.read()
+                    origin = "unchanged since the last download, served from the local cache" if download.from_cache else "retrieved"
                     st.markdown(f"""
                     <div class="info-card">
-                        🌐 <strong>URL loaded:</strong> {len(pdf_bytes):,} bytes retrieved
+                        🌐 <strong>URL loaded:</strong> {download.size:,} bytes {origin}
                     </div>
                     """, unsafe_allow_html=True)
             except Exception as e:
+                pdf_files.close()
                 st.markdown(f"""
                 <div class="warning-card">
                     ❌ <strong>Error loading PDF:</strong> {str(e)}
@@ -728,170 +727,106 @@ with col2:
                 """, unsafe_allow_html=True)
                 st.stop()
 
-        # Process PDF
-        with st.spinner("Extracting text from PDF..."):
-            pages = read_pdf_bytes(pdf_bytes)
-            if not pages or all(p.strip()=="" for p in pages):
+        with st.spinner("Loading extraction pipeline..."):
+            pipeline = load_pipeline()
+
+        doc_hash = pipeline.pdf_hash(pdf_source)
+        options = {
+            "title_hint": title_hint, "merge_mode": merge_mode, "summary_mode": summary_mode,
+            "retrieval_mode": retrieval_mode, "use_cache": use_cache, "reuse_stored": reuse_stored,
+        }
+        known = st.session_state.papers.get(doc_hash)
+        if known and known["options"] == options:
+            # Same PDF and settings as earlier in this session: nothing to recompute
+            pdf_files.close()
+            st.session_state.current_paper = doc_hash
+        else:
+            # Progress tracking
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            status_text.text("Extracting text from PDF...")
+
+            # Live view while chunks complete; replaced by the stored results below once done
+            results_view = st.empty()
+            with results_view.container():
+                st.markdown('<div class="results-container">', unsafe_allow_html=True)
+                tab1, tab2 = st.tabs(["📊 Summary & Overview", "📝 Detailed Extraction"])
+                overview_view = tab1.empty()
+                summary_view = tab1.empty()
+                detail_view = tab2.empty()
+                st.markdown('</div>', unsafe_allow_html=True)
+
+            # finished chunks are in `running`; chunks still streaming are previewed on top of it
+            live = {"running": pipeline.empty_extraction(), "inflight": {}, "drawn": 0.0, "summary_drawn": 0.0}
+
+            def draw_live(force=False):
+                now = time.monotonic()
+                if not force and now - live["drawn"] < 0.3:
+                    return
+                live["drawn"] = now
+                view = live["running"]
+                if live["inflight"]:
+                    view = pipeline.merge_partials_local([view] + list(live["inflight"].values()))
+                with overview_view.container():
+                    render_basic_info(view)
+                with detail_view.container():
+                    render_detailed_extraction(view)
+
+            def on_chunk_done(done, total, i, ch, partial, running):
+                label = f"{ch['field']} passages" if "field" in ch else "chunk"
+                status_text.text(f"Processed {label} {done}/{total} (pages {ch['start_page']}-{ch['end_page']})")
+                progress_bar.progress(done/total)
+                live["inflight"].pop(i, None)
+                live["running"] = running
+                draw_live(force=True)
+
+            def on_chunk_progress(i, ch, partial):
+                live["inflight"][i] = partial
+                draw_live()
+
+            def on_summary_text(text):
+                now = time.monotonic()
+                if now - live["summary_drawn"] < 0.1:
+                    return
+                live["summary_drawn"] = now
+                with summary_view.container():
+                    render_summary(text + " ▌")
+
+            streaming = {"on_chunk_progress": on_chunk_progress, "on_summary_text": on_summary_text} if stream_output else {}
+            try:
+                result = pipeline.process_paper(
+                    pdf_source, on_status=status_text.text, on_chunk_done=on_chunk_done, **streaming, **options
+                )
+            except pipeline.NoTextError:
+                progress_bar.empty()
+                status_text.empty()
+                results_view.empty()
                 st.markdown("""
                 <div class="warning-card">
                     ❌ <strong>No extractable text found:</strong> This PDF might be scanned or image-based. Please provide a searchable PDF or use OCR preprocessing.
                 </div>
                 """, unsafe_allow_html=True)
                 st.stop()
-
-            st.markdown(f"""
-            <div class="success-card">
-                ✅ <strong>PDF processed successfully:</strong> {len(pages)} pages of text extracted
-            </div>
-            """, unsafe_allow_html=True)
-
-        # Chunk processing
-        chunks = chunk_pages(pages, max_chars=12000, max_pages_per_chunk=5)
-        
-        st.markdown(f"""
-        <div class="info-card">
-            🔄 <strong>Processing:</strong> Analyzing {len(chunks)} chunks with AI model...
-        </div>
-        """, unsafe_allow_html=True)
-
-        # Progress tracking
-        partials = []
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        for i, ch in enumerate(chunks, start=1):
-            status_text.text(f"Processing chunk {i}/{len(chunks)} (pages {ch['start_page']}-{ch['end_page']})")
-            
-            prompt = CHUNK_PROMPT_TPL.format(
-                chunk_text=ch["text"], 
-                start_page=ch["start_page"], 
-                end_page=ch["end_page"]
-            )
-            
-            try:
-                partial = llm_json_call(prompt)
-            except Exception as e:
-                partial = {
-                    "title": None, "venue": None, "year": None,
-                    "datasets": [], "limitations_addressed": [], "contributions": [],
-                    "methods": [], "paper_limitations": [], "evidence": []
-                }
-                partial["_error"] = str(e)
-            
-            partials.append(partial)
-            progress_bar.progress(i/len(chunks))
-
-        status_text.text("Merging results...")
-
-        # Merge results
-        try:
-            partials_json = json.dumps(partials, ensure_ascii=False)
-            reducer_prompt = REDUCER_PROMPT_TPL.format(partials_json=partials_json)
-            merged = llm_json_call(reducer_prompt)
-        except Exception as e:
-            st.warning(f"Merger failed: {e}. Using fallback merge.")
-            # fallback: naive merge
-            merged = {
-                "title": None, "venue": None, "year": None,
-                "datasets": [], "limitations_addressed": [], "contributions": [],
-                "methods": [], "paper_limitations": [], "evidence": []
-            }
-            # naive aggregation
-            for p in partials:
-                for k in merged.keys():
-                    if isinstance(merged[k], list):
-                        merged[k].extend(p.get(k, []) or [])
-                    else:
-                        if not merged[k] and p.get(k):
-                            merged[k] = p.get(k)
-
-        # Post-process: dedupe datasets & headings
-        merged["datasets"] = dedupe_datasets(merged.get("datasets", []))
-        merged["limitations_addressed"] = dedupe_list_of_heading_objs(merged.get("limitations_addressed", []))
-        merged["contributions"] = dedupe_list_of_heading_objs(merged.get("contributions", []))
-        merged["methods"] = dedupe_list_of_heading_objs(merged.get("methods", []))
-        merged["paper_limitations"] = dedupe_list_of_heading_objs(merged.get("paper_limitations", []))
-
-        # If title missing, use hint
-        if not merged.get("title") and title_hint:
-            merged["title"] = title_hint
-
-        # NEW: Generate paper summary
-        status_text.text("Generating paper summary...")
-        try:
-            # Take first 5 pages or up to 15000 chars for summary
-            summary_text = "\n\n".join(pages[:5])
-            if len(summary_text) > 15000:
-                summary_text = summary_text[:15000] + "..."
-            
-            summary_prompt = SUMMARY_PROMPT_TPL.format(paper_text=summary_text)
-            paper_summary = llm_text_call(summary_prompt)
-        except Exception as e:
-            paper_summary = f"Summary generation failed: {str(e)}"
-
-        # Clear progress indicators
-        progress_bar.empty()
-        status_text.empty()
-
-        # Display results with enhanced UI using tabs
-        st.markdown('<div class="results-container">', unsafe_allow_html=True)
-        
-        # Create tabs for different views
-        tab1, tab2 = st.tabs(["📊 Summary & Overview", "📝 Detailed Extraction"])
-        
-        with tab1:
-            # Paper Summary (NEW)
-            render_summary(paper_summary)
-            
-            # Basic information
-            render_basic_info(merged)
-            
-        with tab2:
-            # Detailed sections
-            render_heading_expl_list("Limitations Addressed", merged.get("limitations_addressed", []), "🎯")
-            render_heading_expl_list("Contributions & Solutions", merged.get("contributions", []), "💡")
-            render_heading_expl_list("Methods & Approaches", merged.get("methods", []), "🔧")
-            render_heading_expl_list("Paper Limitations", merged.get("paper_limitations", []), "⚠️")
-            
-            # Evidence section
-            render_evidence(merged.get("evidence", []))
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-
-        # Download section
-        st.markdown('<div class="section-header">💾 Export Results</div>', unsafe_allow_html=True)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Download JSON extraction
-            out_bytes = json.dumps(merged, ensure_ascii=False, indent=2).encode("utf-8")
-            st.download_button(
-                "⬇️ Download Extraction (JSON)",
-                data=out_bytes,
-                file_name="paper_extraction.json",
-                mime="application/json",
-                use_container_width=True
-            )
-            
-        with col2:
-            # Download summary as text
-            summary_bytes = f"PAPER SUMMARY\n{'='*50}\n\n{paper_summary}".encode("utf-8")
-            st.download_button(
-                "📄 Download Summary (TXT)",
-                data=summary_bytes,
-                file_name="paper_summary.txt",
-                mime="text/plain",
-                use_container_width=True
-            )
-
-        # Success message
-        st.markdown("""
-        <div class="success-card">
-            🎉 <strong>Processing Complete!</strong> Your research paper has been successfully analyzed, summarized, and all available information has been extracted. 
-            If some fields show "Not mentioned", they may not be present in the searchable text or could be in figures/images only.
-        </div>
-        """, unsafe_allow_html=True)
+            finally:
+                pdf_files.close()
+
+            # Clear progress indicators
+            progress_bar.empty()
+            status_text.empty()
+            results_view.empty()
+
+            st.session_state.papers.pop(doc_hash, None)
+            st.session_state.papers[doc_hash] = make_session_entry(result, options)
+            st.session_state.current_paper = doc_hash
+            # keep only the most recent papers of this session in memory
+            while len(st.session_state.papers) > MAX_SESSION_PAPERS:
+                st.session_state.papers.pop(next(iter(st.session_state.papers)))
+
+    # Results live in session state, so downloads and tab switches (which rerun the
+    # script) re-render them without parsing the PDF or calling the model again
+    current = st.session_state.papers.get(st.session_state.current_paper)
+    if current:
+        render_results(current, show_timings=show_timings)
 
 # Footer
 st.markdown("""
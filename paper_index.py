@@ -0,0 +1,372 @@
+# paper_index.py
+# Cross-paper index of finished extractions: which papers use a dataset or method, by venue and
+# year, with the page / quote each mention came from.
+#
+# An SQLite inverted index next to the paper store (its own file, so it can be dropped and
+# rebuilt at any time). Terms are normalized the way the merge dedupes them (dedupe.py):
+# "CIFAR10", "CIFAR-10 dataset" and "cifar 10" share one dataset term, method headings share
+# a term when their stemmed key matches, venues are reduced to a short key ("NeurIPS 2021",
+# "Advances in Neural Information Processing Systems" -> "neurips"). add() replaces one paper's
+# rows in a single transaction, so the index is kept current as papers are processed.
+#
+# CLI:
+#   python paper_index.py build results.jsonl [...] | --from-store
+#   python paper_index.py query --dataset CIFAR-10 --since 2020 [--method ...] [--venue ...]
+#   python paper_index.py terms dataset [--top 20]
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from itertools import chain
+
+from dedupe import dataset_profile, heading_profile
+from result_model import as_int
+
+# frequent long venue names -> their short form (keys go through the same cleanup as the
+# names looked up: lowercase, no digits / punctuation / "proceedings of the" style filler)
+VENUE_ALIASES = {
+    "nips": "neurips",
+    "advances in neural information processing systems": "neurips",
+    "neural information processing systems": "neurips",
+    "international conference on machine learning": "icml",
+    "international conference on learning representations": "iclr",
+    "conference on computer vision and pattern recognition": "cvpr",
+    "ieee conference on computer vision and pattern recognition": "cvpr",
+    "ieee cvf conference on computer vision and pattern recognition": "cvpr",
+    "international conference on computer vision": "iccv",
+    "ieee international conference on computer vision": "iccv",
+    "european conference on computer vision": "eccv",
+    "annual meeting of the association for computational linguistics": "acl",
+    "conference on empirical methods in natural language processing": "emnlp",
+    "aaai conference on artificial intelligence": "aaai",
+    "international joint conference on artificial intelligence": "ijcai",
+    "transactions on machine learning research": "tmlr",
+    "journal of machine learning research": "jmlr",
+    "arxiv preprint": "arxiv",
+    "arxiv preprint arxiv": "arxiv",
+}
+_VENUE_FILLER = re.compile(r"\b(proceedings|proc|of|the|th|st|nd|rd|in|ieee|cvf)\b")
+# a trailing short form in parentheses: "... Pattern Recognition (CVPR)", "(ACL 2020)"
+_VENUE_ACRONYM = re.compile(r"\(\s*([A-Za-z]{2,10})(?:[\s'-]*\d+)?\s*\)\s*$")
+# prefixes written joined, hyphenated or apart ("pre-training", "pretraining", "pre training")
+_JOINED_PREFIX = re.compile(r"\b(pre|post|self|cross|multi|semi|non|co|re|sub|inter|intra|meta)[\s-]+(?=[a-z])")
+
+
+def _venue_text(venue):
+    text = re.sub(r"\([^)]*\)|[^a-z ]", " ", str(venue).lower())
+    return " ".join(_VENUE_FILLER.sub(" ", text).split())
+
+
+VENUE_ALIASES = {_venue_text(k): v for k, v in VENUE_ALIASES.items()}
+
+
+def venue_key(venue):
+    """Short comparable form of a venue name ("NeurIPS 2021" -> "neurips"), None if empty"""
+    if not venue:
+        return None
+    acronym = _VENUE_ACRONYM.search(str(venue))
+    text = acronym.group(1).lower() if acronym else _venue_text(venue)
+    if not text:
+        return None
+    return VENUE_ALIASES.get(text, text)
+
+
+def dataset_key(name):
+    return dataset_profile(name)["key"] or None
+
+
+def method_key(heading):
+    return heading_profile(_JOINED_PREFIX.sub(r"\1", heading.lower()))["key"] or None
+
+
+_TERM_KEYS = {"dataset": dataset_key, "method": method_key}
+# (kind, merged field, item field holding the name)
+_POSTED_FIELDS = [("dataset", "datasets", "name"), ("method", "methods", "heading")]
+
+
+class PaperIndex:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._term_ids = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS papers (
+                id INTEGER PRIMARY KEY,
+                doc_hash TEXT UNIQUE NOT NULL,
+                title TEXT,
+                venue TEXT,
+                venue_key TEXT,
+                year INTEGER,
+                indexed_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_papers_year ON papers(year);
+            CREATE INDEX IF NOT EXISTS idx_papers_venue ON papers(venue_key, year);
+            CREATE TABLE IF NOT EXISTS terms (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                UNIQUE (kind, key)
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term_id INTEGER NOT NULL,
+                paper_id INTEGER NOT NULL,
+                year INTEGER,
+                name TEXT,
+                page INTEGER,
+                quote TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_postings_term ON postings(term_id, paper_id);
+            CREATE INDEX IF NOT EXISTS idx_postings_year ON postings(term_id, year, paper_id);
+            CREATE INDEX IF NOT EXISTS idx_postings_paper ON postings(paper_id);
+        """)
+        self._conn.commit()
+
+    # --------------------------
+    # Updates
+    # --------------------------
+    def add(self, doc_hash, merged):
+        """Index one paper's merged extraction, replacing what was indexed for it before"""
+        self.add_many([(doc_hash, merged)])
+
+    def add_many(self, items):
+        """add() for (doc_hash, merged) pairs in one transaction (bulk builds)"""
+        with self._lock:
+            try:
+                with self._conn:
+                    for doc_hash, merged in items:
+                        self._add(doc_hash, merged or {})
+            except BaseException:
+                self._term_ids.clear()  # may hold ids of terms that were rolled back
+                raise
+
+    def _add(self, doc_hash, merged):
+        venue = merged.get("venue") or None
+        year = as_int(merged.get("year"))
+        self._conn.execute(
+            "INSERT INTO papers (doc_hash, title, venue, venue_key, year, indexed_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(doc_hash) DO UPDATE SET title = excluded.title, venue = excluded.venue, "
+            "venue_key = excluded.venue_key, year = excluded.year, indexed_at = excluded.indexed_at",
+            (doc_hash, merged.get("title") or None, venue, venue_key(venue), year, time.time())
+        )
+        paper_id = self._conn.execute("SELECT id FROM papers WHERE doc_hash = ?", (doc_hash,)).fetchone()[0]
+        self._conn.execute("DELETE FROM postings WHERE paper_id = ?", (paper_id,))
+        rows = []
+        for kind, field, name_field in _POSTED_FIELDS:
+            for item in merged.get(field) or []:
+                name = item.get(name_field)
+                key = _TERM_KEYS[kind](name) if name else None
+                if key:
+                    rows.append((self._term_id(kind, key, create=True), paper_id, year, name,
+                                 as_int(item.get("page")), item.get("quote") or None))
+        self._conn.executemany(
+            "INSERT INTO postings (term_id, paper_id, year, name, page, quote) VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+
+    def _term_id(self, kind, key, create=False):
+        term_id = self._term_ids.get((kind, key))
+        if term_id is None:
+            row = self._conn.execute("SELECT id FROM terms WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+            if row is not None:
+                term_id = row[0]
+            elif create:
+                term_id = self._conn.execute("INSERT INTO terms (kind, key) VALUES (?, ?)", (kind, key)).lastrowid
+            else:
+                return None
+            self._term_ids[(kind, key)] = term_id
+        return term_id
+
+    def remove(self, doc_hash):
+        with self._lock:
+            with self._conn:
+                row = self._conn.execute("SELECT id FROM papers WHERE doc_hash = ?", (doc_hash,)).fetchone()
+                if row:
+                    self._conn.execute("DELETE FROM postings WHERE paper_id = ?", (row[0],))
+                    self._conn.execute("DELETE FROM papers WHERE id = ?", (row[0],))
+
+    def has(self, doc_hash):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM papers WHERE doc_hash = ?", (doc_hash,)).fetchone() is not None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    # --------------------------
+    # Queries
+    # --------------------------
+    def query(self, dataset=None, method=None, venue=None, since=None, until=None, limit=100):
+        """Papers matching every given filter, newest first.
+
+        dataset / method / venue are matched by their normalized key, since / until are
+        inclusive years. Returns [{"doc_hash", "title", "venue", "year", "evidence"}], where
+        evidence lists the matching mentions as {"kind", "name", "page", "quote"}.
+        """
+        with self._lock:
+            terms = []
+            for kind, value in (("dataset", dataset), ("method", method)):
+                if not value:
+                    continue
+                key = _TERM_KEYS[kind](value)
+                term_id = self._term_id(kind, key) if key else None
+                if term_id is None:
+                    return []
+                terms.append(term_id)
+            conds, params = [], []
+            if terms:
+                # walk the rarest term's postings newest first (they carry the year, so LIMIT
+                # stops the walk early); the other filters are lookups per paper
+                terms.sort(key=self._df)
+                table, paper_id = "postings d", "d.paper_id"
+                conds.append("d.term_id = ?")
+                params.append(terms[0])
+                for term_id in terms[1:]:
+                    conds.append("EXISTS (SELECT 1 FROM postings e WHERE e.term_id = ? AND e.paper_id = d.paper_id)")
+                    params.append(term_id)
+                if venue:
+                    conds.append("EXISTS (SELECT 1 FROM papers v WHERE v.id = d.paper_id AND v.venue_key = ?)")
+                    params.append(venue_key(venue))
+            else:
+                table, paper_id = "papers d", "d.id"
+                if venue:
+                    conds.append("d.venue_key = ?")
+                    params.append(venue_key(venue))
+            if since is not None:
+                conds.append("d.year >= ?")
+                params.append(int(since))
+            if until is not None:
+                conds.append("d.year <= ?")
+                params.append(int(until))
+            ids = [r[0] for r in self._conn.execute(
+                f"SELECT DISTINCT {paper_id}, d.year FROM {table} WHERE {' AND '.join(conds) or '1'} "
+                f"ORDER BY d.year DESC, {paper_id} DESC LIMIT ?", params + [int(limit)]
+            )]
+            papers = {}
+            for batch in _batches(ids, 500):
+                marks = ",".join("?" * len(batch))
+                for r in self._conn.execute(
+                    f"SELECT id, doc_hash, title, venue, year FROM papers WHERE id IN ({marks})", batch
+                ):
+                    papers[r[0]] = {"doc_hash": r[1], "title": r[2], "venue": r[3], "year": r[4], "evidence": []}
+                if terms:
+                    for pid, kind, name, page, quote in self._conn.execute(
+                        "SELECT po.paper_id, t.kind, po.name, po.page, po.quote FROM postings po "
+                        f"JOIN terms t ON t.id = po.term_id WHERE po.term_id IN ({','.join('?' * len(terms))}) "
+                        f"AND po.paper_id IN ({marks}) ORDER BY po.rowid", terms + batch
+                    ):
+                        papers[pid]["evidence"].append({"kind": kind, "name": name, "page": page, "quote": quote})
+        return [papers[i] for i in ids]
+
+    def _df(self, term_id):
+        """Number of postings of a term"""
+        return self._conn.execute("SELECT COUNT(*) FROM postings WHERE term_id = ?", (term_id,)).fetchone()[0]
+
+    def terms(self, kind, top=20):
+        """Most used terms of a kind: [{"key", "name", "papers"}] (name = one spelling seen)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.key, MIN(po.name), COUNT(DISTINCT po.paper_id) AS n FROM terms t "
+                "JOIN postings po ON po.term_id = t.id WHERE t.kind = ? "
+                "GROUP BY t.id ORDER BY n DESC, t.key LIMIT ?", (kind, int(top))
+            ).fetchall()
+        return [{"key": r[0], "name": r[1], "papers": r[2]} for r in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --------------------------
+# CLI
+# --------------------------
+def _iter_jsonl(paths):
+    """(doc_hash, merged) from batch.py result files; records without either, or incomplete
+    ("partial", not stored by the pipeline either), are skipped"""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if rec.get("doc_hash") and rec.get("merged") and rec.get("status", "ok") == "ok":
+                    yield rec["doc_hash"], rec["merged"]
+
+
+def _batches(items, size=1000):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main(argv=None):
+    from config import PAPER_INDEX_PATH, VECTOR_DB_PATH
+
+    ap = argparse.ArgumentParser(description="Cross-paper index of datasets, methods, venues and years")
+    ap.add_argument("--index", default=PAPER_INDEX_PATH, help="index file")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="index extraction results")
+    b.add_argument("jsonl", nargs="*", help="batch.py output files")
+    b.add_argument("--from-store", action="store_true", help="also index every finished paper in the paper store")
+    q = sub.add_parser("query", help="papers matching every filter")
+    q.add_argument("--dataset")
+    q.add_argument("--method")
+    q.add_argument("--venue")
+    q.add_argument("--since", type=int, help="first year (inclusive)")
+    q.add_argument("--until", type=int, help="last year (inclusive)")
+    q.add_argument("--limit", type=int, default=50)
+    q.add_argument("--json", action="store_true", help="print JSON lines instead of a table")
+    t = sub.add_parser("terms", help="most used datasets / methods")
+    t.add_argument("kind", choices=sorted(_TERM_KEYS))
+    t.add_argument("--top", type=int, default=20)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build" and not args.jsonl and not args.from_store:
+        ap.error("build needs result files or --from-store")
+    index = PaperIndex(args.index)
+    if args.cmd == "build":
+        store = None
+        items = _iter_jsonl(args.jsonl)
+        if args.from_store:
+            from paper_store import PaperStore
+            store = PaperStore(VECTOR_DB_PATH)
+            items = chain(items, store.iter_merged())
+        t0 = time.perf_counter()
+        n = 0
+        for batch in _batches(items):
+            index.add_many(batch)
+            n += len(batch)
+        if store:
+            store.close()
+        print(f"indexed {n} papers in {time.perf_counter() - t0:.1f}s ({index.count()} in {args.index})")
+    elif args.cmd == "query":
+        hits = index.query(args.dataset, args.method, args.venue, args.since, args.until, args.limit)
+        for hit in hits:
+            if args.json:
+                print(json.dumps(hit, ensure_ascii=False))
+                continue
+            print(f"{hit['year'] or '----'}  {hit['venue'] or '-':<12.12}  {hit['title'] or hit['doc_hash'][:12]}")
+            for ev in hit["evidence"]:
+                where = f"p.{ev['page']}" if ev["page"] else "p.?"
+                print(f"      {ev['kind']:<7} {where:<5} {ev['name']}" + (f": \"{ev['quote']}\"" if ev["quote"] else ""))
+        if not args.json:
+            print(f"{len(hits)} papers", file=sys.stderr)
+    else:
+        for term in index.terms(args.kind, args.top):
+            print(f"{term['papers']:>7}  {term['name']}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+# paper_store.py
+# Local document store of processed papers, keyed by the SHA-256 of the PDF bytes.
+#
+# SQLite holds the metadata table, page text (with a hash per page), passages (with their
+# embeddings), the result of every chunk (partial + summary notes, keyed by a content hash so a
+# revised version of the paper can reuse them, see revision.py) and the
+# final merged extraction (in the compact binary form of result_model) + summary. Passage vectors are also kept in a faiss index on
+# disk (when faiss is installed) for cross-paper search; upserts are applied to the
+# in-memory index and written out by flush(), and compact() rebuilds everything so
+# replaced papers stop taking up space. Every change to the passages bumps a version in
+# SQLite and the faiss file records the version it was written at, so an index that missed
+# changes (made by a process that never searched, or by another process) is rebuilt from
+# SQLite instead of being searched.
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+
+from result_model import Extraction
+from retrieval import HashingEmbeddings, iter_passages
+
+def pdf_hash(source):
+    """SHA-256 of PDF bytes, or of a PDF file read in blocks"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    h = hashlib.sha256()
+    with open(source, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+# a header / footer line holding nothing but the page number ("12", "Page 12", "- 12 -")
+_PAGE_LABEL_RE = re.compile(r"(?:page\s*)?[-\u2013]?\s*\d{1,4}\s*[-\u2013]?", re.I)
+
+def mask_page_label(text):
+    """Page text with a page-number first / last line replaced by "#", so a page that only moved
+    (pages inserted or removed before it) keeps its hash"""
+    lines = text.split("\n")
+    for i in {0, len(lines) - 1}:
+        if _PAGE_LABEL_RE.fullmatch(lines[i].strip()):
+            lines[i] = "#"
+    return "\n".join(lines)
+
+def page_hash(text):
+    """Hash of one page's text (page number label masked), None for an empty page"""
+    return hashlib.sha256(mask_page_label(text).encode("utf-8")).hexdigest()[:32] if text.strip() else None
+
+def _pack(vec):
+    return array("f", vec).tobytes()
+
+def _unpack(blob):
+    vec = array("f")
+    vec.frombytes(blob)
+    return vec
+
+def _encode_merged(merged):
+    return Extraction.from_dict(merged).to_compact()
+
+def _decode_merged(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        # rows written before the compact form was introduced hold plain JSON
+        return json.loads(value)
+    return Extraction.from_compact(value).to_dict()
+
+class PaperStore:
+    def __init__(self, path, embeddings=None):
+        self.path = path
+        self.embeddings = embeddings or HashingEmbeddings()
+        os.makedirs(path, exist_ok=True)
+        self.index_path = os.path.join(path, "passages.faiss")
+        self._lock = threading.Lock()
+        self._index = None
+        self._index_version = None
+        self._dirty = False
+        self._conn = sqlite3.connect(os.path.join(path, "papers.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS papers (
+                doc_hash TEXT PRIMARY KEY,
+                title TEXT,
+                n_pages INTEGER,
+                merged TEXT,
+                summary TEXT,
+                updated_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                doc_hash TEXT,
+                page_no INTEGER,
+                text TEXT,
+                hash TEXT,
+                PRIMARY KEY (doc_hash, page_no)
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                doc_hash TEXT,
+                idx INTEGER,
+                start_page INTEGER,
+                end_page INTEGER,
+                hash TEXT,
+                partial TEXT,
+                notes TEXT,
+                PRIMARY KEY (doc_hash, idx)
+            );
+            CREATE TABLE IF NOT EXISTS passages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                doc_hash TEXT,
+                page_no INTEGER,
+                text TEXT,
+                vector BLOB
+            );
+            CREATE INDEX IF NOT EXISTS idx_passages_doc ON passages(doc_hash);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER
+            );
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('passages_version', 0);
+        """)
+        if "hash" not in [r[1] for r in self._conn.execute("PRAGMA table_info(pages)")]:
+            # stores written before page hashes: hash the stored pages once
+            self._conn.execute("ALTER TABLE pages ADD COLUMN hash TEXT")
+            rows = self._conn.execute("SELECT doc_hash, page_no, text FROM pages").fetchall()
+            self._conn.executemany("UPDATE pages SET hash = ? WHERE doc_hash = ? AND page_no = ?",
+                                   [(page_hash(text), d, n) for d, n, text in rows])
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_hash ON pages(hash)")
+        self._conn.commit()
+
+    # --------------------------
+    # Papers
+    # --------------------------
+    def get(self, doc_hash):
+        """Stored paper as {"doc_hash", "title", "n_pages", "merged", "summary"} or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_hash, title, n_pages, merged, summary FROM papers WHERE doc_hash = ?", (doc_hash,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "doc_hash": row[0], "title": row[1], "n_pages": row[2],
+            "merged": _decode_merged(row[3]), "summary": row[4],
+        }
+
+    def get_pages(self, doc_hash):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT text FROM pages WHERE doc_hash = ? ORDER BY page_no", (doc_hash,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def upsert(self, doc_hash, pages, merged=None, summary=None, chunks=None):
+        """Insert or replace a paper with its pages, passage embeddings and results.
+
+        chunks are the per-chunk results as {"start_page", "end_page", "hash", "partial", "notes"}
+        in chunk order (partial None where the chunk failed).
+        """
+        passages = list(iter_passages(pages))
+        vectors = self.embeddings.embed_documents([p["text"] for p in passages])
+        with self._lock:
+            old_ids = [r[0] for r in self._conn.execute("SELECT id FROM passages WHERE doc_hash = ?", (doc_hash,))]
+            self._conn.execute("DELETE FROM passages WHERE doc_hash = ?", (doc_hash,))
+            self._conn.execute("DELETE FROM pages WHERE doc_hash = ?", (doc_hash,))
+            self._conn.execute("DELETE FROM chunks WHERE doc_hash = ?", (doc_hash,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO papers (doc_hash, title, n_pages, merged, summary, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_hash, (merged or {}).get("title"), len(pages),
+                 _encode_merged(merged) if merged is not None else None, summary, time.time())
+            )
+            self._conn.executemany(
+                "INSERT INTO pages (doc_hash, page_no, text, hash) VALUES (?, ?, ?, ?)",
+                [(doc_hash, i, txt, page_hash(txt)) for i, txt in enumerate(pages, start=1)]
+            )
+            self._conn.executemany(
+                "INSERT INTO chunks (doc_hash, idx, start_page, end_page, hash, partial, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(doc_hash, i, c["start_page"], c["end_page"], c["hash"],
+                  json.dumps(c["partial"], ensure_ascii=False) if c["partial"] is not None else None, c["notes"])
+                 for i, c in enumerate(chunks or [])]
+            )
+            new_ids = []
+            for p, vec in zip(passages, vectors):
+                cur = self._conn.execute(
+                    "INSERT INTO passages (doc_hash, page_no, text, vector) VALUES (?, ?, ?, ?)",
+                    (doc_hash, p["page"], p["text"], _pack(vec))
+                )
+                new_ids.append(cur.lastrowid)
+            version = self._bump_version()
+            self._conn.commit()
+            if self._index_in_step(version):
+                self._index_remove(old_ids)
+                self._index_add(new_ids, vectors)
+
+    def update_results(self, doc_hash, merged=None, summary=None):
+        with self._lock:
+            if merged is not None:
+                self._conn.execute(
+                    "UPDATE papers SET merged = ?, title = ?, updated_at = ? WHERE doc_hash = ?",
+                    (_encode_merged(merged), merged.get("title"), time.time(), doc_hash)
+                )
+            if summary is not None:
+                self._conn.execute("UPDATE papers SET summary = ? WHERE doc_hash = ?", (summary, doc_hash))
+            self._conn.commit()
+
+    def delete(self, doc_hash):
+        with self._lock:
+            old_ids = [r[0] for r in self._conn.execute("SELECT id FROM passages WHERE doc_hash = ?", (doc_hash,))]
+            for table in ("passages", "pages", "chunks", "papers"):
+                self._conn.execute(f"DELETE FROM {table} WHERE doc_hash = ?", (doc_hash,))
+            version = self._bump_version()
+            self._conn.commit()
+            if self._index_in_step(version):
+                self._index_remove(old_ids)
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    # --------------------------
+    # Earlier versions (revision.py)
+    # --------------------------
+    def find_revision_base(self, pages, min_shared=None):
+        """The stored paper sharing the most of these pages (by hash) and having chunk results.
+
+        pages are page texts, usually the first few of a new PDF. At least min_shared of them
+        (default: half of the non-empty ones) must match; ties go to the newest paper. Returns
+        revision_base() of that paper or None.
+        """
+        hashes = list({h for h in map(page_hash, pages) if h})
+        if not hashes:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT p.doc_hash, COUNT(DISTINCT p.hash) AS shared FROM pages p "
+                "JOIN papers d ON d.doc_hash = p.doc_hash "
+                f"WHERE p.hash IN ({','.join('?' * len(hashes))}) "
+                "AND EXISTS (SELECT 1 FROM chunks c WHERE c.doc_hash = p.doc_hash) "
+                "GROUP BY p.doc_hash ORDER BY shared DESC, d.updated_at DESC LIMIT 1", hashes
+            ).fetchone()
+        if row is None or row[1] < (min_shared or max(1, (len(hashes) + 1) // 2)):
+            return None
+        return self.revision_base(row[0])
+
+    def revision_base(self, doc_hash):
+        """{"doc_hash", "page_hashes" (in page order), "chunks" (as given to upsert)} of a stored paper"""
+        with self._lock:
+            page_hashes = [r[0] for r in self._conn.execute(
+                "SELECT hash FROM pages WHERE doc_hash = ? ORDER BY page_no", (doc_hash,))]
+            rows = self._conn.execute(
+                "SELECT start_page, end_page, hash, partial, notes FROM chunks WHERE doc_hash = ? ORDER BY idx",
+                (doc_hash,)
+            ).fetchall()
+        chunks = [{"start_page": r[0], "end_page": r[1], "hash": r[2],
+                   "partial": json.loads(r[3]) if r[3] is not None else None, "notes": r[4]} for r in rows]
+        return {"doc_hash": doc_hash, "page_hashes": page_hashes, "chunks": chunks}
+
+    def iter_merged(self):
+        """(doc_hash, merged) of every paper with a final extraction"""
+        with self._lock:
+            hashes = [r[0] for r in self._conn.execute("SELECT doc_hash FROM papers WHERE merged IS NOT NULL")]
+        for doc_hash in hashes:
+            with self._lock:
+                row = self._conn.execute("SELECT merged FROM papers WHERE doc_hash = ?", (doc_hash,)).fetchone()
+            if row and row[0] is not None:
+                yield doc_hash, _decode_merged(row[0])
+
+    # --------------------------
+    # Cross-paper search
+    # --------------------------
+    def search(self, query, k=10):
+        """Top-k passages over every stored paper: [{"doc_hash", "title", "page", "text", "score"}]"""
+        q = self.embeddings.embed_query(query)
+        with self._lock:
+            hits = self._search_faiss(q, k)
+            if hits is None:
+                hits = self._search_brute(q, k)
+            out = []
+            for score, pid in hits:
+                row = self._conn.execute(
+                    "SELECT p.doc_hash, d.title, p.page_no, p.text FROM passages p "
+                    "JOIN papers d ON d.doc_hash = p.doc_hash WHERE p.id = ?", (pid,)
+                ).fetchone()
+                # ids another process removed since the index was checked are skipped here
+                if row:
+                    out.append({"doc_hash": row[0], "title": row[1], "page": row[2], "text": row[3], "score": score})
+        return out[:k]
+
+    def _search_brute(self, q, k):
+        scored = []
+        for pid, blob in self._conn.execute("SELECT id, vector FROM passages"):
+            vec = _unpack(blob)
+            scored.append((sum(a * b for a, b in zip(q, vec)), pid))
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        return scored[:k]
+
+    def _search_faiss(self, q, k):
+        if not self._load_index():
+            return None
+        import numpy as np
+        # over-fetch a little so ids removed meanwhile do not shrink the result
+        scores, ids = self._index.search(np.asarray([q], dtype="float32"), k * 2)
+        return [(float(s), int(i)) for s, i in zip(scores[0], ids[0]) if i >= 0]
+
+    # --------------------------
+    # faiss index maintenance
+    # --------------------------
+    def _meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _bump_version(self):
+        """New passages version, inside the caller's write transaction"""
+        self._conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'passages_version'")
+        return self._meta("passages_version")
+
+    def _index_in_step(self, version):
+        """Whether the in-memory index saw every change before this one (version); if so it is
+        now at version, otherwise it is dropped and rebuilt when next searched"""
+        if self._index is None:
+            return False
+        if self._index_version != version - 1:
+            self._index = None
+            return False
+        self._index_version = version
+        return True
+
+    def _load_index(self):
+        try:
+            import faiss
+        except ImportError:
+            return False
+        version = self._meta("passages_version")
+        if self._index is not None and self._index_version == version:
+            return True
+        if os.path.exists(self.index_path) and self._meta("faiss_version") == version:
+            self._index = faiss.read_index(self.index_path)
+            self._index_version = version
+            self._dirty = False
+        else:
+            # no file, or passages changed since it was written (here or in another process)
+            self._rebuild_index()
+        return True
+
+    def _rebuild_index(self):
+        import faiss
+        import numpy as np
+        # read before the passages: a change committed in between only makes the index look stale
+        self._index_version = self._meta("passages_version")
+        dim = len(self.embeddings.embed_query("dimension probe"))
+        self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        ids = []
+        vecs = []
+        for pid, blob in self._conn.execute("SELECT id, vector FROM passages"):
+            ids.append(pid)
+            vecs.append(_unpack(blob))
+        if ids:
+            self._index.add_with_ids(np.asarray(vecs, dtype="float32"), np.asarray(ids, dtype="int64"))
+        self._dirty = True
+
+    def _index_add(self, ids, vectors):
+        import numpy as np
+        if ids:
+            self._index.add_with_ids(np.asarray(vectors, dtype="float32"), np.asarray(ids, dtype="int64"))
+            self._dirty = True
+
+    def _index_remove(self, ids):
+        import numpy as np
+        if ids:
+            self._index.remove_ids(np.asarray(ids, dtype="int64"))
+            self._dirty = True
+
+    def flush(self):
+        """Write the in-memory faiss index to disk if it changed and is still current"""
+        with self._lock:
+            if self._index is None or not self._dirty:
+                return
+            import faiss
+            # under the SQLite write lock, so a writer in another process cannot slip a change
+            # between the version check and the file taking its place
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._meta("passages_version") == self._index_version:
+                    tmp = self.index_path + f".{os.getpid()}.tmp"
+                    faiss.write_index(self._index, tmp)
+                    os.replace(tmp, self.index_path)
+                    self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('faiss_version', ?)",
+                                       (self._index_version,))
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._dirty = False
+
+    def compact(self):
+        """Drop orphaned rows, reclaim SQLite space and rebuild the faiss index from scratch"""
+        with self._lock:
+            self._conn.execute("DELETE FROM passages WHERE doc_hash NOT IN (SELECT doc_hash FROM papers)")
+            self._conn.execute("DELETE FROM pages WHERE doc_hash NOT IN (SELECT doc_hash FROM papers)")
+            self._conn.execute("DELETE FROM chunks WHERE doc_hash NOT IN (SELECT doc_hash FROM papers)")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+            try:
+                import faiss  # noqa: F401
+            except ImportError:
+                return
+            self._rebuild_index()
+        self.flush()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
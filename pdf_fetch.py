@@ -0,0 +1,356 @@
+# pdf_fetch.py
+# Downloading PDFs by URL: one pooled HTTP session, streamed bodies, a size cap and a local
+# cache revalidated with conditional requests.
+#
+# A body is streamed in blocks into a file: the cache directory when caching is on and the
+# server sent an ETag or Last-Modified, else a spooled temp file (in memory up to
+# FETCH_SPOOL_MB, on disk beyond), so a large PDF is never held twice. Content-Length above the cap fails before anything is read, and a body that
+# turns out bigger is cut off at the cap. A cached URL is asked for again with
+# If-None-Match / If-Modified-Since; a 304 serves the cached file without re-downloading it.
+# The cache index is a small SQLite table (like llm_cache) kept under a size budget (LRU);
+# a body is pinned while a Download of it is open, so eviction for another fetch never
+# removes a file the pipeline is about to read.
+# Uploads are copied to a temp file the same way (save_upload), so the pipeline memory-maps
+# them (pdf_utils.pdf_stream) instead of holding the bytes for the whole run.
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from config import (
+    MAX_FILE_SIZE_MB, FETCH_TIMEOUT, FETCH_POOL_SIZE, FETCH_SPOOL_MB,
+    FETCH_CACHE_ENABLED, FETCH_CACHE_PATH, FETCH_CACHE_MAX_MB,
+)
+
+BLOCK_SIZE = 256 * 1024
+
+
+class PDFTooLargeError(ValueError):
+    """The PDF is bigger than the configured limit"""
+
+
+class Download:
+    """A fetched PDF: a seekable binary file plus where it came from.
+
+    from_cache is True when the server answered 304 and the body came from the local cache.
+    path is the cache file holding the body (None for a temp file), so it can be handed to the
+    pipeline as a file instead of bytes; the cache keeps that file until the download is
+    closed. Close it (or use it as a context manager) when done.
+    """
+
+    def __init__(self, url, file, size, from_cache, status, path=None, release=None):
+        self.url = url
+        self.file = file
+        self.size = size
+        self.from_cache = from_cache
+        self.status = status
+        self.path = path
+        self._release = release
+
+    def read(self):
+        self.file.seek(0)
+        return self.file.read()
+
+    def close(self):
+        self.file.close()
+        release, self._release = self._release, None
+        if release:
+            release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --------------------------
+# Local response cache
+# --------------------------
+class FetchCache:
+    """Bodies as files under root/, validators (ETag / Last-Modified) in an SQLite index"""
+
+    def __init__(self, root, max_bytes=500 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # url -> open downloads of its body; pinned bodies are never evicted
+        self._pins = {}
+        os.makedirs(root, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS bodies (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_fetch_last_access ON bodies(last_access)")
+        self._conn.commit()
+
+    def path(self, url):
+        return os.path.join(self.root, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".pdf")
+
+    def get(self, url):
+        """{"etag", "last_modified", "size"} of a cached URL whose body file still exists, else None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, size FROM bodies WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or not os.path.exists(self.path(url)):
+            return None
+        return {"etag": row[0], "last_modified": row[1], "size": row[2]}
+
+    def new_file(self):
+        """Temp file in the cache directory, moved into place by commit()"""
+        return tempfile.NamedTemporaryFile(dir=self.root, suffix=".part", delete=False)
+
+    def commit(self, url, tmp_path, etag, last_modified, size):
+        """Move a new body into place, pinned (see pin())"""
+        os.replace(tmp_path, self.path(url))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO bodies (url, etag, last_modified, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, size, time.time())
+            )
+            self._pins[url] = self._pins.get(url, 0) + 1
+            self._evict()
+            self._conn.commit()
+
+    def pin(self, url):
+        """Mark a cached body as used now and keep it until unpin(); False if it is gone"""
+        with self._lock:
+            cur = self._conn.execute("UPDATE bodies SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+            if cur.rowcount == 0 or not os.path.exists(self.path(url)):
+                return False
+            self._pins[url] = self._pins.get(url, 0) + 1
+            return True
+
+    def unpin(self, url):
+        with self._lock:
+            n = self._pins.pop(url, 0) - 1
+            if n > 0:
+                self._pins[url] = n
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT url, size FROM bodies ORDER BY last_access ASC").fetchall()
+        doomed = []
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            if url in self._pins:
+                continue
+            doomed.append((url,))
+            total -= size
+        self._conn.executemany("DELETE FROM bodies WHERE url = ?", doomed)
+        for (url,) in doomed:
+            try:
+                os.remove(self.path(url))
+            except OSError:
+                pass
+
+
+# --------------------------
+# Fetcher
+# --------------------------
+class PDFFetcher:
+    def __init__(self, max_bytes=int(MAX_FILE_SIZE_MB * 1024 * 1024), timeout=FETCH_TIMEOUT,
+                 pool_size=FETCH_POOL_SIZE, spool_bytes=int(FETCH_SPOOL_MB * 1024 * 1024), cache=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.max_bytes = max_bytes
+        # (connect, read) timeouts; the read timeout applies to every block, not the whole body
+        self.timeout = (min(10, timeout), timeout)
+        self.spool_bytes = spool_bytes
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = "research-pdf-extractor/1.0"
+
+    def fetch(self, url):
+        """Download (or revalidate) one PDF. Raises PDFTooLargeError or requests errors"""
+        cached = self.cache.get(url) if self.cache else None
+        download = self._fetch(url, cached)
+        if download is None:
+            # the cached body was evicted between the lookup and the 304: download it again
+            download = self._fetch(url, None)
+        return download
+
+    def _release(self, url):
+        return lambda: self.cache.unpin(url)
+
+    def _fetch(self, url, cached):
+        headers = {}
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as r:
+            if r.status_code == 304 and cached:
+                r.content  # drain the (empty) body so the connection goes back to the pool
+                if not self.cache.pin(url):
+                    return None
+                path = self.cache.path(url)
+                return Download(url, open(path, "rb"), cached["size"], True, 304, path, self._release(url))
+            r.raise_for_status()
+            length = r.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > self.max_bytes:
+                raise PDFTooLargeError(f"PDF is {int(length) / 1e6:.1f} MB, the limit is {self.max_bytes / 1e6:.0f} MB")
+
+            # only responses the server lets us revalidate are worth keeping
+            etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+            keep = self.cache is not None and bool(etag or last_modified)
+            out = self.cache.new_file() if keep else tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+            size = 0
+            try:
+                for block in r.iter_content(chunk_size=BLOCK_SIZE):
+                    size += len(block)
+                    if size > self.max_bytes:
+                        raise PDFTooLargeError(f"PDF is larger than the {self.max_bytes / 1e6:.0f} MB limit")
+                    out.write(block)
+            except BaseException:
+                out.close()
+                if keep:
+                    os.remove(out.name)
+                raise
+
+        if not keep:
+            out.seek(0)
+            return Download(url, out, size, False, r.status_code)
+        out.close()
+        self.cache.commit(url, out.name, etag, last_modified, size)
+        path = self.cache.path(url)
+        return Download(url, open(path, "rb"), size, False, r.status_code, path, self._release(url))
+
+    def fetch_bytes(self, url):
+        with self.fetch(url) as d:
+            return d.read()
+
+
+class Prefetcher:
+    """Downloads a list of URLs ahead of their use on `workers` threads.
+
+    get(url) returns the Download of a URL from the list (the caller closes it) and keeps the
+    downloads of the next `ahead` URLs running, so fetching overlaps with processing while at
+    most `ahead` finished downloads wait on disk / in memory. URLs not in the list (or asked
+    for twice) are fetched directly.
+    """
+
+    def __init__(self, fetcher, urls, workers=4, ahead=8):
+        self.fetcher = fetcher
+        self.ahead = ahead
+        self._urls = list(dict.fromkeys(urls))
+        self._position = {url: i for i, url in enumerate(self._urls)}
+        self._next = 0
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="fetch")
+        with self._lock:
+            self._fill(ahead)
+
+    def _fill(self, upto):
+        while self._next < min(upto, len(self._urls)):
+            url = self._urls[self._next]
+            self._futures[url] = self._pool.submit(self.fetcher.fetch, url)
+            self._next += 1
+
+    def get(self, url):
+        with self._lock:
+            if url in self._position:
+                self._fill(self._position[url] + 1 + self.ahead)
+            fut = self._futures.pop(url, None)
+        if fut is None:
+            return self.fetcher.fetch(url)
+        return fut.result()
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        for fut in self._futures.values():
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                fut.result().close()
+        self._futures.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# one fetcher (one connection pool, one cache) per process
+_FETCHER = None
+_FETCHER_LOCK = threading.Lock()
+
+
+def get_fetcher():
+    global _FETCHER
+    with _FETCHER_LOCK:
+        if _FETCHER is None:
+            cache = FetchCache(FETCH_CACHE_PATH, int(FETCH_CACHE_MAX_MB * 1024 * 1024)) if FETCH_CACHE_ENABLED else None
+            _FETCHER = PDFFetcher(cache=cache)
+        return _FETCHER
+
+
+@contextmanager
+def download_source(download):
+    """A Download as a pipeline source: the path of the cache file when the body is kept
+    there, else bytes. The download stays open (its cache file pinned) until the block exits."""
+    with download as d:
+        yield d.path or d.read()
+
+
+def pdf_source(url):
+    """PDF for url through the shared fetcher, as a pipeline source (see download_source)"""
+    return download_source(get_fetcher().fetch(url))
+
+
+# --------------------------
+# Uploads
+# --------------------------
+def save_upload(src, max_bytes=int(MAX_FILE_SIZE_MB * 1024 * 1024), dir=None):
+    """Copy an uploaded file object to a temp .pdf file in blocks and return its path.
+
+    The caller removes the file when done. Raises PDFTooLargeError past max_bytes (the
+    partial file is removed).
+    """
+    out = tempfile.NamedTemporaryFile(dir=dir, prefix="upload_", suffix=".pdf", delete=False)
+    size = 0
+    try:
+        with out:
+            for block in iter(lambda: src.read(BLOCK_SIZE), b""):
+                size += len(block)
+                if size > max_bytes:
+                    raise PDFTooLargeError(f"PDF is larger than the {max_bytes / 1e6:.0f} MB limit")
+                out.write(block)
+    except BaseException:
+        os.remove(out.name)
+        raise
+    return out.name
+
+
+@contextmanager
+def temp_pdf(path):
+    """Yield path and remove the file afterwards (for save_upload() results)"""
+    try:
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,220 @@
+# pdf_utils.py
+# PDF text extraction + chunking, kept free of Streamlit so it can be imported by
+# worker processes (and anything else that needs the pipeline headless).
+#
+# A PDF source is either bytes or the path of a PDF file. Files are memory-mapped for the
+# reader instead of being read into memory, and worker processes map the same file rather
+# than receiving a pickled copy of the bytes.
+import io
+import mmap
+import os
+import zlib
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+# --------------------------
+# Page text extraction
+# --------------------------
+def normalize_page_text(txt: str):
+    # normalize whitespace
+    return "\n".join([line.strip() for line in txt.splitlines() if line.strip()])
+
+def _extract_page(page):
+    try:
+        txt = page.extract_text() or ""
+    except Exception:
+        txt = ""
+    return normalize_page_text(txt)
+
+@contextmanager
+def pdf_stream(source):
+    """Seekable stream over a PDF source: bytes as-is (io.BytesIO shares them), a path mmapped"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+        return
+    with open(source, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap cannot map an empty file; let PdfReader raise its usual error
+            yield f
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+# each worker process parses the PDF once and keeps the reader around for its tasks
+_WORKER_READER = None
+_WORKER_STREAM = None
+
+def _init_worker(source):
+    global _WORKER_READER, _WORKER_STREAM
+    _WORKER_STREAM = pdf_stream(source)
+    _WORKER_READER = PdfReader(_WORKER_STREAM.__enter__())
+
+def _extract_page_range(start: int, stop: int):
+    return [_extract_released(_WORKER_READER, _WORKER_READER.pages[i]) for i in range(start, stop)]
+
+def _extract_released(reader, page):
+    txt = _extract_page(page)
+    # pypdf caches every object it resolves, image streams included, so by the last page a
+    # mapped file would be copied onto the heap; a page's objects are not needed afterwards
+    reader.resolved_objects.clear()
+    return txt
+
+def iter_pdf_pages(source, workers: int = 1, pages_per_task: int = 16):
+    """Yield normalized page text in page order as soon as each page is extracted.
+
+    source is PDF bytes or a file path. With workers > 1 the page ranges are spread over a
+    process pool; pages are still yielded in order, each range as soon as it (and every
+    range before it) is done.
+    """
+    with pdf_stream(source) as stream:
+        reader = PdfReader(stream)
+        n_pages = len(reader.pages)
+        if workers <= 1 or n_pages <= pages_per_task:
+            for page in reader.pages:
+                yield _extract_released(reader, page)
+            return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(source,)) as pool:
+        futures = [
+            pool.submit(_extract_page_range, start, min(start + pages_per_task, n_pages))
+            for start in range(0, n_pages, pages_per_task)
+        ]
+        for fut in futures:
+            yield from fut.result()
+
+def read_pdf_bytes(pdf_bytes: bytes, workers: int = 1):
+    return list(iter_pdf_pages(pdf_bytes, workers=workers))
+
+class PackedPages:
+    """Page texts stored zlib-compressed, read back as a sequence of str.
+
+    The pipeline appends each page as it is parsed; once the chunker is done with a page
+    only its compressed form (~1/3 of the text) stays in memory.
+    """
+    __slots__ = ("_blobs",)
+
+    def __init__(self, pages=()):
+        self._blobs = []
+        for pg in pages:
+            self.append(pg)
+
+    def append(self, text: str):
+        self._blobs.append(zlib.compress(text.encode("utf-8"), 1))
+
+    def __len__(self):
+        return len(self._blobs)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [zlib.decompress(b).decode("utf-8") for b in self._blobs[i]]
+        return zlib.decompress(self._blobs[i]).decode("utf-8")
+
+    def __iter__(self):
+        for b in self._blobs:
+            yield zlib.decompress(b).decode("utf-8")
+
+    def nbytes(self):
+        return sum(len(b) for b in self._blobs)
+
+# --------------------------
+# Token-aware chunking
+# --------------------------
+# rough but fast: English prose averages ~4 characters per token for Gemini/GPT tokenizers
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def _split_long_line(line: str, max_tokens: int):
+    """Split a single over-long line at sentence ends, falling back to a hard cut"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    parts = []
+    while len(line) > max_chars:
+        cut = max(line.rfind(". ", 0, max_chars), line.rfind("? ", 0, max_chars), line.rfind("! ", 0, max_chars))
+        cut = cut + 1 if cut > 0 else max_chars
+        parts.append(line[:cut].strip())
+        line = line[cut:].strip()
+    if line:
+        parts.append(line)
+    return parts
+
+def split_page(text: str, max_tokens: int):
+    """Paragraph (line) sized pieces of a page, none larger than max_tokens"""
+    return [piece for para in text.split("\n") for piece in _split_long_line(para, max_tokens)]
+
+def _overlap(pieces, max_tokens: int):
+    """Trailing lines of the previous chunk fitting in max_tokens, as (page, text) pieces"""
+    out = []
+    used = 0
+    for page_no, text in reversed(pieces):
+        for line in reversed(text.split("\n")):
+            t = estimate_tokens(line) + 1
+            if used + t > max_tokens:
+                return out[::-1]
+            out.append((page_no, line))
+            used += t
+    return out[::-1]
+
+def _make_chunk(pieces):
+    parts = []
+    prev_page = None
+    for page_no, text in pieces:
+        if parts:
+            parts.append("\n" if page_no == prev_page else "\n\n")
+        parts.append(text)
+        prev_page = page_no
+    return {
+        "start_page": pieces[0][0],
+        "end_page": pieces[-1][0],
+        "text": "".join(parts)
+    }
+
+def iter_chunks(pages_text, max_tokens=4000, overlap_tokens=0, first_page=1):
+    """Pack pages into chunks of at most max_tokens (estimated), yielding each chunk when complete.
+
+    Whole pages are kept together whenever they fit in a chunk; a page larger than the budget
+    is split at paragraph boundaries and its paragraphs fill up the current chunk, so a dense
+    appendix page no longer produces an oversized chunk. With overlap_tokens > 0 each chunk
+    starts with the last lines of the previous one. pages_text can be any iterable (e.g.
+    iter_pdf_pages), so the first chunk is ready while later pages are still being parsed.
+    first_page is the page number of its first item (when chunking part of a paper).
+    """
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    cur = []
+    cur_tokens = 0
+
+    def flush():
+        chunk = _make_chunk(cur)
+        tail = _overlap(cur, overlap_tokens) if overlap_tokens else []
+        return chunk, tail, sum(estimate_tokens(text) + 1 for _, text in tail)
+
+    for page_no, pg in enumerate(pages_text, start=first_page):
+        if not pg.strip():
+            continue
+        t = estimate_tokens(pg) + 1
+        if cur_tokens + t <= max_tokens:
+            cur.append((page_no, pg))
+            cur_tokens += t
+            continue
+        if t <= max_tokens - overlap_tokens:
+            # page fits in a fresh chunk: keep it whole
+            chunk, cur, cur_tokens = flush()
+            yield chunk
+            cur.append((page_no, pg))
+            cur_tokens += t
+            continue
+        # oversized page: pack its paragraphs into the remaining room, then into new chunks
+        for piece in split_page(pg, max_tokens - overlap_tokens):
+            t = estimate_tokens(piece) + 1
+            if cur and cur_tokens + t > max_tokens:
+                chunk, cur, cur_tokens = flush()
+                yield chunk
+            cur.append((page_no, piece))
+            cur_tokens += t
+    if cur:
+        yield _make_chunk(cur)
+
+def chunk_pages(pages_text, max_tokens=4000, overlap_tokens=0):
+    return list(iter_chunks(pages_text, max_tokens=max_tokens, overlap_tokens=overlap_tokens))
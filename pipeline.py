@@ -0,0 +1,1125 @@
+# pipeline.py
+# Headless extraction pipeline: PDF (bytes or file) -> pages -> chunks -> per-chunk extraction
+# -> merge -> summary. No Streamlit here, so the same code drives the UI (main.py),
+# the batch CLI (batch.py) and anything else that imports it.
+import os
+import json
+import queue
+import re
+import textwrap
+import threading
+import time
+from collections import Counter
+from difflib import SequenceMatcher
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial as bind
+from itertools import chain, islice
+
+from config import (
+    MODEL_NAME, MODEL_TEMPERATURE, MAX_CONCURRENT_CHUNKS, PDF_WORKERS, CHUNK_TOKEN_BUDGET,
+    CHUNK_OVERLAP_TOKENS, RETRIEVAL_MODE, RETRIEVAL_TOP_K, PAPER_STORE_ENABLED, VECTOR_DB_PATH,
+    PAPER_INDEX_ENABLED, PAPER_INDEX_PATH, REVISION_REUSE,
+    MERGE_MODE, DEDUPE_MODE, SUMMARY_MODE, TRACE_JSONL_PATH, METRICS_PORT, LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_MB,
+    LLM_RPM, LLM_TPM, LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_REQUEST_DEADLINE,
+    LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET,
+)
+from llm_cache import LLMCache, make_key
+from json_repair import PartialJSON, loads_lenient
+import tracing
+from tracing import span
+from result_model import Extraction, FIELDS, SCALAR_FIELDS, as_text, coerce_field
+from rate_limit import RateLimiter, CircuitBreaker, call_with_retry
+from pdf_utils import PackedPages, iter_pdf_pages, iter_chunks, estimate_tokens
+from retrieval import field_tasks
+from dedupe import dedupe_datasets_near, dedupe_headings_near, normalize_dataset_key
+from paper_store import PaperStore, pdf_hash
+from paper_index import PaperIndex
+from revision import PROBE_PAGES, chunk_hash, plan_chunks
+
+# --------------------------
+# Shared resources (built once per process)
+# --------------------------
+PAPER_STORE = PaperStore(VECTOR_DB_PATH) if PAPER_STORE_ENABLED else None
+PAPER_INDEX = PaperIndex(PAPER_INDEX_PATH) if PAPER_INDEX_ENABLED else None
+
+# bump PROMPT_VERSION whenever a prompt template changes
+PROMPT_VERSION = "1"
+LLM_CACHE = LLMCache(LLM_CACHE_PATH, max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024)) if LLM_CACHE_ENABLED else None
+
+tracing.configure(jsonl_path=TRACE_JSONL_PATH)
+if METRICS_PORT:
+    tracing.serve_metrics(METRICS_PORT)
+
+# one limiter and breaker for every model call in the process (all chunks, all users)
+RATE_LIMITER = RateLimiter(rpm=LLM_RPM, tpm=LLM_TPM)
+BREAKER = CircuitBreaker(threshold=LLM_BREAKER_THRESHOLD, reset_after=LLM_BREAKER_RESET)
+
+# --------------------------
+# Model client
+# --------------------------
+_MODEL = None
+_MODEL_LOCK = threading.Lock()
+
+def get_model():
+    """The shared chat model, built on first use (raises if GOOGLE_API_KEY is missing)"""
+    global _MODEL
+    with _MODEL_LOCK:
+        if _MODEL is None:
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise RuntimeError("GOOGLE_API_KEY not found. Put it into a .env file like: GOOGLE_API_KEY=your_api_key")
+            # imported here: langchain + the Gemini client are the slowest imports in the app
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            # retries are done by call_with_retry, so the client makes a single attempt per call
+            _MODEL = ChatGoogleGenerativeAI(
+                model=MODEL_NAME, google_api_key=api_key, temperature=MODEL_TEMPERATURE,
+                max_retries=1, timeout=LLM_REQUEST_DEADLINE or None
+            )
+    return _MODEL
+
+def set_model(model):
+    """Swap in another chat model (anything with .invoke), e.g. a fake for offline runs"""
+    global _MODEL
+    _MODEL = model
+
+# --------------------------
+# Prompt templates (unchanged + new summary prompt)
+# --------------------------
+CHUNK_PROMPT_TPL = textwrap.dedent("""
+You are an expert academic information extractor. Extract information ONLY from the CHUNK below.
+Return EXACTLY one JSON object and nothing else.
+
+Schema (types):
+{{
+  "title": null | string,
+  "venue": null | string,
+  "year": null | integer,
+  "datasets": [{{"name": string, "page": integer, "quote": string}}],
+  "limitations_addressed": [{{"heading": string, "explanation": string, "page": integer, "quote": string}}],
+  "contributions": [{{"heading": string, "explanation": string, "page": integer, "quote": string}}],
+  "methods": [{{"heading": string, "explanation": string, "page": integer, "quote": string}}],
+  "paper_limitations": [{{"heading": string, "explanation": string, "page": integer, "quote": string}}],
+  "evidence": [{{"page": integer, "quote": string}}]
+}}
+
+Rules:
+- DO NOT invent data. If a field is not present in this chunk, use null (for scalars) or [] (for lists).
+- For lists (datasets, limitations_addressed, etc.) produce objects with page and short quote (<=25 words).
+- Use page numbers that correspond to the actual PDF pages (between {start_page} and {end_page}).
+- Keep quotes short and directly from the text.
+- For headings use short phrase (3-6 words). Explanations: 1-2 concise sentences.
+- Do NOT output additional commentary or markdown.
+
+CHUNK PAGES: {start_page} - {end_page}
+CHUNK TEXT:
+---
+{chunk_text}
+---
+""")
+
+# Fused mode: the same extraction plus a "section_summary" string, so the chunk text is sent
+# once for both the extraction and the summary notes
+CHUNK_FUSED_PROMPT_TPL = CHUNK_PROMPT_TPL.replace(
+    '  "evidence": [{{"page": integer, "quote": string}}]\n}}',
+    '  "evidence": [{{"page": integer, "quote": string}}],\n  "section_summary": string\n}}'
+).replace(
+    "- Do NOT output additional commentary or markdown.",
+    "- section_summary: 2-4 plain sentences on what these pages contribute (problem, method, datasets, results,\n"
+    "  limitations), with concrete numbers and names when present. Never null.\n"
+    "- Do NOT output additional commentary or markdown."
+)
+
+REDUCER_PROMPT_TPL = textwrap.dedent("""
+You are an expert data merger for structured JSONs extracted from chunks of a PDF.
+You will be given a JSON array of partial extraction objects (each following the schema below).
+Merge them into a single final JSON object following the same schema.
+
+Schema of each partial:
+{{
+  "title": null | string,
+  "venue": null | string,
+  "year": null | integer,
+  "datasets": [{{"name": string, "page": integer, "quote": string}}],
+  "limitations_addressed": [...],
+  "contributions": [...],
+  "methods": [...],
+  "paper_limitations": [...],
+  "evidence": [...]
+}}
+
+Merging rules:
+- For scalar fields (title, venue, year): prefer entries which have evidence (non-null) and choose the one with the clearest quote. If multiple different values exist and it's ambiguous, set null.
+- For list fields: combine all items, deduplicate by normalized key (for datasets normalize by removing non-alphanumeric and lowercasing; for headings normalize by lowercasing and trimming). Preserve the original 'name'/'heading' as first occurrence.
+- Evidence: include unique evidence items sorted by page.
+- Do NOT invent missing information.
+
+Return exactly one JSON object and nothing else.
+
+Partials:
+{partials_json}
+""")
+
+# NEW: Summary prompt template
+SUMMARY_PROMPT_TPL = textwrap.dedent("""
+You are an expert academic summarizer. Create a comprehensive summary of this research paper.
+
+Paper content:
+---
+{paper_text}
+---
+
+Please provide a structured summary with the following sections:
+
+**Abstract/Overview** (2-3 sentences): Main purpose and key findings
+**Problem Statement** (1-2 sentences): What problem does this paper address?
+**Methodology** (2-3 sentences): How did they approach the problem?
+**Key Contributions** (3-4 bullet points): Main innovations or findings
+**Results** (1-2 sentences): What were the main outcomes?
+**Limitations** (1-2 sentences): What are the acknowledged limitations?
+**Impact** (1-2 sentences): Why is this work important?
+
+Keep the summary concise but comprehensive, focusing on the most important aspects of the research.
+""")
+
+# Map step of the map-reduce summary: short notes per chunk, reduced with SUMMARY_PROMPT_TPL
+CHUNK_SUMMARY_PROMPT_TPL = textwrap.dedent("""
+You are an expert academic summarizer. Below is one part (pages {start_page} - {end_page}) of a research paper.
+Write 2-4 plain sentences noting what this part contributes: problem, method, datasets, results, limitations.
+Mention concrete numbers and names when present. Do NOT invent anything and do not use markdown.
+
+PART TEXT:
+---
+{chunk_text}
+---
+""")
+
+# Targeted extraction over retrieved passages (used when RETRIEVAL_MODE is not "off")
+FIELD_SCHEMA_LINES = {
+    "title": '"title": null | string',
+    "venue": '"venue": null | string',
+    "year": '"year": null | integer',
+    "datasets": '"datasets": [{"name": string, "page": integer, "quote": string}]',
+    "limitations_addressed": '"limitations_addressed": [{"heading": string, "explanation": string, "page": integer, "quote": string}]',
+    "contributions": '"contributions": [{"heading": string, "explanation": string, "page": integer, "quote": string}]',
+    "methods": '"methods": [{"heading": string, "explanation": string, "page": integer, "quote": string}]',
+    "paper_limitations": '"paper_limitations": [{"heading": string, "explanation": string, "page": integer, "quote": string}]',
+    "evidence": '"evidence": [{"page": integer, "quote": string}]',
+    "section_summary": '"section_summary": string',
+}
+
+FIELD_PROMPT_TPL = textwrap.dedent("""
+You are an expert academic information extractor. The PASSAGES below were retrieved from a research paper
+because they are the most relevant ones for the fields in the schema. Extract information ONLY from these passages.
+Return EXACTLY one JSON object and nothing else.
+
+Schema (types):
+{{
+{schema}
+}}
+
+Rules:
+- DO NOT invent data. If a field is not present in the passages, use null (for scalars) or [] (for lists).
+- Each passage starts with a [page N] marker; use that page number for items taken from it.
+- Keep quotes short (<=25 words) and directly from the text.
+- For headings use short phrase (3-6 words). Explanations: 1-2 concise sentences.
+- Do NOT output additional commentary or markdown.
+
+PASSAGES:
+---
+{passages_text}
+---
+""")
+
+# Second try for the fields of a chunk answer that were missing or invalid
+FIELD_RETRY_PROMPT_TPL = textwrap.dedent("""
+You are an expert academic information extractor. Extract ONLY the fields in the schema below from the CHUNK.
+Return EXACTLY one JSON object and nothing else.
+
+Schema (types):
+{{
+{schema}
+}}
+
+Rules:
+- DO NOT invent data. If a field is not present in this chunk, use null (for scalars) or [] (for lists).
+- Use page numbers that correspond to the actual PDF pages (between {start_page} and {end_page}).
+- Keep quotes short (<=25 words) and directly from the text.
+- For headings use short phrase (3-6 words). Explanations: 1-2 concise sentences.
+- Do NOT output additional commentary or markdown.
+
+CHUNK PAGES: {start_page} - {end_page}
+CHUNK TEXT:
+---
+{chunk_text}
+---
+""")
+
+# Polish pass over an already merged object (used by MERGE_MODE "local+polish")
+POLISH_PROMPT_TPL = textwrap.dedent("""
+You are an expert editor of structured JSON extracted from a research paper.
+Below is a single merged extraction object. Clean it up and return the same schema.
+
+Rules:
+- Merge list items that describe the same thing under different wording; keep the one with the clearest quote.
+- Keep headings short (3-6 words) and explanations to 1-2 concise sentences.
+- Keep page numbers and quotes exactly as given. Do NOT invent or add information.
+
+Return exactly one JSON object and nothing else.
+
+Merged extraction:
+{merged_json}
+""")
+
+# --------------------------
+# Parse model JSON robustly (unchanged)
+# --------------------------
+def parse_json_loose(s: str):
+    """First JSON object in the model output, repaired if needed (see json_repair)"""
+    if not isinstance(s, str):
+        return s
+    return loads_lenient(s)[0]
+
+# --------------------------
+# LLM call helpers (cached)
+# --------------------------
+def _cache_key(prompt_text: str):
+    return make_key(MODEL_NAME, MODEL_TEMPERATURE, PROMPT_VERSION, prompt_text)
+
+def _invoke(prompt_text: str, on_text=None):
+    """One model call behind the shared rate limiter, retry/backoff, deadline and circuit breaker.
+
+    With on_text the response is streamed (model.stream) and on_text(text_so_far) is called as
+    tokens arrive; a retried call starts the text over.
+    """
+    model = get_model()
+
+    def call():
+        if on_text is None or not hasattr(model, "stream"):
+            res = model.invoke(prompt_text)
+            _record_usage([getattr(res, "usage_metadata", None)])
+            content = getattr(res, "content", res)
+            if on_text and isinstance(content, str):
+                on_text(content)
+            return content
+        text = ""
+        usage = []
+        for piece in model.stream(prompt_text):
+            usage.append(getattr(piece, "usage_metadata", None))
+            delta = getattr(piece, "content", piece)
+            if isinstance(delta, str) and delta:
+                text += delta
+                on_text(text)
+        _record_usage(usage)
+        return text
+
+    return call_with_retry(
+        call, tokens=estimate_tokens(prompt_text), limiter=RATE_LIMITER, breaker=BREAKER,
+        max_retries=LLM_MAX_RETRIES, base_delay=LLM_BACKOFF_BASE, max_delay=LLM_BACKOFF_MAX,
+        deadline_s=LLM_REQUEST_DEADLINE, count_tokens=lambda text: estimate_tokens(text) if isinstance(text, str) else 0,
+        on_retry=lambda attempt, e: tracing.incr("retries")
+    )
+
+def _record_usage(usage):
+    """Token counts reported by the model (LangChain usage_metadata) onto the current span"""
+    usage = [u for u in usage if u]
+    if usage:
+        tracing.annotate(
+            tokens_in=sum(u.get("input_tokens") or 0 for u in usage),
+            tokens_out=sum(u.get("output_tokens") or 0 for u in usage),
+            tokens_reported=True
+        )
+
+def _cached_invoke(prompt_text: str, use_cache: bool, kind: str, on_text=None):
+    """Cache lookup + model call, traced as one "llm" span. Returns (content, from_cache)"""
+    with span("llm", kind=kind, cache_hit=False) as sp:
+        if use_cache:
+            cached = LLM_CACHE.get(_cache_key(prompt_text))
+            if cached is not None:
+                sp.set(cache_hit=True, tokens_in=0, tokens_out=0)
+                return cached, True
+        content = _invoke(prompt_text, on_text=on_text)
+        if not sp.attrs.get("tokens_reported"):
+            sp.set(tokens_in=estimate_tokens(prompt_text),
+                   tokens_out=estimate_tokens(content) if isinstance(content, str) else 0)
+        return content, False
+
+def _partial_reporter(on_partial):
+    """on_text callback that re-parses the streamed JSON when a top-level member or item has closed"""
+    partial = PartialJSON()
+
+    def on_text(text):
+        obj = partial.feed(text)
+        if obj is not None:
+            on_partial(obj)
+    return on_text
+
+def llm_json_call_ex(prompt_text: str, use_cache: bool = True, on_partial=None, kind="json"):
+    """(parsed, repaired) for a JSON prompt; raises ValueError if the answer holds no object.
+
+    on_partial(obj) receives the complete part of the object while the answer streams in.
+    kind labels the call in traces and metrics.
+    """
+    use_cache = use_cache and LLM_CACHE is not None
+    content, from_cache = _cached_invoke(prompt_text, use_cache, kind,
+                                         on_text=_partial_reporter(on_partial) if on_partial else None)
+    if from_cache:
+        return loads_lenient(content)
+    if not isinstance(content, str):
+        return content, False
+    parsed, repaired = loads_lenient(content)
+    # only cache responses that parsed, so an answer without any object is retried next time
+    if use_cache:
+        LLM_CACHE.put(_cache_key(prompt_text), content)
+    return parsed, repaired
+
+def llm_json_call(prompt_text: str, use_cache: bool = True, kind="json"):
+    return llm_json_call_ex(prompt_text, use_cache=use_cache, kind=kind)[0]
+
+def llm_text_call(prompt_text: str, use_cache: bool = True, on_text=None, kind="text"):
+    """For non-JSON responses like summaries; on_text(text_so_far) streams the answer"""
+    use_cache = use_cache and LLM_CACHE is not None
+    content, from_cache = _cached_invoke(prompt_text, use_cache, kind, on_text=on_text)
+    if from_cache:
+        if on_text:
+            on_text(content)
+        return content
+    if use_cache and isinstance(content, str):
+        LLM_CACHE.put(_cache_key(prompt_text), content)
+    return content
+
+# --------------------------
+# Map phase: per-chunk extraction with bounded concurrency
+# --------------------------
+def empty_extraction():
+    return Extraction().to_dict()
+
+def validate_fields(parsed, fields, missing_ok=True):
+    """Coerce parsed model output to the extraction schema.
+
+    Returns (values, bad): cleaned values for the valid fields, and the fields that are invalid
+    (wrong type, or a non-empty list without a single usable item). Missing fields count as bad
+    only when missing_ok is False, i.e. when the answer had to be repaired and may be cut off.
+    """
+    if not isinstance(parsed, dict):
+        return {}, list(fields)
+    values = {}
+    bad = []
+    for f in fields:
+        if f not in parsed:
+            if not missing_ok:
+                bad.append(f)
+            continue
+        try:
+            if f == "section_summary":
+                values[f] = as_text(parsed[f])
+            elif f in SCALAR_FIELDS:
+                values[f] = coerce_field(f, parsed[f])
+            else:
+                values[f] = [it.to_dict() for it in coerce_field(f, parsed[f])]
+        except ValueError:
+            bad.append(f)
+    return values, bad
+
+def _build_partial(parsed, repaired, fields, retry_prompt, use_cache):
+    """Validate a parsed answer and ask the model again only for the fields that failed"""
+    values, bad = validate_fields(parsed, fields, missing_ok=not repaired)
+    partial = empty_extraction()
+    if bad:
+        try:
+            again, again_repaired = llm_json_call_ex(retry_prompt(bad), use_cache=use_cache, kind="field_retry")
+            more, bad = validate_fields(again, bad, missing_ok=not again_repaired)
+            values.update(more)
+        except Exception as e:
+            if not values:
+                partial["_error"] = str(e)
+    partial.update(values)
+    if bad:
+        partial["_invalid_fields"] = bad
+        if not values and "_error" not in partial:
+            partial["_error"] = "Model output did not match the extraction schema"
+    return partial
+
+def _schema_lines(fields):
+    return ",\n".join("  " + FIELD_SCHEMA_LINES[f] for f in fields)
+
+def _preview(on_partial, fields):
+    """Turn streamed objects into partials with the valid fields filled in, for on_partial"""
+    def report(obj):
+        partial = empty_extraction()
+        partial.update(validate_fields(obj, fields)[0])
+        on_partial(partial)
+    return report if on_partial else None
+
+def extract_chunk(ch, use_cache=True, fused=False, on_partial=None):
+    """Run CHUNK_PROMPT_TPL for a single chunk; failures become an empty partial with `_error`.
+
+    With fused=True CHUNK_FUSED_PROMPT_TPL is used and the partial also carries "section_summary".
+    Fields that are still invalid after the repair pass are re-asked with FIELD_RETRY_PROMPT_TPL.
+    on_partial(partial) streams the items that are complete so far (called from the worker thread).
+    """
+    fields = FIELDS + (["section_summary"] if fused else [])
+    prompt = (CHUNK_FUSED_PROMPT_TPL if fused else CHUNK_PROMPT_TPL).format(
+        chunk_text=ch["text"],
+        start_page=ch["start_page"],
+        end_page=ch["end_page"]
+    )
+    try:
+        parsed, repaired = llm_json_call_ex(prompt, use_cache=use_cache, on_partial=_preview(on_partial, fields),
+                                            kind="chunk+summary" if fused else "chunk")
+    except ValueError:
+        # no JSON object at all: every field goes to the retry prompt
+        parsed, repaired = {}, True
+    except Exception as e:
+        partial = empty_extraction()
+        partial["_error"] = str(e)
+        return partial
+
+    def retry_prompt(bad):
+        return FIELD_RETRY_PROMPT_TPL.format(
+            schema=_schema_lines(bad), chunk_text=ch["text"],
+            start_page=ch["start_page"], end_page=ch["end_page"]
+        )
+
+    return _build_partial(parsed, repaired, fields, retry_prompt, use_cache)
+
+def extract_field_task(task, use_cache=True, on_partial=None):
+    """Run FIELD_PROMPT_TPL for one retrieval task; only the task's fields (+ evidence) are kept"""
+    fields = task["fields"] + ["evidence"]
+
+    def field_prompt(fs):
+        return FIELD_PROMPT_TPL.format(schema=_schema_lines(fs), passages_text=task["text"])
+
+    try:
+        parsed, repaired = llm_json_call_ex(field_prompt(fields), use_cache=use_cache,
+                                            on_partial=_preview(on_partial, fields), kind="field")
+    except ValueError:
+        parsed, repaired = {}, True
+    except Exception as e:
+        partial = empty_extraction()
+        partial["_error"] = str(e)
+        return partial
+    return _build_partial(parsed, repaired, fields, field_prompt, use_cache)
+
+def reuse_or_extract(ch, extract_fn=extract_chunk, fused=False, **kwargs):
+    """The stored result of a chunk planned by revision.plan_chunks, else extract_fn(ch)"""
+    reuse = ch.get("reuse")
+    if reuse is None:
+        return extract_fn(ch, **kwargs)
+    tracing.annotate(reused=True)
+    partial = reuse["partial"]
+    if fused:
+        partial["section_summary"] = reuse["notes"]
+    return partial
+
+def map_chunks(chunks, extract_fn=extract_chunk, max_workers=MAX_CONCURRENT_CHUNKS, on_done=None, on_progress=None):
+    """Run extract_fn over all chunks with at most max_workers calls in flight.
+
+    chunks may be a generator (e.g. iter_chunks over iter_pdf_pages): each chunk is submitted as
+    soon as it is produced, so model calls start while later pages are still being parsed.
+    Results are returned in chunk order (the reducer relies on it). on_done(done, total, index,
+    chunk, result) is called from the calling thread each time a chunk finishes, so it can touch
+    Streamlit widgets; total is the number of chunks produced so far.
+
+    With on_progress, extract_fn is also given on_partial= and streams its answer; the partial
+    results are relayed as on_progress(index, chunk, partial), also from the calling thread.
+    """
+    results = {}
+    submitted = []
+    pending = {}
+    streamed = queue.Queue() if on_progress else None
+
+    def traced(i, ch, **kwargs):
+        with span("chunk", index=i, start_page=ch.get("start_page"), end_page=ch.get("end_page"),
+                  field=ch.get("field")) as sp:
+            out = extract_fn(ch, **kwargs)
+            if isinstance(out, dict):
+                if out.get("_error"):
+                    sp.set(error=out["_error"])
+                if out.get("_invalid_fields"):
+                    sp.set(invalid_fields=out["_invalid_fields"])
+            return out
+
+    def relay():
+        while streamed is not None:
+            try:
+                i, partial = streamed.get_nowait()
+            except queue.Empty:
+                return
+            if i not in results:
+                on_progress(i, submitted[i], partial)
+
+    def finish(fut):
+        i = pending.pop(fut)
+        results[i] = fut.result()
+        if on_done:
+            on_done(len(results), len(submitted), i, submitted[i], results[i])
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for i, ch in enumerate(chunks):
+            submitted.append(ch)
+            if streamed is not None:
+                fut = pool.submit(tracing.propagate(traced), i, ch,
+                                  on_partial=bind(lambda i, p: streamed.put((i, p)), i))
+            else:
+                fut = pool.submit(tracing.propagate(traced), i, ch)
+            pending[fut] = i
+            # report whatever finished while we were waiting on the next chunk
+            relay()
+            for fut in [f for f in pending if f.done()]:
+                finish(fut)
+        while pending:
+            done, _ = wait(list(pending), timeout=0.1 if streamed is not None else None, return_when=FIRST_COMPLETED)
+            relay()
+            for fut in done:
+                finish(fut)
+    return [results[i] for i in range(len(submitted))]
+
+# --------------------------
+# Normalization helpers (unchanged; normalize_dataset_key lives in dedupe.py)
+# --------------------------
+def dedupe_datasets(dataset_objs):
+    seen = {}
+    result = []
+    for d in dataset_objs:
+        name = d.get("name", "").strip()
+        if not name:
+            continue
+        key = normalize_dataset_key(name)
+        if key not in seen:
+            seen[key] = True
+            result.append(d)
+    return result
+
+def dedupe_list_of_heading_objs(items):
+    seen = set()
+    out = []
+    for it in items:
+        heading = (it.get("heading") or "").strip()
+        if not heading:
+            continue
+        key = heading.lower()
+        if key not in seen:
+            seen.add(key)
+            out.append(it)
+    return out
+
+# --------------------------
+# Local merge engine (replaces the REDUCER_PROMPT_TPL round trip)
+# --------------------------
+HEADING_FIELDS = ["limitations_addressed", "contributions", "methods", "paper_limitations"]
+
+def normalize_heading_key(heading: str):
+    return " ".join(re.findall(r"[0-9a-z]+", heading.lower()))
+
+def headings_similar(a: str, b: str, threshold=0.85):
+    """Fuzzy match on normalized headings: same word set or a high character similarity"""
+    if a == b:
+        return True
+    if set(a.split()) == set(b.split()):
+        return True
+    return SequenceMatcher(None, a, b).ratio() >= threshold
+
+def dedupe_headings_fuzzy(items, threshold=0.85):
+    """Like dedupe_list_of_heading_objs but also collapses near-identical headings (first one wins)"""
+    kept = []
+    keys = []
+    for it in dedupe_list_of_heading_objs(items):
+        key = normalize_heading_key(it["heading"])
+        if any(headings_similar(key, k, threshold) for k in keys):
+            continue
+        keys.append(key)
+        kept.append(it)
+    return kept
+
+def merge_datasets(items):
+    """Dataset items of a merge: near-duplicate clusters (DEDUPE_MODE "near") or exact normalized names"""
+    return dedupe_datasets_near(items) if DEDUPE_MODE == "near" else dedupe_datasets(items)
+
+def merge_headings(items):
+    """Heading items of a merge: near-duplicate clusters (DEDUPE_MODE "near") or near-identical headings"""
+    return dedupe_headings_near(items) if DEDUPE_MODE == "near" else dedupe_headings_fuzzy(items)
+
+def _scalar_key(field, value):
+    if field == "year":
+        try:
+            return int(str(value).strip()[:4])
+        except ValueError:
+            return None
+    return " ".join(str(value).split()).lower()
+
+def vote_scalar(field, partials):
+    """Pick the value supported by the most evidence; a tie between different values yields None.
+
+    Every partial naming a value is one vote, and a value that also appears in one of that
+    partial's quotes gets an extra vote.
+    """
+    votes = Counter()
+    first_seen = {}
+    for p in partials:
+        value = p.get(field)
+        if value in (None, ""):
+            continue
+        key = _scalar_key(field, value)
+        if key is None:
+            continue
+        first_seen.setdefault(key, int(key) if field == "year" else str(value).strip())
+        votes[key] += 1
+        quotes = " ".join((e.get("quote") or "") for e in p.get("evidence", []) or [] if isinstance(e, dict))
+        if str(value).lower() in quotes.lower():
+            votes[key] += 1
+    if not votes:
+        return None
+    ranked = votes.most_common(2)
+    if len(ranked) > 1 and ranked[0][1] == ranked[1][1]:
+        return None
+    return first_seen[ranked[0][0]]
+
+def merge_evidence(evidence_items):
+    """Unique evidence items (by page + normalized quote) sorted by page"""
+    seen = set()
+    out = []
+    for e in evidence_items:
+        if not isinstance(e, dict) or not e.get("quote"):
+            continue
+        key = (e.get("page"), " ".join(e["quote"].split()).lower())
+        if key not in seen:
+            seen.add(key)
+            out.append(e)
+    return sorted(out, key=lambda e: e.get("page") if isinstance(e.get("page"), int) else float("inf"))
+
+def merge_partials_local(partials):
+    """Deterministic merge of chunk partials following the same rules as REDUCER_PROMPT_TPL"""
+    merged = empty_extraction()
+    partials = [p for p in partials if isinstance(p, dict)]
+    for field in SCALAR_FIELDS:
+        merged[field] = vote_scalar(field, partials)
+
+    def collect(field):
+        return [it for p in partials for it in (p.get(field) or []) if isinstance(it, dict)]
+
+    merged["datasets"] = merge_datasets(collect("datasets"))
+    for field in HEADING_FIELDS:
+        merged[field] = merge_headings(collect(field))
+    merged["evidence"] = merge_evidence(collect("evidence"))
+    return merged
+
+class IncrementalMerger:
+    """Folds chunk partials into a running merged state as they complete.
+
+    Partials arriving in chunk order are folded in with the same dedupe helpers the batch
+    merge uses, so the running state always equals merge_partials_local() over what has
+    arrived so far. An out-of-order arrival triggers a re-merge of the ordered partials.
+    The list fields are re-clustered from every item seen so far (clusters of near
+    duplicates are not stable under folding one representative at a time).
+    """
+
+    def __init__(self):
+        self.partials = {}
+        self.merged = empty_extraction()
+        self.items = {field: [] for field in ["datasets"] + HEADING_FIELDS}
+
+    def ordered(self):
+        return [self.partials[i] for i in sorted(self.partials)]
+
+    def add(self, index, partial):
+        in_order = not self.partials or index > max(self.partials)
+        self.partials[index] = partial
+        if not isinstance(partial, dict):
+            return self.merged
+        if not in_order:
+            ordered = self.ordered()
+            for field in self.items:
+                self.items[field] = [it for p in ordered if isinstance(p, dict)
+                                     for it in (p.get(field) or []) if isinstance(it, dict)]
+            self.merged = merge_partials_local(ordered)
+            return self.merged
+
+        def new_items(field):
+            return [it for it in (partial.get(field) or []) if isinstance(it, dict)]
+
+        for field in self.items:
+            self.items[field] += new_items(field)
+        merged = self.merged
+        for field in SCALAR_FIELDS:
+            merged[field] = vote_scalar(field, self.ordered())
+        merged["datasets"] = merge_datasets(self.items["datasets"])
+        for field in HEADING_FIELDS:
+            merged[field] = merge_headings(self.items[field])
+        merged["evidence"] = merge_evidence(merged["evidence"] + new_items("evidence"))
+        return merged
+
+def merge_partials(partials, mode=MERGE_MODE, use_cache=True):
+    """Merge chunk partials with the selected strategy; model failures fall back to the local merge"""
+    if mode == "llm":
+        partials_json = json.dumps(partials, ensure_ascii=False)
+        reducer_prompt = REDUCER_PROMPT_TPL.format(partials_json=partials_json)
+        return llm_json_call(reducer_prompt, use_cache=use_cache, kind="reducer")
+    merged = merge_partials_local(partials)
+    if mode == "local+polish":
+        polish_prompt = POLISH_PROMPT_TPL.format(merged_json=json.dumps(merged, ensure_ascii=False))
+        merged = llm_json_call(polish_prompt, use_cache=use_cache, kind="polish")
+    return merged
+
+# --------------------------
+# End-to-end extraction
+# --------------------------
+class NoTextError(ValueError):
+    """The PDF has no extractable text (scanned or image-only)"""
+
+def postprocess_merged(merged, title_hint=""):
+    # LLM-merged output is validated against the schema like any chunk answer
+    merged = Extraction.from_dict(merged).to_dict()
+    # Post-process: dedupe datasets & headings
+    merged["datasets"] = merge_datasets(merged.get("datasets", []))
+    for field in HEADING_FIELDS:
+        merged[field] = merge_headings(merged.get(field, []))
+
+    # If title missing, use hint
+    if not merged.get("title") and title_hint:
+        merged["title"] = title_hint
+    return merged
+
+def summarize_pages(pages, use_cache=True, on_text=None):
+    """Returns (summary, ok); on failure the summary text carries the error"""
+    try:
+        # Take first 5 pages or up to 15000 chars for summary
+        summary_text = "\n\n".join(pages[:5])
+        if len(summary_text) > 15000:
+            summary_text = summary_text[:15000] + "..."
+
+        summary_prompt = SUMMARY_PROMPT_TPL.format(paper_text=summary_text)
+        return llm_text_call(summary_prompt, use_cache=use_cache, on_text=on_text, kind="summary"), True
+    except Exception as e:
+        return f"Summary generation failed: {str(e)}", False
+
+def summarize_chunk(ch, use_cache=True):
+    """Map step: a few sentences of notes for one chunk (None if the call fails)"""
+    prompt = CHUNK_SUMMARY_PROMPT_TPL.format(
+        chunk_text=ch["text"],
+        start_page=ch["start_page"],
+        end_page=ch["end_page"]
+    )
+    try:
+        return llm_text_call(prompt, use_cache=use_cache, kind="notes").strip()
+    except Exception:
+        return None
+
+def reduce_summaries(chunk_notes, use_cache=True, on_text=None):
+    """Reduce step: one SUMMARY_PROMPT_TPL call over the ordered per-chunk notes.
+
+    chunk_notes is a list of (chunk, notes) in chunk order. Returns (summary, ok).
+    """
+    parts = [f"[Pages {ch['start_page']}-{ch['end_page']}] {notes}" for ch, notes in chunk_notes if notes]
+    if not parts:
+        return "Summary generation failed: no chunk could be summarized", False
+    try:
+        summary_prompt = SUMMARY_PROMPT_TPL.format(paper_text="\n\n".join(parts))
+        return llm_text_call(summary_prompt, use_cache=use_cache, on_text=on_text, kind="reduce"), True
+    except Exception as e:
+        return f"Summary generation failed: {str(e)}", False
+
+def extract_paper(pdf, title_hint="", use_cache=True, merge_mode=None, retrieval_mode=None,
+                  summary_mode=None, max_workers=None, on_status=None, on_chunk_done=None,
+                  on_chunk_progress=None, on_summary_text=None, revision_base=None):
+    """Run the whole pipeline on one PDF (bytes, or the path of a PDF file, which is memory-mapped).
+
+    Returns {"pages", "chunks", "partials", "merged", "summary", "summary_ok", "failed_chunks", "warnings",
+    "timings", "chunk_notes", "revision_of"}; failed_chunks are the indices of chunks whose model call failed even after retries.
+    on_status(text) reports coarse progress; on_chunk_done(done, total, index, chunk, partial, running)
+    fires after each chunk with the running local merge. Raises NoTextError for PDFs without text.
+
+    Streaming: on_chunk_progress(index, chunk, partial) receives the items of a chunk that are
+    complete while its answer streams in, and on_summary_text(text_so_far) streams the summary.
+    All callbacks run in the calling thread.
+
+    Memory: "pages" is a PackedPages (compressed once the chunker has used a page), and the
+    "text" of each chunk is emptied once its extraction (and notes call) has finished.
+
+    Revisions: revision_base(first_pages) looks up a stored earlier version of the paper from
+    its first PROBE_PAGES pages (see PaperStore.find_revision_base). When there is one, the
+    chunks are planned against it (revision.plan_chunks) and unchanged chunks ("reused": True)
+    take their stored result instead of a model call; "revision_of" is its doc_hash. Chunks
+    carry a content "hash", and "chunk_notes" holds their summary notes, for storing.
+    """
+    merge_mode = merge_mode or MERGE_MODE
+    retrieval_mode = retrieval_mode or RETRIEVAL_MODE
+    summary_mode = summary_mode or SUMMARY_MODE
+    max_workers = max_workers or MAX_CONCURRENT_CHUNKS
+    status = on_status or (lambda text: None)
+    timings = {}
+    warnings = []
+    t0 = time.perf_counter()
+
+    # Pages stream out of the PDF parser straight into the chunker, and each chunk goes
+    # to the model as soon as it is complete
+    pages = PackedPages()
+    chunks = []
+    # time spent inside the parser / chunker generators (they interleave with the map stage)
+    parse_time = {"read_pdf": 0.0, "chunk_pages": 0.0}
+    revision_of = None
+
+    def timed(gen, key):
+        it = iter(gen)
+        while True:
+            t = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                parse_time[key] += time.perf_counter() - t
+                return
+            parse_time[key] += time.perf_counter() - t
+            yield item
+
+    def stream_pages():
+        for pg in timed(iter_pdf_pages(pdf, workers=PDF_WORKERS), "read_pdf"):
+            pages.append(pg)
+            yield pg
+
+    # map_reduce: chunk notes are requested on their own pool while the extraction runs.
+    # fused: the notes come back with each extraction (only for whole chunks, so retrieval
+    # mode falls back to separate notes calls)
+    fused = summary_mode == "fused" and retrieval_mode == "off"
+    # what a stored chunk result depends on besides the chunk itself
+    salt = make_key(MODEL_NAME, MODEL_TEMPERATURE, PROMPT_VERSION, "chunk+summary" if fused else "chunk")
+    summary_pool = None
+    if summary_mode in ("map_reduce", "fused"):
+        summary_pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    note_futures = []
+    fused_notes = {}
+    # chunk text is dropped once every call that reads it (extraction, notes) is done
+    holds = {}
+    holds_lock = threading.Lock()
+
+    def release(ch):
+        with holds_lock:
+            if id(ch) not in holds:
+                return
+            holds[id(ch)] -= 1
+            if holds[id(ch)]:
+                return
+            del holds[id(ch)]
+        ch["text"] = ""
+
+    def request_notes(ch):
+        notes = (ch.get("reuse") or {}).get("notes")
+        if notes is not None:
+            fut = Future()
+            fut.set_result(notes)
+        else:
+            fut = summary_pool.submit(tracing.propagate(summarize_chunk), ch, use_cache)
+        note_futures.append((ch, fut))
+        return fut
+
+    def stream_chunks(pieces):
+        for ch in pieces:
+            if not ch["text"].strip():
+                continue
+            if "hash" not in ch:
+                ch["hash"] = chunk_hash(ch, salt)
+            chunks.append(ch)
+            holds[id(ch)] = 1
+            if summary_pool and not fused:
+                with holds_lock:
+                    holds[id(ch)] += 1
+                request_notes(ch).add_done_callback(lambda fut, ch=ch: release(ch))
+            status(f"Parsed {len(pages)} pages, {len(chunks)} chunks sent to the model...")
+            yield ch
+
+    merger = IncrementalMerger()
+
+    def chunk_done(done, total, i, ch, partial):
+        if fused:
+            # kept out of the partial so merges and the LLM reducer never see it
+            notes = partial.pop("section_summary", None)
+            fused_notes[i] = notes.strip() if isinstance(notes, str) else None
+        running = merger.add(i, partial)
+        if ch.pop("reuse", None) is not None:
+            ch["reused"] = True
+        if on_chunk_done:
+            on_chunk_done(done, total, i, ch, partial, running)
+        release(ch)
+
+    status("Extracting text from PDF...")
+    try:
+        if retrieval_mode == "off":
+            page_source = stream_pages()
+            base = None
+            if revision_base:
+                head = list(islice(page_source, PROBE_PAGES))
+                # read outside the chunker, but recorded net of read_pdf like the rest
+                parse_time["chunk_pages"] += parse_time["read_pdf"]
+                base = revision_base(head)
+                page_source = chain(head, page_source)
+            if base:
+                # a stored version exists: read every page, then chunk against its chunks
+                read_before = parse_time["read_pdf"]
+                for _ in page_source:
+                    pass
+                t = time.perf_counter()
+                planned = plan_chunks(pages, base, CHUNK_TOKEN_BUDGET, CHUNK_OVERLAP_TOKENS, salt)
+                parse_time["chunk_pages"] += parse_time["read_pdf"] - read_before + time.perf_counter() - t
+                revision_of = base["doc_hash"]
+                reused = sum("reuse" in ch for ch in planned)
+                status(f"Revision of a stored paper: {reused} of {len(planned)} chunks unchanged, "
+                       f"{len(planned) - reused} sent to the model...")
+                work = stream_chunks(planned)
+            else:
+                # chunker time includes the pages it pulls, read_pdf is subtracted when recorded
+                work = stream_chunks(timed(iter_chunks(page_source, max_tokens=CHUNK_TOKEN_BUDGET,
+                                                       overlap_tokens=CHUNK_OVERLAP_TOKENS), "chunk_pages"))
+            extract_fn = bind(reuse_or_extract, extract_fn=bind(extract_chunk, use_cache=use_cache, fused=fused),
+                              fused=fused)
+        else:
+            # retrieval needs the whole paper indexed before the per-field queries run
+            for _ in stream_pages():
+                pass
+            status(f"Parsed {len(pages)} pages, retrieving passages per field...")
+            with span("retrieval", kind=retrieval_mode):
+                work = field_tasks(pages, k=RETRIEVAL_TOP_K, kind=retrieval_mode)
+            chunks.extend(work)
+            holds.update((id(ch), 1) for ch in work)
+            extract_fn = bind(extract_field_task, use_cache=use_cache)
+            if summary_pool:
+                # the summary still covers the whole paper, not just the retrieved passages
+                for ch in iter_chunks(pages, max_tokens=CHUNK_TOKEN_BUDGET):
+                    request_notes(ch).add_done_callback(lambda fut, ch=ch: ch.update(text=""))
+        partials = map_chunks(work, extract_fn=extract_fn, max_workers=max_workers, on_done=chunk_done,
+                              on_progress=on_chunk_progress)
+    except BaseException:
+        if summary_pool:
+            summary_pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    timings["map"] = time.perf_counter() - t0
+    tracing.record("read_pdf", parse_time["read_pdf"], pages=len(pages))
+    if retrieval_mode == "off":
+        tracing.record("chunk_pages", max(0.0, parse_time["chunk_pages"] - parse_time["read_pdf"]), chunks=len(chunks))
+    tracing.record("map", timings["map"], chunks=len(chunks), workers=max_workers)
+    failed = [i for i, p in enumerate(partials) if isinstance(p, dict) and p.get("_error")]
+    if failed:
+        warnings.append(
+            f"{len(failed)} of {len(partials)} chunks failed after retries and are missing from the result "
+            f"(first error: {partials[failed[0]]['_error']})"
+        )
+    if not chunks:
+        if summary_pool:
+            summary_pool.shutdown(wait=False, cancel_futures=True)
+        raise NoTextError("No extractable text found. This PDF might be scanned or image-based.")
+
+    def reduce_notes(on_text=None):
+        t = time.perf_counter()
+        if fused:
+            chunk_notes = [(ch, fused_notes.get(i)) for i, ch in enumerate(chunks)]
+        else:
+            chunk_notes = [(ch, fut.result()) for ch, fut in note_futures]
+        out = reduce_summaries(chunk_notes, use_cache=use_cache, on_text=on_text)
+        timings["summary"] = time.perf_counter() - t
+        return out
+
+    # The reduce call runs next to the merge instead of after it. It is queued behind every
+    # notes call, so it only starts once they have all been picked up by a worker. A streamed
+    # summary is produced in this thread after the merge instead, so the callback can draw.
+    summary_future = summary_pool.submit(tracing.propagate(reduce_notes)) if (summary_pool and not on_summary_text) else None
+
+    status("Merging results...")
+    t1 = time.perf_counter()
+    # Merge results (the local merge is already done incrementally)
+    try:
+        if merge_mode == "local":
+            merged = merger.merged
+        else:
+            merged = merge_partials(partials, mode=merge_mode, use_cache=use_cache)
+    except Exception as e:
+        warnings.append(f"Merger failed: {e}. Using local merge.")
+        merged = merger.merged
+    merged = postprocess_merged(merged, title_hint)
+    timings["merge"] = time.perf_counter() - t1
+    tracing.record("merge", timings["merge"], mode=merge_mode)
+
+    status("Generating paper summary...")
+    if summary_future:
+        summary, summary_ok = summary_future.result()
+        summary_pool.shutdown()
+    elif summary_pool:
+        summary, summary_ok = reduce_notes(on_text=on_summary_text)
+        summary_pool.shutdown()
+    else:
+        t2 = time.perf_counter()
+        summary, summary_ok = summarize_pages(pages, use_cache=use_cache, on_text=on_summary_text)
+        timings["summary"] = time.perf_counter() - t2
+    timings["total"] = time.perf_counter() - t0
+    tracing.record("summary", timings["summary"], mode=summary_mode, ok=summary_ok)
+
+    if retrieval_mode != "off":
+        chunk_notes = []
+    elif fused:
+        chunk_notes = [fused_notes.get(i) for i in range(len(chunks))]
+    else:
+        notes_of = {id(ch): fut.result() for ch, fut in note_futures}
+        chunk_notes = [notes_of.get(id(ch)) for ch in chunks]
+
+    return {
+        "pages": pages, "chunks": chunks, "partials": partials, "merged": merged,
+        "summary": summary, "summary_ok": summary_ok, "failed_chunks": failed, "warnings": warnings,
+        "timings": timings, "chunk_notes": chunk_notes, "revision_of": revision_of,
+    }
+
+def _chunk_records(result):
+    """Per-chunk results of extract_paper() for PaperStore.upsert(chunks=...)"""
+    return [
+        {"start_page": ch["start_page"], "end_page": ch["end_page"], "hash": ch["hash"],
+         "partial": None if partial.get("_error") else partial, "notes": notes}
+        for ch, partial, notes in zip(result["chunks"], result["partials"], result["chunk_notes"])
+    ]
+
+def process_paper(pdf, store=None, reuse_stored=True, update_store=True, index=None, **kwargs):
+    """extract_paper() behind the paper store: known PDFs are loaded, new results are upserted.
+
+    pdf is PDF bytes or the path of a PDF file.
+    store defaults to PAPER_STORE, index to PAPER_INDEX (complete extractions are indexed when
+    update_store is on). With reuse_stored and REVISION_REUSE a new PDF that shares pages with
+    a stored one (a revised version, or this PDF after a run with failed chunks) reuses the
+    results of its unchanged chunks; the index then keeps only the new version.
+    The result carries "doc_hash", "from_store", "reused_chunks" and "trace" (the
+    finished spans of this run as dicts, see tracing.py).
+    """
+    store = store or PAPER_STORE
+    index = index or PAPER_INDEX
+    with tracing.collect() as spans:
+        with span("process_paper") as root:
+            doc_hash = pdf_hash(pdf)
+            root.set(doc_hash=doc_hash)
+            stored = store.get(doc_hash) if (store and reuse_stored) else None
+            if stored and stored["merged"] is not None and stored["summary"] is not None:
+                root.set(from_store=True)
+                result = {
+                    "doc_hash": doc_hash, "from_store": True, "n_pages": stored["n_pages"],
+                    "pages": None, "chunks": [], "partials": [], "merged": stored["merged"],
+                    "summary": stored["summary"], "summary_ok": True, "failed_chunks": [], "warnings": [],
+                    "timings": {"total": 0.0}, "reused_chunks": 0,
+                }
+            else:
+                revision_base = store.find_revision_base if (store and reuse_stored and REVISION_REUSE) else None
+                result = extract_paper(pdf, revision_base=revision_base, **kwargs)
+                result.update(doc_hash=doc_hash, from_store=False, n_pages=len(result["pages"]),
+                              reused_chunks=sum(bool(ch.get("reused")) for ch in result["chunks"]))
+                root.set(from_store=False, pages=result["n_pages"], chunks=len(result["chunks"]),
+                         failed_chunks=len(result["failed_chunks"]), revision_of=result["revision_of"],
+                         reused_chunks=result["reused_chunks"])
+                # Keep pages, passage embeddings and results for later runs / cross-paper search
+                if store and update_store:
+                    # an incomplete extraction is not stored as final, so the next run extracts it again
+                    with span("store"):
+                        store.upsert(doc_hash, result["pages"],
+                                     merged=None if result["failed_chunks"] else result["merged"],
+                                     summary=result["summary"] if result["summary_ok"] else None,
+                                     chunks=_chunk_records(result))
+                        store.flush()
+            # papers stored before the index existed are indexed the first time they are loaded
+            if index and update_store and not result["failed_chunks"] and (
+                    not result["from_store"] or not index.has(doc_hash)):
+                with span("index"):
+                    if result.get("revision_of") not in (None, doc_hash):
+                        index.remove(result["revision_of"])
+                    index.add(doc_hash, result["merged"])
+    result["trace"] = [sp.to_dict() for sp in spans]
+    return result
@@ -0,0 +1,202 @@
+# rate_limit.py
+# Client-side flow control for model calls, shared by every thread in the process.
+#
+# RateLimiter paces requests and (estimated) tokens per minute with two token buckets and
+# adapts to the server: a throttling error halves the allowed rate, successes raise it back
+# towards the configured quota. call_with_retry() puts the limiter, jittered exponential
+# backoff, a per-request deadline and a circuit breaker around a single call.
+import random
+import re
+import threading
+import time
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the model while the breaker is open"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request could not complete (waiting, retrying) within its deadline"""
+
+
+# substrings of errors worth retrying; anything else (bad request, auth, ...) fails at once
+_RETRYABLE_RE = re.compile(
+    r"\b(429|500|502|503|504)\b|resource.?exhausted|quota|rate.?limit|too many requests|"
+    r"unavailable|overloaded|deadline.?exceeded|timed? ?out|temporar|connection (reset|aborted|refused)",
+    re.IGNORECASE,
+)
+_THROTTLE_RE = re.compile(r"\b429\b|resource.?exhausted|quota|rate.?limit|too many requests", re.IGNORECASE)
+
+
+def _error_text(exc):
+    return f"{type(exc).__name__} {getattr(exc, 'code', '')} {getattr(exc, 'status_code', '')} {exc}"
+
+
+def is_retryable(exc):
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return bool(_RETRYABLE_RE.search(_error_text(exc)))
+
+
+def is_throttle(exc):
+    return bool(_THROTTLE_RE.search(_error_text(exc)))
+
+
+class _Bucket:
+    """Token bucket refilled at per_minute / 60 per second, holding at most burst_share of a minute"""
+
+    def __init__(self, per_minute, burst_share=0.1):
+        self.per_minute = per_minute
+        self.capacity = max(1.0, per_minute * burst_share)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now, factor):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute * factor / 60.0)
+        self.updated = now
+
+    def wait_for(self, amount, factor):
+        """Seconds until `amount` can be taken (0 if now); requests above capacity wait for a full bucket"""
+        need = min(amount, self.capacity) - self.level
+        return max(0.0, need * 60.0 / (self.per_minute * factor))
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute pacing; 0 disables a limit.
+
+    Bursts are capped at burst_share of a minute's quota, so burst + paced rate stay within the
+    quota over any minute. The effective rate is quota * factor. factor starts at `headroom` (just under quota), is
+    halved on every throttling error (down to `min_factor`) and grows back by `recover_step`
+    per successful call.
+    """
+
+    def __init__(self, rpm=0, tpm=0, headroom=0.9, min_factor=0.1, recover_step=0.02, burst_share=0.1):
+        self.rpm = _Bucket(rpm, burst_share) if rpm > 0 else None
+        self.tpm = _Bucket(tpm, burst_share) if tpm > 0 else None
+        self.headroom = headroom
+        self.min_factor = min_factor
+        self.recover_step = recover_step
+        self.factor = headroom
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=0, deadline=None):
+        """Block until one request of `tokens` input tokens may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = 0.0
+                for bucket, amount in ((self.rpm, 1), (self.tpm, tokens)):
+                    if bucket:
+                        bucket.refill(now, self.factor)
+                        wait = max(wait, bucket.wait_for(amount, self.factor))
+                if wait <= 0:
+                    if self.rpm:
+                        self.rpm.level -= 1
+                    if self.tpm:
+                        # may go negative for large prompts; later callers wait it off
+                        self.tpm.level -= tokens
+                    return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise DeadlineExceeded("LLM request deadline exceeded while waiting for rate limit")
+            time.sleep(min(wait, 1.0))
+
+    def charge(self, tokens):
+        """Debit tokens known only after the call (the response)"""
+        if self.tpm and tokens:
+            with self._lock:
+                self.tpm.level -= tokens
+
+    def on_success(self):
+        with self._lock:
+            self.factor = min(self.headroom, self.factor + self.recover_step)
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttled += 1
+            self.factor = max(self.min_factor, self.factor / 2)
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; lets one trial call through after `reset_after` seconds"""
+
+    def __init__(self, threshold=5, reset_after=30.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        if self.threshold <= 0:
+            return
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at >= self.reset_after and not self._trial:
+                # half-open: a single call decides whether the breaker closes again
+                self._trial = True
+                return
+        raise CircuitOpenError(f"Model calls suspended after {self.failures} consecutive failures")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+def call_with_retry(fn, tokens=0, limiter=None, breaker=None, max_retries=5, base_delay=1.0,
+                    max_delay=30.0, deadline_s=None, count_tokens=None, on_retry=None):
+    """fn() under rate limiting, retries with full-jitter exponential backoff and a deadline.
+
+    Only retryable errors (throttling, 5xx, timeouts) are retried; the last error is re-raised.
+    count_tokens(result) is charged to the limiter after a successful call; on_retry(attempt, error)
+    is called before each retry.
+    """
+    deadline = time.monotonic() + deadline_s if deadline_s else None
+    attempt = 0
+    while True:
+        if breaker:
+            breaker.allow()
+        if limiter:
+            limiter.acquire(tokens, deadline=deadline)
+        try:
+            result = fn()
+        except Exception as e:
+            retryable = is_retryable(e)
+            throttled = is_throttle(e)
+            if limiter and throttled:
+                limiter.on_throttle()
+            # throttling is the limiter's job; the breaker only trips on outages. A non-retryable
+            # error (bad request, auth) still means the service answered.
+            if breaker and not throttled:
+                if retryable:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            if not retryable or attempt >= max_retries:
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise DeadlineExceeded(f"LLM request deadline exceeded after {attempt + 1} attempts: {e}") from e
+            attempt += 1
+            if on_retry:
+                on_retry(attempt, e)
+            time.sleep(delay)
+            continue
+        if breaker:
+            breaker.record_success()
+        if limiter:
+            limiter.on_success()
+            if count_tokens:
+                limiter.charge(count_tokens(result))
+        return result
@@ -0,0 +1,216 @@
+# result_model.py
+# Typed model of the extraction schema (the JSON object CHUNK_PROMPT_TPL asks for).
+#
+# Extraction and its items are slotted dataclasses. from_dict() validates and coerces model
+# output ("2020" -> 2020, items without their key field dropped), to_dict() gives back the
+# plain JSON shape that the UI, the API and the merge helpers work with. dumps()/loads() use
+# orjson when it is installed; to_compact()/from_compact() is a key-less positional encoding
+# (zlib-compressed) used to keep stored results small.
+import json
+import zlib
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+COMPACT_VERSION = 1
+
+def as_int(v):
+    if isinstance(v, bool):
+        return None
+    if isinstance(v, int):
+        return v
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    if isinstance(v, str) and v.strip().isdigit():
+        return int(v.strip())
+    return None
+
+def as_text(v):
+    """str / number -> stripped text (None if empty); raises ValueError for anything else"""
+    if v is None:
+        return None
+    if isinstance(v, str):
+        return v.strip() or None
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return str(v)
+    raise ValueError(f"expected text, got {type(v).__name__}")
+
+def _text(d, key):
+    v = d.get(key)
+    return v if isinstance(v, str) else ""
+
+# --------------------------
+# Items
+# --------------------------
+@dataclass(slots=True)
+class Dataset:
+    name: str
+    page: Optional[int] = None
+    quote: str = ""
+
+    @classmethod
+    def from_dict(cls, d):
+        if not isinstance(d, dict) or not isinstance(d.get("name"), str) or not d["name"].strip():
+            return None
+        return cls(d["name"], as_int(d.get("page")), _text(d, "quote"))
+
+    def to_dict(self):
+        return {"name": self.name, "page": self.page, "quote": self.quote}
+
+    def to_row(self):
+        return [self.name, self.page, self.quote]
+
+@dataclass(slots=True)
+class HeadingItem:
+    """An entry of limitations_addressed, contributions, methods or paper_limitations"""
+    heading: str
+    explanation: str = ""
+    page: Optional[int] = None
+    quote: str = ""
+
+    @classmethod
+    def from_dict(cls, d):
+        if not isinstance(d, dict) or not isinstance(d.get("heading"), str) or not d["heading"].strip():
+            return None
+        return cls(d["heading"], _text(d, "explanation"), as_int(d.get("page")), _text(d, "quote"))
+
+    def to_dict(self):
+        return {"heading": self.heading, "explanation": self.explanation, "page": self.page, "quote": self.quote}
+
+    def to_row(self):
+        return [self.heading, self.explanation, self.page, self.quote]
+
+@dataclass(slots=True)
+class Evidence:
+    quote: str
+    page: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, d):
+        if not isinstance(d, dict) or not isinstance(d.get("quote"), str) or not d["quote"].strip():
+            return None
+        return cls(d["quote"], as_int(d.get("page")))
+
+    def to_dict(self):
+        return {"page": self.page, "quote": self.quote}
+
+    def to_row(self):
+        return [self.page, self.quote]
+
+LIST_FIELDS = {
+    "datasets": Dataset,
+    "limitations_addressed": HeadingItem,
+    "contributions": HeadingItem,
+    "methods": HeadingItem,
+    "paper_limitations": HeadingItem,
+    "evidence": Evidence,
+}
+SCALAR_FIELDS = ["title", "venue", "year"]
+FIELDS = SCALAR_FIELDS + list(LIST_FIELDS)
+
+def coerce_field(name, value):
+    """Typed value of one schema field; raises ValueError if it cannot be used at all.
+
+    Lists drop the items that are unusable, but a non-empty list with no usable item is an error.
+    """
+    if name == "year":
+        year = as_int(value)
+        if value is not None and year is None:
+            raise ValueError(f"year: {value!r} is not a year")
+        return year
+    if name in SCALAR_FIELDS:
+        return as_text(value)
+    item_type = LIST_FIELDS[name]
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        value = [value]
+    if not isinstance(value, list):
+        raise ValueError(f"{name}: expected a list, got {type(value).__name__}")
+    items = [it for it in map(item_type.from_dict, value) if it is not None]
+    if value and not items:
+        raise ValueError(f"{name}: no usable item")
+    return items
+
+# --------------------------
+# Extraction
+# --------------------------
+@dataclass(slots=True)
+class Extraction:
+    title: Optional[str] = None
+    venue: Optional[str] = None
+    year: Optional[int] = None
+    datasets: List[Dataset] = field(default_factory=list)
+    limitations_addressed: List[HeadingItem] = field(default_factory=list)
+    contributions: List[HeadingItem] = field(default_factory=list)
+    methods: List[HeadingItem] = field(default_factory=list)
+    paper_limitations: List[HeadingItem] = field(default_factory=list)
+    evidence: List[Evidence] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, d):
+        """Lenient: invalid fields are left empty, unknown keys (e.g. "_error") are ignored"""
+        out = cls()
+        if not isinstance(d, dict):
+            return out
+        for name in FIELDS:
+            if name in d:
+                try:
+                    setattr(out, name, coerce_field(name, d[name]))
+                except ValueError:
+                    pass
+        return out
+
+    def to_dict(self):
+        out = {name: getattr(self, name) for name in SCALAR_FIELDS}
+        for name in LIST_FIELDS:
+            out[name] = [it.to_dict() for it in getattr(self, name)]
+        return out
+
+    # positional form: [version, title, venue, year, [rows of each list field in LIST_FIELDS order]]
+    def to_rows(self):
+        return [COMPACT_VERSION, self.title, self.venue, self.year] + [
+            [it.to_row() for it in getattr(self, name)] for name in LIST_FIELDS
+        ]
+
+    @classmethod
+    def from_rows(cls, rows):
+        if rows[0] != COMPACT_VERSION:
+            raise ValueError(f"Unknown compact result version {rows[0]}")
+        out = cls(title=rows[1], venue=rows[2], year=rows[3])
+        for name, item_rows in zip(LIST_FIELDS, rows[4:]):
+            item_type = LIST_FIELDS[name]
+            if item_type is Evidence:
+                items = [Evidence(quote, page) for page, quote in item_rows]
+            else:
+                items = [item_type(*row) for row in item_rows]
+            setattr(out, name, items)
+        return out
+
+    def to_compact(self):
+        return zlib.compress(dumps(self.to_rows()), 1)
+
+    @classmethod
+    def from_compact(cls, blob):
+        return cls.from_rows(loads(zlib.decompress(blob)))
+
+# --------------------------
+# JSON encode / decode
+# --------------------------
+def dumps(obj, indent=False):
+    """UTF-8 JSON bytes (orjson when available); Extraction objects are converted with to_dict()"""
+    if isinstance(obj, Extraction):
+        obj = obj.to_dict()
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None,
+                      separators=None if indent else (",", ":")).encode("utf-8")
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,189 @@
+# retrieval.py
+# Local retrieval stage: split pages into short passages, index them (BM25 or vectors),
+# and pick the top-k passages for each schema field so only those go to the model.
+import hashlib
+import math
+import re
+from collections import Counter
+
+from pdf_utils import estimate_tokens, split_page
+
+# One targeted query per group of schema fields. "fields" are the keys of the
+# extraction schema that the model is asked to fill from the retrieved passages.
+FIELD_QUERIES = {
+    "metadata": {
+        "fields": ["title", "venue", "year"],
+        "query": "title authors abstract conference journal proceedings published year arxiv copyright university",
+    },
+    "datasets": {
+        "fields": ["datasets"],
+        "query": "dataset datasets benchmark corpus training data test set evaluated on collected samples images annotated",
+    },
+    "methods": {
+        "fields": ["methods"],
+        "query": "method approach model architecture algorithm framework we propose training procedure loss network",
+    },
+    "contributions": {
+        "fields": ["contributions"],
+        "query": "our contributions we propose we introduce novel main contribution this paper presents we show outperforms",
+    },
+    "limitations_addressed": {
+        "fields": ["limitations_addressed"],
+        "query": "existing methods suffer prior work fail limitation challenge problem however drawback address overcome",
+    },
+    "paper_limitations": {
+        "fields": ["paper_limitations"],
+        "query": "limitations future work our method does not weakness restricted assumption fails cannot leave open",
+    },
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str):
+    return _WORD_RE.findall(text.lower())
+
+# --------------------------
+# Passages
+# --------------------------
+def iter_passages(pages_text, max_tokens=250):
+    """Paragraph-sized passages ({"page", "text"}) built from consecutive lines of each page"""
+    for page_no, pg in enumerate(pages_text, start=1):
+        cur = []
+        cur_tokens = 0
+        for line in split_page(pg, max_tokens):
+            t = estimate_tokens(line) + 1
+            if cur and cur_tokens + t > max_tokens:
+                yield {"page": page_no, "text": "\n".join(cur)}
+                cur, cur_tokens = [], 0
+            cur.append(line)
+            cur_tokens += t
+        if cur:
+            yield {"page": page_no, "text": "\n".join(cur)}
+
+# --------------------------
+# BM25
+# --------------------------
+class BM25Index:
+    def __init__(self, passages, k1=1.5, b=0.75):
+        self.passages = list(passages)
+        self.k1 = k1
+        self.b = b
+        self.doc_tfs = [Counter(tokenize(p["text"])) for p in self.passages]
+        self.doc_lens = [sum(tf.values()) for tf in self.doc_tfs]
+        self.avg_len = (sum(self.doc_lens) / len(self.doc_lens)) if self.doc_lens else 0.0
+        df = Counter()
+        for tf in self.doc_tfs:
+            df.update(tf.keys())
+        n = len(self.passages)
+        self.idf = {term: math.log(1 + (n - freq + 0.5) / (freq + 0.5)) for term, freq in df.items()}
+
+    def search(self, query: str, k=5):
+        terms = [t for t in set(tokenize(query)) if t in self.idf]
+        scored = []
+        for i, tf in enumerate(self.doc_tfs):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lens[i] / (self.avg_len or 1))
+            for term in terms:
+                f = tf.get(term)
+                if f:
+                    score += self.idf[term] * f * (self.k1 + 1) / (f + norm)
+            if score > 0:
+                scored.append((score, i))
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        return [(score, self.passages[i]) for score, i in scored[:k]]
+
+# --------------------------
+# Vector index
+# --------------------------
+class HashingEmbeddings:
+    """Deterministic, offline embeddings: signed feature hashing of word unigrams and bigrams.
+
+    Implements the LangChain Embeddings interface (embed_documents / embed_query), so a real
+    embedding model can be swapped in without touching the index.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def _embed(self, text: str):
+        vec = [0.0] * self.dim
+        words = tokenize(text)
+        for feat in words + [a + " " + b for a, b in zip(words, words[1:])]:
+            h = int.from_bytes(hashlib.md5(feat.encode("utf-8")).digest()[:8], "little")
+            vec[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+class VectorIndex:
+    """Inner-product search over normalized embeddings; uses faiss when it is installed"""
+
+    def __init__(self, passages, embeddings=None):
+        self.passages = list(passages)
+        self.embeddings = embeddings or HashingEmbeddings()
+        self.vectors = self.embeddings.embed_documents([p["text"] for p in self.passages])
+        self._faiss = None
+        try:
+            import faiss
+            import numpy as np
+        except ImportError:
+            return
+        if self.vectors:
+            mat = np.asarray(self.vectors, dtype="float32")
+            self._faiss = faiss.IndexFlatIP(mat.shape[1])
+            self._faiss.add(mat)
+
+    def search(self, query: str, k=5):
+        if not self.passages:
+            return []
+        q = self.embeddings.embed_query(query)
+        if self._faiss is not None:
+            import numpy as np
+            scores, ids = self._faiss.search(np.asarray([q], dtype="float32"), min(k, len(self.passages)))
+            return [(float(s), self.passages[i]) for s, i in zip(scores[0], ids[0]) if i >= 0]
+        scored = [(sum(a * b for a, b in zip(q, vec)), i) for i, vec in enumerate(self.vectors)]
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        return [(score, self.passages[i]) for score, i in scored[:k]]
+
+def build_index(passages, kind="bm25", embeddings=None):
+    if kind == "bm25":
+        return BM25Index(passages)
+    if kind in ("faiss", "vector"):
+        return VectorIndex(passages, embeddings=embeddings)
+    raise ValueError(f"Unknown retrieval index: {kind}")
+
+# --------------------------
+# Per-field retrieval
+# --------------------------
+def retrieve_for_fields(index, k=6, queries=FIELD_QUERIES):
+    """Top-k passages per field group, returned in page order for each group"""
+    out = {}
+    for name, spec in queries.items():
+        hits = [p for _, p in index.search(spec["query"], k=k)]
+        if name == "metadata" and index.passages:
+            # title/venue/year live on the first page even when the query terms do not match
+            first = [p for p in index.passages if p["page"] == index.passages[0]["page"]][:2]
+            hits = first + [p for p in hits if p not in first]
+        out[name] = sorted(hits, key=lambda p: p["page"])
+    return out
+
+def field_tasks(pages_text, k=6, kind="bm25", embeddings=None, passage_tokens=250):
+    """Chunk-like work items ({"field", "fields", "start_page", "end_page", "text"}) for the map phase"""
+    index = build_index(iter_passages(pages_text, max_tokens=passage_tokens), kind=kind, embeddings=embeddings)
+    tasks = []
+    for name, hits in retrieve_for_fields(index, k=k).items():
+        if not hits:
+            continue
+        tasks.append({
+            "field": name,
+            "fields": FIELD_QUERIES[name]["fields"],
+            "start_page": hits[0]["page"],
+            "end_page": hits[-1]["page"],
+            "text": "\n\n".join(f"[page {p['page']}]\n{p['text']}" for p in hits),
+        })
+    return tasks
@@ -0,0 +1,78 @@
+# revision.py
+# Re-extracting a revised paper (arXiv v1 -> v2) from the chunk results of a stored version.
+#
+# The pages of the new version are matched to the stored ones by hash. The new version is then
+# cut into segments at every page where a chunk of the stored version began on an unchanged
+# page, and each segment is chunked on its own: a segment whose pages did not change comes out
+# as exactly the old chunk, so its content hash matches and the stored partial (and summary
+# notes) stand in for the model call. Only segments holding changed pages get new chunks. A
+# chunk that moved because pages were inserted or removed before it still matches (the hash
+# leaves out its page numbers and printed page-number lines) and its partial gets its page
+# references shifted.
+#
+# With CHUNK_OVERLAP_TOKENS the first chunk of a segment carries no overlap from the one before.
+import copy
+from difflib import SequenceMatcher
+
+from llm_cache import make_key
+from paper_store import mask_page_label, page_hash
+from pdf_utils import iter_chunks
+
+# pages of a new PDF looked up in the store before deciding between streaming and a revision
+PROBE_PAGES = 5
+
+
+def chunk_hash(ch, salt=""):
+    """Content hash of a chunk: its text and page span (not its page numbers), plus salt
+    (model, prompt version, extraction mode)"""
+    # pages are joined by a blank line (pdf_utils._make_chunk), page text has none of its own
+    text = "\n\n".join(mask_page_label(page) for page in ch["text"].split("\n\n"))
+    return make_key(salt, ch["end_page"] - ch["start_page"], text)
+
+
+def page_map(old_hashes, new_hashes):
+    """{old page number: new page number} for the pages that did not change (1-based)"""
+    matcher = SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+    return {a + k + 1: b + k + 1 for a, b, n in matcher.get_matching_blocks() for k in range(n)}
+
+
+def shift_pages(partial, delta):
+    """Copy of a partial with every item's page moved by delta"""
+    out = copy.deepcopy(partial)
+    if delta:
+        for items in out.values():
+            if isinstance(items, list):
+                for item in items:
+                    if isinstance(item, dict) and isinstance(item.get("page"), int):
+                        item["page"] += delta
+    return out
+
+
+def plan_chunks(pages, base, max_tokens, overlap_tokens=0, salt=""):
+    """Chunks of the new version (pages: its page texts) against a stored base version.
+
+    base is PaperStore.revision_base(). Every chunk carries "hash"; chunks whose hash matches
+    a stored chunk with a result also carry "reuse": {"partial" (pages shifted), "notes"}.
+    """
+    pages = list(pages)
+    mapping = page_map(base["page_hashes"], [page_hash(p) for p in pages])
+    stored = {c["hash"]: c for c in base["chunks"] if c["partial"] is not None}
+    cuts = {1}
+    prev_end = 0
+    for c in base["chunks"]:
+        # only chunks that began a fresh page (not the rest of a page split across chunks)
+        if c["start_page"] > prev_end and c["start_page"] in mapping:
+            cuts.add(mapping[c["start_page"]])
+        prev_end = max(prev_end, c["end_page"])
+    cuts = sorted(cut for cut in cuts if cut <= len(pages)) + [len(pages) + 1]
+
+    out = []
+    for start, stop in zip(cuts, cuts[1:]):
+        for ch in iter_chunks(pages[start - 1:stop - 1], max_tokens, overlap_tokens, first_page=start):
+            ch["hash"] = chunk_hash(ch, salt)
+            old = stored.get(ch["hash"])
+            if old is not None:
+                ch["reuse"] = {"partial": shift_pages(old["partial"], ch["start_page"] - old["start_page"]),
+                               "notes": old["notes"]}
+            out.append(ch)
+    return out
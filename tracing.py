@@ -0,0 +1,226 @@
+# tracing.py
+# Lightweight spans for the pipeline: one per stage, per chunk and per model call.
+#
+# span("name", **attrs) times a block and records its attributes (token counts, cache hits,
+# retries, errors). The current span lives in a contextvar, so nested spans find their parent;
+# work handed to a thread pool keeps it when the callable is wrapped with propagate().
+# Finished spans go to the collect() list of the current run (used by the UI timing panel),
+# to an optional JSONL file and to in-process aggregates rendered in the Prometheus text
+# format by render_prometheus() (served by api.py at /metrics or by serve_metrics(port)).
+import contextvars
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar("tracing_span", default=None)
+_collector = contextvars.ContextVar("tracing_collector", default=None)
+_ids = itertools.count(1)
+_jsonl_path = None
+_jsonl_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "trace_id", "start", "duration", "attrs")
+
+    def __init__(self, name, parent=None, attrs=None):
+        self.name = name
+        self.span_id = next(_ids)
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.start = time.time()
+        self.duration = None
+        self.attrs = dict(attrs or {})
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def incr(self, key, n=1):
+        self.attrs[key] = self.attrs.get(key, 0) + n
+
+    def to_dict(self):
+        return {
+            "name": self.name, "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "start": self.start, "duration": self.duration, **self.attrs,
+        }
+
+
+def configure(jsonl_path=None):
+    """Append every finished span to jsonl_path (None / "" disables the file export)"""
+    global _jsonl_path
+    _jsonl_path = jsonl_path or None
+
+
+@contextmanager
+def span(name, **attrs):
+    sp = Span(name, _current.get(), attrs)
+    token = _current.set(sp)
+    t0 = time.perf_counter()
+    try:
+        yield sp
+    except BaseException as e:
+        sp.attrs["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        sp.duration = time.perf_counter() - t0
+        _current.reset(token)
+        _finish(sp)
+
+
+def record(name, duration, **attrs):
+    """A span measured elsewhere (e.g. time accumulated over a generator), as a child of the current span"""
+    sp = Span(name, _current.get(), attrs)
+    sp.start -= duration
+    sp.duration = duration
+    _finish(sp)
+    return sp
+
+
+def current():
+    return _current.get()
+
+
+def annotate(**attrs):
+    sp = _current.get()
+    if sp is not None:
+        sp.attrs.update(attrs)
+
+
+def incr(key, n=1):
+    sp = _current.get()
+    if sp is not None:
+        sp.incr(key, n)
+
+
+@contextmanager
+def collect():
+    """Gather the spans finished inside this block (joins an outer collect() if there is one)"""
+    spans = _collector.get()
+    if spans is not None:
+        yield spans
+        return
+    spans = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+
+def propagate(fn):
+    """fn bound to a copy of the caller's context, for executor.submit / threads"""
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return ctx.run(fn, *args, **kwargs)
+    return run
+
+
+def usage(trace):
+    """Model call totals of a finished trace (list of span dicts): calls, cache hits, errors, retries, tokens"""
+    out = {"llm_calls": 0, "cache_hits": 0, "errors": 0, "retries": 0, "tokens_in": 0, "tokens_out": 0}
+    for sp in trace:
+        if sp.get("name") != "llm":
+            continue
+        out["llm_calls"] += 1
+        out["cache_hits"] += bool(sp.get("cache_hit"))
+        out["errors"] += bool(sp.get("error"))
+        out["retries"] += sp.get("retries", 0)
+        out["tokens_in"] += sp.get("tokens_in") or 0
+        out["tokens_out"] += sp.get("tokens_out") or 0
+    return out
+
+
+# --------------------------
+# Sinks
+# --------------------------
+def _finish(sp):
+    spans = _collector.get()
+    if spans is not None:
+        spans.append(sp)
+    _aggregate(sp)
+    if _jsonl_path:
+        line = json.dumps(sp.to_dict(), ensure_ascii=False, default=str)
+        with _jsonl_lock:
+            with open(_jsonl_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def _add(metric, labels, value):
+    key = (metric, tuple(sorted(labels.items())))
+    with _metrics_lock:
+        _metrics[key] = _metrics.get(key, 0) + value
+
+
+def _aggregate(sp):
+    a = sp.attrs
+    if sp.name == "llm":
+        kind = a.get("kind", "llm")
+        status = "error" if a.get("error") else "ok"
+        cache = "hit" if a.get("cache_hit") else "miss"
+        _add("llm_requests_total", {"kind": kind, "cache": cache, "status": status}, 1)
+        _add("llm_request_seconds_sum", {"kind": kind, "cache": cache}, sp.duration)
+        _add("llm_tokens_total", {"kind": kind, "direction": "in"}, a.get("tokens_in") or 0)
+        _add("llm_tokens_total", {"kind": kind, "direction": "out"}, a.get("tokens_out") or 0)
+        _add("llm_retries_total", {"kind": kind}, a.get("retries", 0))
+    else:
+        _add("pipeline_span_seconds_sum", {"span": sp.name}, sp.duration)
+        _add("pipeline_span_total", {"span": sp.name}, 1)
+        if a.get("error"):
+            _add("pipeline_span_errors_total", {"span": sp.name}, 1)
+
+
+_HELP = {
+    "llm_requests_total": ("counter", "Model calls by prompt kind, cache result and status"),
+    "llm_request_seconds_sum": ("counter", "Seconds spent in model calls (including cache lookups and retries)"),
+    "llm_tokens_total": ("counter", "Input / output tokens (reported by the model, else estimated)"),
+    "llm_retries_total": ("counter", "Retried model calls"),
+    "pipeline_span_seconds_sum": ("counter", "Seconds spent per pipeline stage"),
+    "pipeline_span_total": ("counter", "Finished spans per pipeline stage"),
+    "pipeline_span_errors_total": ("counter", "Failed spans per pipeline stage"),
+}
+
+
+def render_prometheus():
+    """All aggregates in the Prometheus text exposition format"""
+    with _metrics_lock:
+        items = sorted(_metrics.items())
+    lines = []
+    seen = set()
+    for (metric, labels), value in items:
+        if metric not in seen:
+            seen.add(metric)
+            kind, text = _HELP.get(metric, ("untyped", metric))
+            lines.append(f"# HELP {metric} {text}")
+            lines.append(f"# TYPE {metric} {kind}")
+        label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+        value = value if isinstance(value, int) else round(value, 6)
+        lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    """Serve render_prometheus() at http://host:port/metrics from a daemon thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server